@@ -0,0 +1,302 @@
+import os
+import time
+import threading
+import warnings
+from contextlib import contextmanager, nullcontext
+from app.config import Config
+from app.utils.logger import setup_logger
+from app.utils.system_utils import format_bytes
+
+logger = setup_logger(__name__)
+
+# 어댑터를 쓰지 않는 행을 나타내는 PEFT의 예약 이름
+BASE_ADAPTER = "__base__"
+
+def parse_adapter_spec(spec):
+    """
+    "이름=경로,이름=경로" 형식의 어댑터 설정 파싱
+    
+    Returns:
+        {이름: 경로} 딕셔너리
+    """
+    adapters = {}
+    for item in (spec or "").split(","):
+        if "=" in item:
+            name, path = item.split("=", 1)
+            if name.strip() and path.strip():
+                adapters[name.strip()] = path.strip()
+    return adapters
+
+class _ModelLock:
+    """
+    모델 forward(공유)와 어댑터 주입·삭제(배타)를 구분하는 잠금
+    
+    여러 스레드의 forward는 함께 실행되고, 주입·삭제는 진행 중인 forward가 끝날 때까지
+    기다립니다. 주입·삭제가 기다리는 동안에는 새 forward를 받지 않아 계속 들어오는
+    디코딩 단계에 밀려 주입이 무한정 늦어지지 않습니다.
+    """
+    
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._writing = False
+        self._writers_waiting = 0
+    
+    def acquire_shared(self):
+        with self._condition:
+            while self._writing or self._writers_waiting:
+                self._condition.wait()
+            self._readers += 1
+    
+    def release_shared(self):
+        with self._condition:
+            self._readers -= 1
+            if not self._readers:
+                self._condition.notify_all()
+    
+    @contextmanager
+    def exclusive(self):
+        with self._condition:
+            self._writers_waiting += 1
+            try:
+                while self._writing or self._readers:
+                    self._condition.wait()
+            finally:
+                self._writers_waiting -= 1
+            self._writing = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writing = False
+                self._condition.notify_all()
+
+class AdapterManager:
+    """
+    하나의 기반 모델 위에 여러 LoRA 어댑터를 함께 올려 두는 관리자
+    
+    어댑터는 처음 요청될 때 기반 모델의 레이어에 주입되며 기반 가중치는 다시 로드하지 않습니다.
+    주입된 어댑터는 기본적으로 비활성 상태이고, select()로 지정한 스레드의 forward에서만
+    행별로 적용되므로 한 배치 안에서 서로 다른 어댑터를 쓰는 요청을 함께 디코딩할 수 있습니다.
+    메모리 한도를 넘으면 사용 중이 아닌 어댑터를 LRU 순서로 내립니다.
+    주입·삭제와 겹치지 않도록 잠그는 단위는 generate 전체가 아니라 모델 forward 한 번이므로,
+    한 요청의 긴 생성이 스케줄러의 디코딩 단계를 막지 않습니다.
+    """
+    
+    def __init__(self, model, max_bytes=None, adapters=None):
+        """
+        어댑터 관리자 초기화
+        
+        Args:
+            model: 기반 모델 (어댑터 레이어가 제자리에 주입됨)
+            max_bytes: 로드된 어댑터의 최대 총 메모리(바이트, 기본값: Config.LORA_ADAPTER_CACHE_MB)
+            adapters: 등록할 {이름: 경로} (기본값: Config.LORA_ADAPTERS와 학습 결과 폴더)
+        """
+        self.model = model
+        self.max_bytes = max_bytes or Config.LORA_ADAPTER_CACHE_MB * 1024 * 1024
+        
+        self._paths = {}
+        self._loaded = {}  # 이름 -> 바이트 수
+        self._in_use = {}
+        self._last_used = {}
+        self._hooked = set()
+        self._selection = threading.local()
+        
+        # 등록 정보와 참조 카운트 보호
+        self._lock = threading.RLock()
+        # 어댑터 주입·삭제와 forward가 겹치지 않도록 하는 잠금 (forward마다 공유 잠금)
+        self._model_lock = _ModelLock()
+        model.register_forward_pre_hook(self._before_forward)
+        model.register_forward_hook(self._after_forward, always_call=True)
+        
+        # 통계
+        self.loads = 0
+        self.evictions = 0
+        
+        if adapters is None:
+            adapters = parse_adapter_spec(Config.LORA_ADAPTERS)
+            # DeepSeekTrainer.train의 기본 출력 폴더
+            finetuned = os.path.join(Config.MODEL_DIR, "finetuned_model")
+            if "finetuned" not in adapters and os.path.exists(os.path.join(finetuned, "adapter_config.json")):
+                adapters["finetuned"] = finetuned
+        for name, path in adapters.items():
+            self.register(name, path)
+    
+    def register(self, name, path):
+        """
+        어댑터 등록 (로드는 처음 요청될 때)
+        
+        Args:
+            name: 요청에서 사용할 어댑터 이름
+            path: save_pretrained로 저장된 PEFT 어댑터 폴더
+        """
+        if name == BASE_ADAPTER:
+            raise ValueError(f"예약된 어댑터 이름입니다: {name}")
+        with self._lock:
+            self._paths[name] = path
+        logger.info(f"LoRA 어댑터 등록: {name} ({path})")
+    
+    def names(self):
+        """등록된 어댑터 이름 목록"""
+        with self._lock:
+            return sorted(self._paths)
+    
+    def has(self, name):
+        """어댑터가 등록되어 있는지 여부"""
+        with self._lock:
+            return name in self._paths
+    
+    def acquire(self, name):
+        """
+        어댑터를 로드하고 사용 중으로 표시 (release()로 반납해야 함)
+        
+        Args:
+            name: 어댑터 이름
+        
+        Raises:
+            KeyError: 등록되지 않은 어댑터
+        """
+        with self._lock:
+            if name not in self._paths:
+                raise KeyError(f"등록되지 않은 어댑터입니다: {name}")
+            self._in_use[name] = self._in_use.get(name, 0) + 1
+            self._last_used[name] = time.monotonic()
+            loaded = name in self._loaded
+        
+        if not loaded:
+            try:
+                self._load(name)
+            except Exception:
+                self.release(name)
+                raise
+    
+    def release(self, name):
+        """어댑터 사용 종료"""
+        with self._lock:
+            self._in_use[name] -= 1
+            self._last_used[name] = time.monotonic()
+    
+    @contextmanager
+    def select(self, adapter_names):
+        """
+        현재 스레드의 forward에 행별 어댑터 적용
+        
+        잠금은 잡지 않고 선택만 기록합니다 (forward마다 _before_forward에서 공유 잠금).
+        
+        Args:
+            adapter_names: 배치 행별 어댑터 이름 목록 (None은 기반 모델)
+        """
+        if not self._paths:
+            yield
+            return
+        
+        names = None
+        if any(name is not None for name in adapter_names):
+            names = [name if name is not None else BASE_ADAPTER for name in adapter_names]
+        
+        previous = getattr(self._selection, "names", None)
+        self._selection.names = names
+        try:
+            yield
+        finally:
+            self._selection.names = previous
+    
+    def stats(self):
+        """어댑터 통계 반환"""
+        with self._lock:
+            return {
+                "registered": sorted(self._paths),
+                "loaded": {name: size for name, size in self._loaded.items()},
+                "in_use": {name: count for name, count in self._in_use.items() if count},
+                "bytes": sum(self._loaded.values()),
+                "max_bytes": self.max_bytes,
+                "loads": self.loads,
+                "evictions": self.evictions,
+            }
+    
+    def _load(self, name):
+        """어댑터를 기반 모델에 주입하고 가중치 로드"""
+        from peft import PeftConfig, inject_adapter_in_model, load_peft_weights, set_peft_model_state_dict
+        
+        path = self._paths[name]
+        weights_file = os.path.join(path, "adapter_model.safetensors")
+        estimate = os.path.getsize(weights_file) if os.path.exists(weights_file) else 0
+        
+        with self._model_lock.exclusive():
+            if name in self._loaded:
+                return
+            self._evict(reserve=estimate)
+            
+            start = time.perf_counter()
+            config = PeftConfig.from_pretrained(path)
+            config.inference_mode = True
+            with warnings.catch_warnings():
+                # 여러 어댑터를 한 모델에 주입할 때 나오는 경고 (의도된 사용)
+                warnings.simplefilter("ignore")
+                inject_adapter_in_model(config, self.model, adapter_name=name)
+            set_peft_model_state_dict(self.model, load_peft_weights(path, device=str(self.model.device)),
+                                      adapter_name=name)
+            
+            # 주입 직후 활성화된 어댑터를 끄고 select()를 통해서만 적용되도록 함
+            for module in self._lora_layers():
+                module.set_adapter([])
+                if id(module) not in self._hooked:
+                    module.register_forward_pre_hook(self._inject_adapter_names, with_kwargs=True)
+                    self._hooked.add(id(module))
+            
+            size = sum(
+                p.nelement() * p.element_size()
+                for n, p in self.model.named_parameters() if "lora_" in n and f".{name}." in n
+            )
+            with self._lock:
+                self._loaded[name] = size
+                self.loads += 1
+        logger.info(f"LoRA 어댑터 로드: {name} ({format_bytes(size)}, {time.perf_counter() - start:.2f}초)")
+    
+    def _unload(self, name):
+        """어댑터 레이어와 가중치 제거 (self._model_lock을 잡은 상태에서 호출)"""
+        for module in self._lora_layers():
+            if name in module.lora_A:
+                module.delete_adapter(name)
+        getattr(self.model, "peft_config", {}).pop(name, None)
+        with self._lock:
+            size = self._loaded.pop(name)
+        logger.info(f"LoRA 어댑터 내림: {name} ({format_bytes(size)})")
+    
+    def _evict(self, reserve=0):
+        """한도를 넘지 않도록 사용 중이 아닌 어댑터를 LRU 순서로 내림 (self._model_lock을 잡은 상태에서 호출)"""
+        with self._lock:
+            total = sum(self._loaded.values())
+            candidates = sorted(
+                (name for name in self._loaded if not self._in_use.get(name)),
+                key=lambda name: self._last_used.get(name, 0)
+            )
+        for name in candidates:
+            if total + reserve <= self.max_bytes:
+                break
+            total -= self._loaded[name]
+            self._unload(name)
+            self.evictions += 1
+    
+    def _lora_layers(self):
+        from peft.tuners.lora import LoraLayer
+        return [module for module in self.model.modules() if isinstance(module, LoraLayer)]
+    
+    def _before_forward(self, module, args):
+        self._model_lock.acquire_shared()
+    
+    def _after_forward(self, module, args, output):
+        self._model_lock.release_shared()
+    
+    def _inject_adapter_names(self, module, args, kwargs):
+        """LoRA 레이어 forward 전 훅: select()로 지정한 행별 어댑터 이름 전달"""
+        names = getattr(self._selection, "names", None)
+        if names is not None:
+            kwargs["adapter_names"] = names
+        return args, kwargs
+
+def adapter_context(adapters, adapter_names):
+    """어댑터 관리자가 없으면 아무것도 하지 않는 select()"""
+    if adapters is None:
+        return nullcontext()
+    return adapters.select(adapter_names)
\ No newline at end of file
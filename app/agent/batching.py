@@ -0,0 +1,166 @@
+import torch
+from transformers import LogitsProcessor, LogitsProcessorList, StoppingCriteria
+from app.config import Config
+from app.agent.stopping import StopMatcher, truncate_at_stop
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+class StopSequenceCriteria(StoppingCriteria):
+    """model.generate용 종료 조건 (행마다 StopMatcher로 새 토큰만 검사)"""
+    
+    def __init__(self, tokenizer, stop_strings, prompt_length, batch_size=1):
+        """
+        Args:
+            tokenizer: 토크나이저
+            stop_strings: 종료 문자열 목록
+            prompt_length: 입력 길이 (이후 토큰만 검사)
+            batch_size: 배치 크기
+        """
+        self.matchers = [StopMatcher(tokenizer, stop_strings) for _ in range(batch_size)]
+        self._seen = prompt_length
+    
+    def __call__(self, input_ids, scores, **kwargs):
+        new_ids = input_ids[:, self._seen:].tolist()
+        self._seen = input_ids.shape[1]
+        done = [matcher.update(ids) for matcher, ids in zip(self.matchers, new_ids)]
+        return torch.tensor(done, dtype=torch.bool, device=input_ids.device)
+
+class SeededSampler(LogitsProcessor):
+    """
+    요청별 난수 생성기로 샘플링하는 model.generate용 로짓 처리기
+    
+    온도를 적용한 분포에서 행마다 토큰 하나를 뽑고 나머지 로짓을 -inf로 가립니다.
+    그리디 디코딩(do_sample=False)과 함께 쓰면 뽑힌 토큰이 그대로 선택되므로
+    프로세스 전역 난수 상태를 건드리지 않고도 시드별로 재현되는 결과를 얻습니다.
+    """
+    
+    def __init__(self, temperature, generator):
+        """
+        Args:
+            temperature: 샘플링 온도 (0보다 커야 함)
+            generator: 샘플링에 쓸 torch.Generator (로짓과 같은 장치)
+        """
+        self.temperature = temperature
+        self.generator = generator
+    
+    def __call__(self, input_ids, scores):
+        probs = torch.softmax(scores.float() / self.temperature, dim=-1)
+        tokens = torch.multinomial(probs, num_samples=1, generator=self.generator)
+        return torch.full_like(scores, float("-inf")).scatter(1, tokens, 0.0)
+
+def sampling_kwargs(temperature, generator=None):
+    """
+    온도에 맞는 model.generate 샘플링 인자 (0 이하이면 그리디 디코딩)
+    
+    Args:
+        temperature: 샘플링 온도
+        generator: 시드가 고정된 요청의 난수 생성기 (주면 전역 난수 대신 이 생성기로 샘플링)
+    
+    Returns:
+        model.generate에 넘길 인자 사전
+    """
+    if temperature is None or temperature <= 0:
+        return {"do_sample": False}
+    if generator is not None:
+        return {"do_sample": False, "logits_processor": LogitsProcessorList([SeededSampler(temperature, generator)])}
+    return {"do_sample": True, "temperature": temperature}
+
+def plan_micro_batches(lengths, max_new_tokens, batch_size=None, max_batch_tokens=None):
+    """
+    프롬프트를 길이순으로 정렬해 마이크로 배치로 나눔
+    
+    비슷한 길이끼리 묶어 왼쪽 패딩 낭비를 줄이고, 긴 배치부터 실행해 메모리 부족을 일찍 드러냅니다.
+    
+    Args:
+        lengths: 프롬프트별 토큰 수
+        max_new_tokens: 최대 생성 토큰 수
+        batch_size: 배치당 최대 프롬프트 수 (기본값: Config.GENERATION_BATCH_SIZE)
+        max_batch_tokens: 배치당 최대 토큰 수(행 수 × (가장 긴 프롬프트 + 생성 토큰), 기본값: Config.GENERATION_BATCH_MAX_TOKENS)
+    
+    Returns:
+        입력 인덱스 목록의 목록
+    """
+    batch_size = batch_size or Config.GENERATION_BATCH_SIZE
+    max_batch_tokens = max_batch_tokens or Config.GENERATION_BATCH_MAX_TOKENS
+    
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True)
+    batches, current = [], []
+    for index in order:
+        # 길이 내림차순이므로 배치의 첫 프롬프트가 가장 김
+        longest = lengths[current[0]] if current else lengths[index]
+        if current and (len(current) >= batch_size or (len(current) + 1) * (longest + max_new_tokens) > max_batch_tokens):
+            batches.append(current)
+            current = []
+        current.append(index)
+    if current:
+        batches.append(current)
+    return batches
+
+def generate_batch(model, tokenizer, prompt_ids_list, max_new_tokens, temperature=0.7, stop_strings=None,
+                   batch_size=None, max_batch_tokens=None, return_exceptions=False, callback=None):
+    """
+    여러 프롬프트를 마이크로 배치로 묶어 생성
+    
+    Args:
+        model: 생성에 사용할 모델
+        tokenizer: 토크나이저
+        prompt_ids_list: 프롬프트별 토큰 ID 목록
+        max_new_tokens: 최대 생성 토큰 수
+        temperature: 샘플링 온도 (0 이하이면 그리디)
+        stop_strings: 종료 문자열 목록
+        batch_size: 배치당 최대 프롬프트 수
+        max_batch_tokens: 배치당 최대 토큰 수
+        return_exceptions: True이면 실패한 배치의 결과 자리에 예외 객체를 넣고 계속 진행
+        callback: 배치가 끝날 때마다 처리한 프롬프트 수를 받아 호출할 함수
+    
+    Returns:
+        입력 순서대로 정렬된 생성 텍스트 목록
+    """
+    device = model.device
+    pad_token_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else tokenizer.eos_token_id
+    eos_token_id = tokenizer.eos_token_id
+    results = [None] * len(prompt_ids_list)
+    
+    lengths = [len(ids) for ids in prompt_ids_list]
+    for indices in plan_micro_batches(lengths, max_new_tokens, batch_size, max_batch_tokens):
+        try:
+            # 왼쪽 패딩: 모든 행의 마지막 프롬프트 토큰이 같은 위치에 오도록 맞춤
+            width = max(lengths[i] for i in indices)
+            input_ids = torch.full((len(indices), width), pad_token_id, dtype=torch.long, device=device)
+            attention_mask = torch.zeros((len(indices), width), dtype=torch.long, device=device)
+            for row, index in enumerate(indices):
+                length = lengths[index]
+                input_ids[row, width - length:] = torch.tensor(prompt_ids_list[index], device=device)
+                attention_mask[row, width - length:] = 1
+            
+            stopping_criteria = []
+            if stop_strings:
+                stopping_criteria.append(StopSequenceCriteria(tokenizer, stop_strings, width, len(indices)))
+            
+            with torch.no_grad():
+                sequences = model.generate(
+                    input_ids,
+                    attention_mask=attention_mask,
+                    max_new_tokens=max_new_tokens,
+                    stopping_criteria=stopping_criteria,
+                    pad_token_id=pad_token_id,
+                    **sampling_kwargs(temperature)
+                )
+            
+            for row, index in enumerate(indices):
+                # 먼저 끝난 행은 패딩 토큰으로 채워지므로 EOS에서 자름
+                new_ids = sequences[row, width:].tolist()
+                if eos_token_id in new_ids:
+                    new_ids = new_ids[:new_ids.index(eos_token_id)]
+                results[index] = truncate_at_stop(tokenizer, new_ids, stop_strings)[0].strip()
+        except Exception as e:
+            if not return_exceptions:
+                raise
+            logger.error(f"배치 생성 중 오류 ({len(indices)}개 프롬프트): {str(e)}")
+            for index in indices:
+                results[index] = e
+        
+        if callback is not None:
+            callback(len(indices))
+    return results
\ No newline at end of file
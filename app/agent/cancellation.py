@@ -0,0 +1,143 @@
+import time
+import threading
+from contextlib import contextmanager
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+class GenerationCancelled(Exception):
+    """취소되었거나 기한이 지나 생성이 중단되었을 때 발생하는 예외"""
+    
+    def __init__(self, reason, partial=None):
+        """
+        Args:
+            reason: 'cancelled' 또는 'expired'
+            partial: 중단 전까지 생성된 텍스트
+        """
+        message = "요청이 취소되었습니다." if reason == "cancelled" else "요청 처리 기한이 지났습니다."
+        super().__init__(message)
+        self.reason = reason
+        self.partial = partial
+
+class CancellationToken:
+    """
+    요청 하나의 취소 신호와 기한
+    
+    생성 루프는 디코딩 단계 사이마다 stopped를 확인하고, 참이면 바로 멈춥니다.
+    """
+    
+    def __init__(self, timeout=None):
+        """
+        Args:
+            timeout: 지금부터의 처리 기한(초, None이나 0이면 기한 없음)
+        """
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self._event = threading.Event()
+        # 실제로 요청을 중단시킨 이유 (raise_if_stopped가 예외를 발생시킬 때 기록)
+        self.outcome = None
+    
+    def cancel(self):
+        """취소 요청"""
+        self._event.set()
+    
+    @property
+    def reason(self):
+        """중단 이유 ('cancelled', 'expired', 아직 진행 중이면 None)"""
+        if self._event.is_set():
+            return "cancelled"
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            return "expired"
+        return None
+    
+    @property
+    def stopped(self):
+        """취소되었거나 기한이 지났는지 여부"""
+        return self.reason is not None
+    
+    def remaining(self):
+        """남은 시간(초, 기한이 없으면 None)"""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+    
+    def raise_if_stopped(self, partial=None):
+        """중단되었으면 GenerationCancelled 발생"""
+        reason = self.reason
+        if reason is not None:
+            self.outcome = reason
+            raise GenerationCancelled(reason, partial)
+
+class CancellationRegistry:
+    """
+    진행 중인 요청의 취소 토큰 목록
+    
+    클라이언트가 정한 요청 ID로 토큰을 찾아 취소할 수 있게 하고, 요청이 끝날 때
+    완료·취소·기한 초과 횟수를 기록합니다. 생성이 끝난 뒤에 기한이 지난 요청은 완료로 셉니다.
+    요청마다 소유자(요청한 클라이언트)를 기록해 다른 클라이언트가 취소하지 못하게 합니다.
+    """
+    
+    def __init__(self):
+        self._tokens = {}
+        self._lock = threading.Lock()
+        
+        # 통계
+        self.completed = 0
+        self.cancelled = 0
+        self.expired = 0
+    
+    @contextmanager
+    def track(self, request_id, token, owner=None):
+        """
+        블록이 실행되는 동안 요청 ID로 토큰을 취소할 수 있게 등록
+        
+        Args:
+            request_id: 요청 ID (None이면 취소할 수 없지만 결과는 기록)
+            token: CancellationToken
+            owner: 요청한 클라이언트 (취소할 수 있는 클라이언트)
+        """
+        if request_id is not None:
+            with self._lock:
+                self._tokens[request_id] = (token, owner)
+        try:
+            yield token
+        finally:
+            reason = token.outcome
+            with self._lock:
+                if request_id is not None and self._tokens.get(request_id, (None,))[0] is token:
+                    del self._tokens[request_id]
+                if reason == "cancelled":
+                    self.cancelled += 1
+                elif reason == "expired":
+                    self.expired += 1
+                else:
+                    self.completed += 1
+            if reason is not None:
+                logger.info(f"요청 중단 ({reason}): {request_id}")
+    
+    def cancel(self, request_id, owner=None):
+        """
+        요청 취소
+        
+        Args:
+            request_id: 요청 ID
+            owner: 취소를 요청한 클라이언트 (None이면 소유자와 관계없이 취소, 관리자용)
+        
+        Returns:
+            진행 중인 요청을 찾아 취소했는지 여부 (다른 클라이언트의 요청이면 False)
+        """
+        with self._lock:
+            token, token_owner = self._tokens.get(request_id, (None, None))
+        if token is None or (owner is not None and owner != token_owner):
+            return False
+        token.cancel()
+        return True
+    
+    def stats(self):
+        """요청 결과별 횟수 반환"""
+        with self._lock:
+            return {
+                "active": len(self._tokens),
+                "completed": self.completed,
+                "cancelled": self.cancelled,
+                "expired": self.expired,
+            }
\ No newline at end of file
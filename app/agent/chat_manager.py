@@ -3,16 +3,17 @@ from app.utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
-def run_cli_interface(model_name=None):
+def run_cli_interface(model_name=None, precision=None):
     """
     CLI 인터페이스 실행
     
     Args:
         model_name: 사용할 모델 이름
+        precision: 모델 정밀도 모드
     """
     # 에이전트 초기화
     print("🤖 DeepSeek 에이전트 초기화 중...")
-    agent = DeepSeekAgent(model_name)
+    agent = DeepSeekAgent(model_name, precision)
     print("✅ 초기화 완료!")
     
     print("\n🚀 DeepSeek AI 에이전트가 시작되었습니다.")
@@ -30,6 +31,8 @@ def run_cli_interface(model_name=None):
             print(agent.clear_history())
             continue
         
-        print("\n🤔 생각 중...")
-        response = agent.generate_response(user_input)
-        print(f"\n🤖 응답: {response}")
\ No newline at end of file
+        # 토큰이 디코딩되는 대로 바로 출력
+        print("\n🤖 응답: ", end="", flush=True)
+        for text in agent.stream_response(user_input):
+            print(text, end="", flush=True)
+        print()
\ No newline at end of file
@@ -0,0 +1,164 @@
+import queue
+import threading
+from app.config import Config
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+class ContextManager:
+    """토큰 예산 기반 대화 컨텍스트 관리 클래스"""
+    
+    # 요약 작업자는 모든 세션이 공유 (세션마다 스레드를 만들지 않음)
+    _jobs = queue.Queue()
+    _worker = None
+    _worker_lock = threading.Lock()
+    
+    def __init__(self, agent, token_budget=None, mode=None, summary_max_tokens=None):
+        """
+        컨텍스트 관리자 초기화
+        
+        Args:
+            agent: DeepSeekAgent 인스턴스
+            token_budget: 프롬프트(기록 + 질문)에 허용할 최대 토큰 수
+            mode: 오래된 턴 처리 방식 ("summarize" 또는 "drop")
+            summary_max_tokens: 요약문 최대 토큰 수
+        """
+        self.agent = agent
+        self.token_budget = token_budget or Config.CONTEXT_TOKEN_BUDGET
+        self.mode = mode or Config.HISTORY_COMPACTION
+        self.summary_max_tokens = summary_max_tokens or Config.SUMMARY_MAX_TOKENS
+        
+        # 한 번 넘치면 예산의 75%까지 줄여 KV 캐시 재계산이 자주 일어나지 않도록 함
+        self.low_water = int(self.token_budget * 0.75)
+        
+        # 통계
+        self.evicted_messages = 0
+        self.evicted_tokens = 0
+        self.summarized_tokens = 0
+        self.summaries = 0
+        
+        # 백그라운드 요약 작업자 상태
+        self._summary = None
+        self._summary_ready = False
+        self._epoch = 0
+        self._state_lock = threading.Lock()
+    
+    def history_tokens(self, history):
+        """대화 기록의 전체 토큰 수"""
+        return sum(len(self.agent._message_token_ids(message)) for message in history)
+    
+    def apply_pending(self, history):
+        """
+        완료된 백그라운드 요약을 대화 기록 맨 앞에 반영
+        
+        Args:
+            history: 대화 기록 (제자리에서 수정됨)
+        """
+        with self._state_lock:
+            if not self._summary_ready:
+                return
+            summary = self._summary
+            self._summary_ready = False
+        
+        message = {"role": "summary", "content": summary}
+        if history and history[0]["role"] == "summary":
+            history[0] = message
+        else:
+            history.insert(0, message)
+        logger.info(f"대화 요약 반영: {len(self.agent._message_token_ids(message))} 토큰")
+    
+    def enforce(self, history, query_tokens):
+        """
+        기록과 새 질문이 토큰 예산을 넘지 않도록 오래된 턴 제거
+        
+        제거된 턴은 요약 모드일 때 백그라운드 작업자에게 넘겨집니다.
+        
+        Args:
+            history: 대화 기록 (제자리에서 수정됨)
+            query_tokens: 새 질문 구간의 토큰 수
+        """
+        total = self.history_tokens(history) + query_tokens
+        if total <= self.token_budget:
+            return
+        
+        # 기존 요약은 제거하지 않고 다음 요약에 합쳐짐
+        start = 1 if history and history[0]["role"] == "summary" else 0
+        evicted = []
+        while total > self.low_water and len(history) > start:
+            message = history.pop(start)
+            tokens = len(self.agent._message_token_ids(message))
+            total -= tokens
+            self.evicted_messages += 1
+            self.evicted_tokens += tokens
+            evicted.append(message)
+        
+        if total > self.token_budget:
+            logger.warning(f"질문만으로 컨텍스트 예산을 초과합니다: {total}/{self.token_budget} 토큰")
+        
+        logger.info(f"컨텍스트 예산 초과로 {len(evicted)}개 메시지 제거 (남은 토큰: {total})")
+        
+        if evicted and self.mode == "summarize":
+            self._submit(evicted)
+    
+    def reset(self):
+        """대화 기록 초기화 시 진행 중인 요약 폐기"""
+        with self._state_lock:
+            self._epoch += 1
+            self._summary = None
+            self._summary_ready = False
+    
+    def stats(self):
+        """컨텍스트 관리 통계 반환"""
+        return {
+            "token_budget": self.token_budget,
+            "evicted_messages": self.evicted_messages,
+            "evicted_tokens": self.evicted_tokens,
+            "summarized_tokens": self.summarized_tokens,
+            "summaries": self.summaries,
+            "pending_summaries": ContextManager._jobs.qsize(),
+        }
+    
+    def _submit(self, messages):
+        """요약 작업을 백그라운드 작업자에게 전달"""
+        cls = ContextManager
+        with cls._worker_lock:
+            if cls._worker is None or not cls._worker.is_alive():
+                cls._worker = threading.Thread(target=cls._run_worker, name="history-summarizer", daemon=True)
+                cls._worker.start()
+        cls._jobs.put((self, self._epoch, messages))
+    
+    @staticmethod
+    def _run_worker():
+        """요약 작업 처리 루프"""
+        while True:
+            manager, epoch, messages = ContextManager._jobs.get()
+            try:
+                manager._summarize(epoch, messages)
+            except Exception as e:
+                logger.error(f"대화 요약 중 오류: {str(e)}")
+            finally:
+                ContextManager._jobs.task_done()
+    
+    def _summarize(self, epoch, messages):
+        """이전 요약과 제거된 턴을 합쳐 새 요약 생성"""
+        with self._state_lock:
+            if epoch != self._epoch:
+                return
+            previous = self._summary
+        
+        lines = []
+        if previous:
+            lines.append(f"이전 요약: {previous}")
+        for message in messages:
+            speaker = "사용자" if message["role"] == "user" else "어시스턴트"
+            lines.append(f"{speaker}: {message['content']}")
+        
+        summary = self.agent.summarize("\n".join(lines), self.summary_max_tokens)
+        
+        with self._state_lock:
+            if epoch != self._epoch:
+                return
+            self._summary = summary
+            self._summary_ready = True
+            self.summaries += 1
+            self.summarized_tokens += self.history_tokens(messages)
\ No newline at end of file
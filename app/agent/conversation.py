@@ -0,0 +1,158 @@
+import json
+import time
+import zlib
+import threading
+from app.agent.context_manager import ContextManager
+from app.agent.scheduler import cache_layers
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+def cache_length(cache):
+    """KV 캐시에 저장된 토큰 수 반환"""
+    if hasattr(cache, "get_seq_length"):
+        return cache.get_seq_length()
+    # 레거시 튜플 형식: ((key, value), ...) / key: [batch, heads, seq, dim]
+    return cache[0][0].shape[-2]
+
+class ConversationState:
+    """대화 세션 하나의 상태 (대화 기록, KV 캐시, 컨텍스트 관리자)"""
+    
+    def __init__(self, agent, session_id=None):
+        """
+        대화 상태 초기화
+        
+        Args:
+            agent: DeepSeekAgent 인스턴스 (토큰화와 요약에 사용)
+            session_id: 세션 ID (기본 세션이면 None)
+        """
+        self.session_id = session_id
+        self.history = []
+        self.context = ContextManager(agent)
+        self.lock = threading.RLock()
+        self.last_access = time.monotonic()
+        
+        # 이전 턴의 KV 캐시와 캐시에 담긴 토큰 ID
+        self.kv_cache = None
+        self.kv_token_ids = []
+        # KV 캐시를 만든 LoRA 어댑터 (어댑터가 바뀌면 KV를 재사용할 수 없음)
+        self.kv_adapter = None
+    
+    def touch(self):
+        """마지막 사용 시각 갱신"""
+        self.last_access = time.monotonic()
+    
+    def reset(self):
+        """대화 기록과 KV 캐시 초기화"""
+        self.history = []
+        self.context.reset()
+        self.reset_kv_cache()
+    
+    def reset_kv_cache(self):
+        """KV 캐시 폐기"""
+        self.kv_cache = None
+        self.kv_token_ids = []
+        self.kv_adapter = None
+    
+    def store_kv_cache(self, cache, sequence_ids, adapter=None):
+        """
+        생성 후 KV 캐시 보관
+        
+        Args:
+            cache: model.generate가 돌려준 KV 캐시
+            sequence_ids: 프롬프트와 생성 토큰을 합친 토큰 ID 목록
+            adapter: 캐시를 만든 LoRA 어댑터 이름
+        """
+        self.kv_cache = cache
+        self.kv_token_ids = sequence_ids[:cache_length(cache)] if cache is not None else []
+        self.kv_adapter = adapter if cache is not None else None
+    
+    def reusable_cache(self, input_ids, adapter=None):
+        """
+        새 입력과 공통 접두사를 공유하는 만큼 이전 KV 캐시를 재사용
+        
+        기록이 수정되어 접두사가 달라진 경우 캐시를 공통 부분까지 잘라내고,
+        잘라낼 수 없는 캐시라면 폐기합니다.
+        
+        Args:
+            input_ids: 이번 턴의 전체 입력 토큰 ID 목록
+            adapter: 이번 턴에 적용할 LoRA 어댑터 이름
+        
+        Returns:
+            재사용할 KV 캐시 (없으면 None)
+        """
+        if self.kv_cache is None:
+            return None
+        if adapter != self.kv_adapter:
+            self.reset_kv_cache()
+            return None
+        
+        common = 0
+        for cached_id, new_id in zip(self.kv_token_ids, input_ids):
+            if cached_id != new_id:
+                break
+            common += 1
+        
+        # 최소 한 토큰은 새로 프리필해야 다음 토큰의 로짓을 얻을 수 있음
+        common = min(common, len(input_ids) - 1)
+        if common <= 0:
+            self.reset_kv_cache()
+            return None
+        
+        length = cache_length(self.kv_cache)
+        if common < length:
+            if not hasattr(self.kv_cache, "crop"):
+                self.reset_kv_cache()
+                return None
+            # 음수 인자는 끝에서부터 해당 개수만큼 잘라냄
+            self.kv_cache.crop(common - length)
+            self.kv_token_ids = self.kv_token_ids[:common]
+        
+        logger.debug(f"KV 캐시 재사용: {common}/{len(input_ids)} 토큰")
+        return self.kv_cache
+    
+    def history_tokens(self):
+        """대화 기록에 보관된 토큰 수"""
+        return sum(len(message.get("token_ids") or ()) for message in self.history)
+    
+    def kv_bytes(self):
+        """KV 캐시가 차지하는 메모리(바이트)"""
+        if self.kv_cache is None:
+            return 0
+        return sum(
+            key.nelement() * key.element_size() + value.nelement() * value.element_size()
+            for key, value in cache_layers(self.kv_cache)
+        )
+    
+    def to_compact(self):
+        """
+        KV 캐시를 제외한 대화 기록을 압축된 바이트로 직렬화
+        
+        Returns:
+            압축된 대화 기록
+        """
+        history = [
+            {"role": message["role"], "content": message["content"], "token_ids": message.get("token_ids")}
+            for message in self.history
+        ]
+        return zlib.compress(json.dumps(history, ensure_ascii=False).encode("utf-8"))
+    
+    @classmethod
+    def from_compact(cls, agent, session_id, data):
+        """
+        압축된 대화 기록으로 대화 상태 복원 (KV 캐시는 다음 턴에 다시 프리필됨)
+        
+        Args:
+            agent: DeepSeekAgent 인스턴스
+            session_id: 세션 ID
+            data: to_compact()로 만든 바이트
+        
+        Returns:
+            복원된 ConversationState
+        """
+        state = cls(agent, session_id)
+        for message in json.loads(zlib.decompress(data).decode("utf-8")):
+            if message.get("token_ids") is not None:
+                message["tokenized_content"] = message["content"]
+            state.history.append(message)
+        return state
\ No newline at end of file
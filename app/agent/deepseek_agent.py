@@ -1,34 +1,123 @@
+import time
+import threading
+from contextlib import contextmanager
 import torch
-from transformers import AutoTokenizer, AutoModelForCausalLM
+from transformers import AutoTokenizer, AutoModelForCausalLM, StoppingCriteria, StoppingCriteriaList
 from app.config import Config
+from app.agent.adapters import AdapterManager, adapter_context
+from app.agent.batching import StopSequenceCriteria, generate_batch, sampling_kwargs
+from app.agent.conversation import ConversationState
+from app.agent.prefix_cache import PrefixCache
+from app.agent.scheduler import cache_layers
+from app.agent.speculative import SpeculativeDecoder
+from app.agent.stopping import (
+    DEFAULT_STOP_STRINGS, StopMatcher, filter_stop_strings, get_stop_strings, truncate_at_stop
+)
+from app.agent.streaming import TokenStreamer
 from app.utils.logger import setup_logger
+from app.utils.metrics import GenerationTimer
+from app.utils.model_registry import get_registry
+from app.utils.tracing import span
+from app.utils.system_utils import get_rss_bytes, format_bytes
 
 logger = setup_logger(__name__)
 
 class DeepSeekAgent:
     """DeepSeek 모델 기반 AI 에이전트"""
     
-    def __init__(self, model_name=None):
+    # 정밀도 모드별 로딩 dtype (int8은 fp32로 로드한 뒤 Linear 레이어를 동적 양자화)
+    PRECISION_DTYPES = {
+        "fp32": torch.float32,
+        "fp16": torch.float16,
+        "bf16": torch.bfloat16,
+        "int8": torch.float32,
+    }
+    
+    def __init__(self, model_name=None, precision=None, draft_model_name=None, registry=None):
         """
         DeepSeek 모델 기반 에이전트 초기화
         
         Args:
             model_name: 사용할 모델 이름 (기본값: Config.DEFAULT_MODEL)
+            precision: 정밀도 모드 ('auto', 'fp32', 'fp16', 'bf16', 'int8', 기본값: Config.MODEL_PRECISION)
+            draft_model_name: 추측 디코딩용 드래프트 모델 이름 (기본값: Config.DRAFT_MODEL, 비어 있으면 사용 안 함)
+            registry: 모델 레지스트리 (기본값: 프로세스 공유 레지스트리)
         """
         self.model_name = model_name or Config.DEFAULT_MODEL
+        self.draft_model_name = draft_model_name or Config.DRAFT_MODEL
         self.device = Config.DEVICE
+        self.registry = registry or get_registry()
         
         if self.device == "cuda" and not torch.cuda.is_available():
             logger.warning("CUDA를 사용할 수 없습니다. CPU로 전환합니다.")
             self.device = "cpu"
         
-        logger.info(f"장치: {self.device}, 모델: {self.model_name}")
+        self.precision = self._resolve_precision(precision or Config.MODEL_PRECISION)
+        
+        logger.info(f"장치: {self.device}, 모델: {self.model_name}, 정밀도: {self.precision}")
         
         # 토크나이저와 모델 로드
         self._load_model()
         
-        # 대화 기록 저장
-        self.conversation_history = []
+        # 추측 디코딩 (드래프트 모델이 설정된 경우에만)
+        self.speculative = None
+        if self.draft_model_name:
+            self._load_draft_model()
+        
+        # 요청별로 선택하는 LoRA 어댑터 (기반 모델 하나에 여러 어댑터를 함께 로드)
+        self.adapters = None
+        if self.precision != "int8":
+            self.adapters = AdapterManager(self.model)
+        elif Config.LORA_ADAPTERS:
+            logger.warning("int8 동적 양자화 모델에는 LoRA 어댑터를 주입할 수 없습니다. 어댑터를 사용하지 않습니다.")
+        
+        # 요청 간 공유 프리픽스 KV 캐시 (스케줄러가 연결되면 스케줄러도 함께 사용)
+        self.prefix_cache = PrefixCache() if Config.PREFIX_CACHE_ENABLED else None
+        
+        # 모델을 직접 호출할 때 생성을 직렬화하는 잠금
+        self._lock = threading.RLock()
+        
+        # 기본 대화 세션 (CLI 등 단일 사용자용). 웹 모드는 SessionPool의 세션을 넘겨 사용
+        self.session = ConversationState(self)
+        
+        # 연결된 경우 모든 생성은 스케줄러의 배치 디코딩 루프에서 실행됨
+        self.scheduler = None
+    
+    @property
+    def conversation_history(self):
+        """기본 세션의 대화 기록"""
+        return self.session.history
+    
+    @conversation_history.setter
+    def conversation_history(self, history):
+        self.session.history = history
+    
+    @property
+    def context(self):
+        """기본 세션의 컨텍스트 관리자"""
+        return self.session.context
+    
+    def _resolve_precision(self, precision):
+        """
+        장치에 맞는 정밀도 모드 결정
+        
+        Args:
+            precision: 요청한 정밀도 모드
+            
+        Returns:
+            실제 사용할 정밀도 모드
+        """
+        precision = precision.lower()
+        if precision == "auto":
+            return "fp16" if self.device == "cuda" else "fp32"
+        if precision not in self.PRECISION_DTYPES:
+            raise ValueError(f"지원하지 않는 정밀도 모드입니다: {precision}")
+        if precision == "int8" and self.device != "cpu":
+            logger.warning("int8 동적 양자화는 CPU에서만 지원됩니다. fp16으로 전환합니다.")
+            return "fp16"
+        if precision == "fp16" and self.device == "cpu":
+            logger.warning("CPU에서 fp16 연산은 느립니다. bf16 사용을 권장합니다.")
+        return precision
     
     def _load_model(self):
         """토크나이저와 모델 로드"""
@@ -36,26 +125,127 @@ class DeepSeekAgent:
         
         try:
             self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
-            self.model = AutoModelForCausalLM.from_pretrained(
-                self.model_name,
-                torch_dtype=torch.float16 if self.device == "cuda" else torch.float32,
-                trust_remote_code=True
-            ).to(self.device)
-            logger.info("모델 로딩 완료!")
+            self.model = self._resident_causal_lm(self.model_name)
+            
+            # 프롬프트 조립에 쓰이는 고정 토큰 (BOS 등 특수 토큰, 역할 구분자)
+            self._prefix_ids = self.tokenizer("").input_ids
+            self._assistant_prefix_ids = self._encode("Assistant:")
+            self._turn_separator_ids = self._encode("\n\n")
+            logger.info(f"모델 로딩 완료! (정밀도: {self.precision}, 상주 메모리: {format_bytes(get_rss_bytes())})")
         except Exception as e:
             logger.error(f"모델 로딩 실패: {str(e)}")
             raise
     
-    def add_to_history(self, role, content):
-        """대화 기록에 새 메시지 추가"""
-        self.conversation_history.append({"role": role, "content": content})
+    def _resident_causal_lm(self, model_name):
+        """
+        모델 레지스트리를 통해 언어 모델을 가져옴
+        
+        같은 모델과 정밀도를 쓰는 에이전트끼리 가중치를 공유합니다. 언어 모델은 세션 KV 캐시와
+        스케줄러가 직접 참조하므로 고정 상주(evictable=False)로 등록하며, 메모리 예산에는
+        포함되어 Whisper·TTS 모델이 그 나머지 안에서 교체됩니다.
+        
+        Args:
+            model_name: 모델 이름
+            
+        Returns:
+            추론 모드로 전환된 모델
+        """
+        key = f"llm:{model_name}:{self.precision}:{self.device}"
+        self.registry.register(key, lambda: self._load_causal_lm(model_name), evictable=False)
+        return self.registry.get(key)
+    
+    def _load_causal_lm(self, model_name):
+        """
+        현재 장치와 정밀도 모드로 언어 모델 로드
+        
+        Args:
+            model_name: 모델 이름
+            
+        Returns:
+            추론 모드로 전환된 모델
+        """
+        # device_map으로 가중치를 대상 장치에 바로 배치 (safetensors는 mmap으로 읽어
+        # CPU에 전체 사본을 한 번 더 만들지 않으므로 로딩 중 최대 RSS가 낮아짐)
+        model = AutoModelForCausalLM.from_pretrained(
+            model_name,
+            torch_dtype=self.PRECISION_DTYPES[self.precision],
+            device_map=self.device,
+            low_cpu_mem_usage=True,
+            trust_remote_code=True
+        )
+        model.eval()
+        
+        if self.precision == "int8":
+            # Linear 가중치를 int8로 저장하고 활성값은 실행 시 양자화 (메모리 대역폭 약 1/4)
+            model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        return model
+    
+    def _load_draft_model(self):
+        """추측 디코딩용 드래프트 모델 로드 (대상 모델과 토크나이저가 같아야 함)"""
+        logger.info(f"드래프트 모델 로딩 중: {self.draft_model_name}")
+        
+        draft_tokenizer = AutoTokenizer.from_pretrained(self.draft_model_name)
+        if draft_tokenizer.get_vocab() != self.tokenizer.get_vocab():
+            raise ValueError(f"드래프트 모델의 토크나이저가 대상 모델과 다릅니다: {self.draft_model_name}")
+        
+        draft_model = self._resident_causal_lm(self.draft_model_name)
+        self.speculative = SpeculativeDecoder(self.model, draft_model, Config.SPECULATIVE_DRAFT_TOKENS)
+        logger.info(f"드래프트 모델 로딩 완료! (제안 토큰 수: {Config.SPECULATIVE_DRAFT_TOKENS})")
+    
+    def _encode(self, text):
+        """특수 토큰 없이 텍스트를 토큰 ID 목록으로 변환"""
+        return self.tokenizer.encode(text, add_special_tokens=False)
+    
+    def _message_token_ids(self, message):
+        """
+        메시지 하나의 프롬프트 토큰 ID 반환
+        
+        메시지를 추가할 때 한 번만 토큰화하며, 내용이 외부에서 수정된 경우에만
+        다시 토큰화합니다.
+        
+        Args:
+            message: 대화 기록 메시지
+            
+        Returns:
+            "Human: ...\n\n" 또는 "Assistant: ...\n\n" 구간의 토큰 ID 목록
+        """
+        if message.get("token_ids") is None or message.get("tokenized_content") != message["content"]:
+            if message["role"] == "user":
+                message["token_ids"] = self._encode(f"Human: {message['content']}\n\n")
+            elif message["role"] == "summary":
+                message["token_ids"] = self._encode(f"이전 대화 요약: {message['content']}\n\n")
+            else:
+                message["token_ids"] = self._encode(f"Assistant: {message['content']}\n\n")
+            message["tokenized_content"] = message["content"]
+        return message["token_ids"]
     
-    def format_prompt(self, query):
+    def add_to_history(self, role, content, generated_ids=None, session=None):
+        """
+        대화 기록에 새 메시지 추가
+        
+        Args:
+            role: 메시지 역할 ("user" 또는 "assistant")
+            content: 메시지 내용
+            generated_ids: 모델이 생성한 응답 토큰 ID (있으면 재토큰화 없이 그대로 사용)
+            session: 대화 세션 (기본값: 기본 세션)
+        """
+        session = session or self.session
+        message = {"role": role, "content": content}
+        if generated_ids is not None:
+            message["token_ids"] = self._assistant_prefix_ids + list(generated_ids) + self._turn_separator_ids
+            message["tokenized_content"] = content
+        self._message_token_ids(message)
+        session.history.append(message)
+    
+    def format_prompt(self, query, session=None):
         """DeepSeek 형식에 맞게 프롬프트 포맷팅"""
+        session = session or self.session
         formatted_prompt = ""
-        for message in self.conversation_history:
+        for message in session.history:
             if message["role"] == "user":
                 formatted_prompt += f"Human: {message['content']}\n\n"
+            elif message["role"] == "summary":
+                formatted_prompt += f"이전 대화 요약: {message['content']}\n\n"
             else:
                 formatted_prompt += f"Assistant: {message['content']}\n\n"
         
@@ -63,56 +253,604 @@ class DeepSeekAgent:
         formatted_prompt += f"Human: {query}\n\nAssistant:"
         return formatted_prompt
     
-    def generate_response(self, query, max_length=2048, temperature=0.7):
+    def build_prompt_ids(self, query, session=None):
+        """
+        메시지별 토큰 ID를 이어 붙여 프롬프트 토큰 ID 생성
+        
+        format_prompt와 같은 프롬프트를 전체 재토큰화 없이 만듭니다.
+        
+        Args:
+            query: 새 사용자 질문
+            session: 대화 세션 (기본값: 기본 세션)
+            
+        Returns:
+            프롬프트 토큰 ID 목록
+        """
+        session = session or self.session
+        query_ids = self._encode(f"Human: {query}\n\n") + self._assistant_prefix_ids
+        
+        # 완료된 요약 반영 후 토큰 예산에 맞게 오래된 턴 정리
+        session.context.apply_pending(session.history)
+        session.context.enforce(session.history, len(self._prefix_ids) + len(query_ids))
+        
+        prompt_ids = list(self._prefix_ids)
+        for message in session.history:
+            prompt_ids.extend(self._message_token_ids(message))
+        prompt_ids.extend(query_ids)
+        return prompt_ids
+    
+    def attach_scheduler(self, scheduler):
+        """
+        생성 스케줄러 연결
+        
+        연결 후에는 모델을 직접 호출하지 않고 스케줄러에 요청을 제출하므로,
+        여러 스레드의 요청이 하나의 배치로 함께 디코딩됩니다.
+        
+        Args:
+            scheduler: GenerationScheduler 인스턴스
+        """
+        self.scheduler = scheduler
+    
+    @contextmanager
+    def _using_adapter(self, adapter):
+        """
+        턴이 끝날 때까지 LoRA 어댑터를 로드된 상태로 고정
+        
+        Args:
+            adapter: 어댑터 이름 (None이면 기반 모델)
+        
+        Raises:
+            KeyError: 등록되지 않은 어댑터
+        """
+        if adapter is None:
+            yield
+            return
+        if self.adapters is None:
+            raise KeyError(f"LoRA 어댑터를 사용할 수 없습니다: {adapter}")
+        self.adapters.acquire(adapter)
+        try:
+            yield
+        finally:
+            self.adapters.release(adapter)
+    
+    def _prepare_turn(self, session, query, adapter=None):
+        """
+        새 턴의 생성 입력 준비 (호출자가 session.lock을 잡고 있어야 함)
+        
+        Args:
+            session: 대화 세션
+            query: 사용자 질문
+            adapter: LoRA 어댑터 이름 (이전 턴과 다르면 KV 캐시를 재사용하지 않음)
+            
+        Returns:
+            (프롬프트 토큰 ID 목록, model.generate 인자 딕셔너리)
+        """
+        # 프롬프트 토큰 조립 (기록에 추가하기 전에 조립해야 질문이 중복되지 않음)
+        with span("tokenize"):
+            prompt_ids = self.build_prompt_ids(query, session)
+        
+        # 사용자 쿼리를 기록에 추가
+        self.add_to_history("user", query, session=session)
+        
+        input_ids = torch.tensor([prompt_ids], device=self.device)
+        generate_kwargs = {
+            "input_ids": input_ids,
+            "attention_mask": torch.ones_like(input_ids),
+            "past_key_values": session.reusable_cache(prompt_ids, adapter),
+            "pad_token_id": self.tokenizer.eos_token_id,
+            "use_cache": True,
+            "return_dict_in_generate": True,
+        }
+        return prompt_ids, generate_kwargs
+    
+    def _finish_turn(self, session, prompt_ids, outputs, stop_strings=None, adapter=None):
+        """
+        생성 결과로 KV 캐시와 대화 기록 갱신 (호출자가 session.lock을 잡고 있어야 함)
+        
+        Args:
+            session: 대화 세션
+            prompt_ids: 프롬프트 토큰 ID 목록
+            outputs: model.generate 결과
+            stop_strings: 응답에서 잘라낼 종료 문자열 목록
+            adapter: 생성에 사용한 LoRA 어댑터 이름
+            
+        Returns:
+            생성된 텍스트 응답
+        """
+        sequence_ids = outputs.sequences[0].tolist()
+        
+        # 다음 턴을 위해 KV 캐시 보관 (마지막 생성 토큰은 캐시에 포함되지 않음)
+        session.store_kv_cache(outputs.past_key_values, sequence_ids, adapter)
+        
+        # 새로 생성된 토큰만 디코딩 (EOS 제외)
+        new_ids = sequence_ids[len(prompt_ids):]
+        if new_ids and new_ids[-1] == self.tokenizer.eos_token_id:
+            new_ids = new_ids[:-1]
+        
+        # 종료 문자열과 그 뒤는 응답에서 제외 (토큰 경계가 맞지 않으면 기록용으로 재토큰화)
+        with span("detokenize", tokens=len(new_ids)):
+            text, new_ids = truncate_at_stop(self.tokenizer, new_ids, stop_strings)
+        response = text.strip()
+        
+        # 응답을 생성된 토큰 그대로 기록에 추가
+        self.add_to_history("assistant", response, generated_ids=new_ids, session=session)
+        return response
+    
+    def _fail_turn(self, session, e):
+        """생성 실패 처리 (호출자가 session.lock을 잡고 있어야 함)"""
+        logger.error(f"응답 생성 중 오류 발생: {str(e)}")
+        session.reset_kv_cache()
+        error_msg = f"오류가 발생했습니다: {str(e)}"
+        self.add_to_history("assistant", error_msg, session=session)
+        return error_msg
+    
+    def generate_response(self, query, max_new_tokens=None, temperature=0.7, session=None, speculative=False,
+                          stop_strings=None, adapter=None, cancel_token=None):
         """
         사용자 질문에 응답 생성
         
+        이전 턴의 KV 캐시를 유지하여 새로 추가된 토큰만 프리필합니다.
+        EOS나 종료 문자열(기본값: 다음 "Human:" 턴)이 나오면 바로 생성을 멈춥니다.
+        취소 토큰이 취소되거나 기한이 지나면 다음 디코딩 단계에서 멈추고, 그때까지의 응답을
+        기록에 남긴 뒤 GenerationCancelled를 발생시킵니다.
+        
         Args:
             query: 사용자 질문
-            max_length: 최대 토큰 생성 길이
+            max_new_tokens: 최대 생성 토큰 수 (기본값: Config.MAX_NEW_TOKENS, 대화 기록 길이와 무관)
             temperature: 응답 다양성 (낮을수록 결정적)
+            session: 대화 세션 (기본값: 기본 세션)
+            speculative: 드래프트 모델로 추측 디코딩 (드래프트 모델이 없으면 무시)
+            stop_strings: 종료 문자열 목록 (기본값: DEFAULT_STOP_STRINGS)
+            adapter: 적용할 LoRA 어댑터 이름 (None이면 기반 모델)
+            cancel_token: 디코딩 단계마다 확인할 CancellationToken
         
         Returns:
             생성된 텍스트 응답
+        
+        Raises:
+            GenerationCancelled: 취소되었거나 기한이 지난 경우
         """
-        # 사용자 쿼리를 기록에 추가
-        self.add_to_history("user", query)
+        session = session or self.session
+        max_new_tokens = max_new_tokens or Config.MAX_NEW_TOKENS
+        stop_strings = DEFAULT_STOP_STRINGS if stop_strings is None else stop_strings
+        # 세션 잠금 대기는 이 구간 안의 첫 하위 구간(tokenize) 앞 빈 시간으로 보임
+        with span("generate_response", speculative=speculative, adapter=adapter), \
+                session.lock, self._using_adapter(adapter):
+            session.touch()
+            if cancel_token is not None:
+                # 같은 세션의 이전 요청을 기다리는 동안 취소되었을 수 있음
+                cancel_token.raise_if_stopped()
+            response = self._respond(session, query, max_new_tokens, temperature, speculative, stop_strings,
+                                     adapter, cancel_token)
+        if cancel_token is not None:
+            cancel_token.raise_if_stopped(response)
+        return response
+    
+    def _respond(self, session, query, max_new_tokens, temperature, speculative, stop_strings, adapter, cancel_token):
+        """generate_response의 생성 경로 선택 (호출자가 session.lock을 잡고 있어야 함)"""
+        if speculative:
+            if self.speculative is not None:
+                return self._generate_speculative(session, query, max_new_tokens, temperature, stop_strings,
+                                                  adapter, cancel_token)
+            logger.warning("드래프트 모델이 로드되지 않아 일반 디코딩으로 생성합니다.")
+        if self.scheduler is not None:
+            return self._generate_scheduled(session, query, max_new_tokens, temperature, stop_strings, adapter,
+                                            cancel_token)
+        
+        with self._lock:
+            prompt_ids, generate_kwargs = self._prepare_turn(session, query, adapter)
+            timer = GenerationTimer(len(prompt_ids), self.model_name)
+            
+            try:
+                # 응답 생성
+                with torch.no_grad(), adapter_context(self.adapters, [adapter]):
+                    outputs = self.model.generate(
+                        **generate_kwargs,
+                        max_new_tokens=max_new_tokens,
+                        stopping_criteria=self._stopping_criteria(
+                            len(prompt_ids), stop_strings, cancel_token=cancel_token, timer=timer
+                        ),
+                        **self._sampling_kwargs(temperature)
+                    )
+                timer.finish()
+                return self._finish_turn(session, prompt_ids, outputs, stop_strings, adapter)
+            
+            except Exception as e:
+                return self._fail_turn(session, e)
+    
+    def stream_response(self, query, max_new_tokens=None, temperature=0.7, session=None, stop_strings=None,
+                        adapter=None, cancel_token=None):
+        """
+        사용자 질문에 대한 응답을 디코딩되는 대로 조각 단위로 생성
+        
+        생성은 별도 스레드에서 실행되고, 호출자는 토큰이 나오는 즉시 텍스트를 받습니다.
+        소비자가 중간에 반복을 멈추거나 취소 토큰이 멈추면 생성도 다음 디코딩 단계에서 중단됩니다.
+        종료 문자열은 출력되지 않습니다.
+        
+        Args:
+            query: 사용자 질문
+            max_new_tokens: 최대 생성 토큰 수 (기본값: Config.MAX_NEW_TOKENS)
+            temperature: 응답 다양성 (낮을수록 결정적)
+            session: 대화 세션 (기본값: 기본 세션)
+            stop_strings: 종료 문자열 목록 (기본값: DEFAULT_STOP_STRINGS)
+            adapter: 적용할 LoRA 어댑터 이름 (None이면 기반 모델)
+            cancel_token: 디코딩 단계마다 확인할 CancellationToken
+        
+        Yields:
+            새로 디코딩된 텍스트 조각
+        """
+        session = session or self.session
+        max_new_tokens = max_new_tokens or Config.MAX_NEW_TOKENS
+        stop_strings = DEFAULT_STOP_STRINGS if stop_strings is None else stop_strings
+        with session.lock, self._using_adapter(adapter):
+            session.touch()
+            if self.scheduler is not None:
+                yield from self._stream_scheduled(session, query, max_new_tokens, temperature, stop_strings, adapter,
+                                                  cancel_token)
+                return
+            
+            with self._lock:
+                prompt_ids, generate_kwargs = self._prepare_turn(session, query, adapter)
+                streamer = TokenStreamer(self.tokenizer)
+                timer = GenerationTimer(len(prompt_ids), self.model_name)
+                result = {}
+                
+                def run_generation():
+                    try:
+                        with torch.no_grad(), adapter_context(self.adapters, [adapter]):
+                            result["outputs"] = self.model.generate(
+                                **generate_kwargs,
+                                max_new_tokens=max_new_tokens,
+                                streamer=streamer,
+                                stopping_criteria=self._stopping_criteria(
+                                    len(prompt_ids), stop_strings, streamer, cancel_token, timer
+                                ),
+                                **self._sampling_kwargs(temperature)
+                            )
+                        timer.finish()
+                    except Exception as e:
+                        result["error"] = e
+                        streamer.end()
+                
+                thread = threading.Thread(target=run_generation, name="stream-generation", daemon=True)
+                thread.start()
+                
+                try:
+                    yield from filter_stop_strings(_strip_leading_whitespace(streamer), stop_strings)
+                finally:
+                    streamer.cancel()
+                    thread.join()
+                    if "error" in result:
+                        error_msg = self._fail_turn(session, result["error"])
+                    else:
+                        error_msg = None
+                        self._finish_turn(session, prompt_ids, result["outputs"], stop_strings, adapter)
+                
+                if error_msg:
+                    yield error_msg
+    
+    def _generate_speculative(self, session, query, max_new_tokens, temperature, stop_strings, adapter=None,
+                              cancel_token=None):
+        """
+        추측 디코딩을 통한 generate_response
+        
+        배치 크기 1로 동작하므로 스케줄러의 배치 루프를 거치지 않고 직접 실행합니다.
+        LoRA 어댑터는 대상 모델에만 적용되며, 검증 단계가 대상 모델의 분포를 유지하므로
+        드래프트 모델은 그대로 사용합니다.
+        """
+        with self._lock:
+            prompt_ids, generate_kwargs = self._prepare_turn(session, query, adapter)
+            try:
+                with adapter_context(self.adapters, [adapter]):
+                    outputs = self.speculative.generate(
+                        prompt_ids,
+                        max_new_tokens=max_new_tokens,
+                        temperature=temperature,
+                        past_key_values=generate_kwargs["past_key_values"],
+                        eos_token_id=self.tokenizer.eos_token_id,
+                        stop_matcher=StopMatcher(self.tokenizer, stop_strings),
+                        cancel_token=cancel_token
+                    )
+                return self._finish_turn(session, prompt_ids, outputs, stop_strings, adapter)
+            except Exception as e:
+                return self._fail_turn(session, e)
+    
+    def _submit_turn(self, session, query, max_new_tokens, temperature, stop_strings, streamer=None, adapter=None,
+                     cancel_token=None):
+        """
+        새 턴을 스케줄러에 제출 (호출자가 session.lock을 잡고 있어야 함)
         
-        # 프롬프트 포맷팅
-        prompt = self.format_prompt(query)
+        KV 캐시는 요청에 넘기고 생성이 끝나면 돌려받습니다.
         
-        # 입력 토큰화
-        inputs = self.tokenizer(prompt, return_tensors="pt").to(self.device)
+        Returns:
+            (프롬프트 토큰 ID 목록, GenerationRequest)
+        """
+        prompt_ids, generate_kwargs = self._prepare_turn(session, query, adapter)
+        past_key_values = generate_kwargs["past_key_values"]
+        session.reset_kv_cache()
         
+        request = self.scheduler.submit(
+            prompt_ids,
+            max_new_tokens=max_new_tokens,
+            temperature=temperature,
+            past_key_values=past_key_values,
+            streamer=streamer,
+            stop_strings=stop_strings,
+            adapter=adapter,
+            cancel_token=cancel_token
+        )
+        return prompt_ids, request
+    
+    def _complete_turn(self, session, prompt_ids, request, stop_strings):
+        """스케줄러 요청 결과로 턴 마무리"""
         try:
-            # 응답 생성
-            with torch.no_grad():
-                generated_ids = self.model.generate(
-                    inputs.input_ids,
-                    max_length=max_length,
-                    temperature=temperature,
-                    do_sample=True,
-                    pad_token_id=self.tokenizer.eos_token_id
-                )
+            request.wait()
+        except Exception as e:
+            return self._fail_turn(session, e)
+        return self._finish_turn(session, prompt_ids, request, stop_strings, request.adapter)
+    
+    def _generate_scheduled(self, session, query, max_new_tokens, temperature, stop_strings, adapter=None,
+                            cancel_token=None):
+        """스케줄러를 통한 generate_response"""
+        prompt_ids, request = self._submit_turn(
+            session, query, max_new_tokens, temperature, stop_strings, adapter=adapter, cancel_token=cancel_token
+        )
+        return self._complete_turn(session, prompt_ids, request, stop_strings)
+    
+    def _stream_scheduled(self, session, query, max_new_tokens, temperature, stop_strings, adapter=None,
+                          cancel_token=None):
+        """스케줄러를 통한 stream_response"""
+        streamer = TokenStreamer(self.tokenizer, skip_prompt=False)
+        prompt_ids, request = self._submit_turn(
+            session, query, max_new_tokens, temperature, stop_strings, streamer=streamer, adapter=adapter,
+            cancel_token=cancel_token
+        )
+        
+        try:
+            yield from filter_stop_strings(_strip_leading_whitespace(streamer), stop_strings)
+        finally:
+            streamer.cancel()
+            response = self._complete_turn(session, prompt_ids, request, stop_strings)
+        
+        if request.error is not None:
+            yield response
+    
+    def _stopping_criteria(self, prompt_length, stop_strings, streamer=None, cancel_token=None, timer=None):
+        """
+        model.generate용 종료 조건 목록
+        
+        Args:
+            prompt_length: 입력 토큰 수
+            stop_strings: 종료 문자열 목록
+            streamer: 소비자 중단을 확인할 스트리머
+            cancel_token: 취소·기한을 확인할 CancellationToken
+            timer: 토큰마다 시간을 기록할 GenerationTimer
+        """
+        criteria = StoppingCriteriaList()
+        if timer is not None:
+            criteria.append(_TokenTimed(timer))
+        if stop_strings:
+            criteria.append(StopSequenceCriteria(self.tokenizer, stop_strings, prompt_length))
+        if streamer is not None:
+            criteria.append(_StreamerCancelled(streamer))
+        if cancel_token is not None:
+            criteria.append(_TokenCancelled(cancel_token))
+        return criteria
+    
+    def _sampling_kwargs(self, temperature, seed=None):
+        """온도에 맞는 model.generate 샘플링 인자 (0 이하이면 그리디 디코딩, 시드가 있으면 요청별 생성기 사용)"""
+        generator = None
+        if seed is not None:
+            generator = torch.Generator(device=self.device).manual_seed(seed)
+        return sampling_kwargs(temperature, generator)
+    
+    def _generate_stateless(self, prompt_ids, max_new_tokens, temperature=0, seed=None, stop_strings=None,
+                            cancel_token=None):
+        """
+        대화 기록과 KV 캐시를 사용하지 않는 단발성 생성
+        
+        Args:
+            prompt_ids: 프롬프트 토큰 ID 목록
+            max_new_tokens: 최대 생성 토큰 수
+            temperature: 샘플링 온도 (0 이하이면 그리디)
+            seed: 샘플링 시드 (재현 가능한 결과가 필요할 때)
+            stop_strings: 종료 문자열 목록
+            cancel_token: 디코딩 단계마다 확인할 CancellationToken
             
-            # 생성된 텍스트 디코딩
-            response_text = self.tokenizer.decode(generated_ids[0], skip_special_tokens=True)
+        Returns:
+            생성된 텍스트
+        
+        Raises:
+            GenerationCancelled: 취소되었거나 기한이 지난 경우
+        """
+        if self.scheduler is not None:
+            output_ids = self.scheduler.generate(
+                prompt_ids, max_new_tokens, temperature=temperature, seed=seed, stop_strings=stop_strings,
+                cancel_token=cancel_token
+            )
+            with span("detokenize", tokens=len(output_ids)):
+                text = truncate_at_stop(self.tokenizer, output_ids, stop_strings)[0].strip()
+            if cancel_token is not None:
+                cancel_token.raise_if_stopped(text)
+            return text
+        
+        with self._lock:
+            input_ids = torch.tensor([prompt_ids], device=self.device)
+            timer = GenerationTimer(len(prompt_ids), self.model_name)
+            prefix_match = self.prefix_cache.match(prompt_ids) if self.prefix_cache is not None else None
+            try:
+                # 기반 모델로 생성 (어댑터 주입과 겹치지 않도록 select 안에서 실행)
+                with torch.no_grad(), adapter_context(self.adapters, [None]):
+                    outputs = self.model.generate(
+                        input_ids,
+                        attention_mask=torch.ones_like(input_ids),
+                        past_key_values=prefix_match.cache if prefix_match is not None else None,
+                        max_new_tokens=max_new_tokens,
+                        stopping_criteria=self._stopping_criteria(
+                            len(prompt_ids), stop_strings, cancel_token=cancel_token, timer=timer
+                        ),
+                        pad_token_id=self.tokenizer.eos_token_id,
+                        use_cache=True,
+                        return_dict_in_generate=True,
+                        **self._sampling_kwargs(temperature, seed)
+                    )
+                timer.finish()
+                if prefix_match is not None:
+                    # 생성된 토큰을 제외한 프롬프트 부분의 KV만 저장
+                    self.prefix_cache.insert(prompt_ids, cache_layers(outputs.past_key_values))
+            finally:
+                if prefix_match is not None:
+                    self.prefix_cache.release(prefix_match)
+        output_ids = outputs.sequences[0, input_ids.shape[1]:].tolist()
+        with span("detokenize", tokens=len(output_ids)):
+            text = truncate_at_stop(self.tokenizer, output_ids, stop_strings)[0].strip()
+        if cancel_token is not None:
+            cancel_token.raise_if_stopped(text)
+        return text
+    
+    def generate_once(self, prompt, max_new_tokens=None, temperature=0.7, seed=None, stop_strings=None,
+                      cancel_token=None):
+        """
+        대화 기록 없이 단일 질문에 대한 응답 생성
+        
+        결과가 프롬프트와 생성 인자에만 의존하므로 응답 캐시에 사용할 수 있습니다.
+        
+        Args:
+            prompt: 질문
+            max_new_tokens: 최대 생성 토큰 수 (기본값: Config.MAX_NEW_TOKENS)
+            temperature: 응답 다양성 (0이면 결정적)
+            seed: 샘플링 시드
+            stop_strings: 종료 문자열 목록 (기본값: DEFAULT_STOP_STRINGS)
+            cancel_token: 디코딩 단계마다 확인할 CancellationToken
             
-            # 프롬프트 부분 제거하고 응답만 추출
-            response = response_text[len(prompt):].strip()
+        Returns:
+            생성된 텍스트 응답
+        
+        Raises:
+            GenerationCancelled: 취소되었거나 기한이 지난 경우 (부분 결과는 캐시되지 않음)
+        """
+        with span("tokenize"):
+            prompt_ids = self._prefix_ids + self._encode(f"Human: {prompt}\n\n") + self._assistant_prefix_ids
+        return self._generate_stateless(
+            prompt_ids,
+            max_new_tokens or Config.MAX_NEW_TOKENS,
+            temperature,
+            seed,
+            DEFAULT_STOP_STRINGS if stop_strings is None else stop_strings,
+            cancel_token
+        )
+    
+    def generate_batch(self, prompts, max_new_tokens=None, temperature=0.7, stop_strings=None, batch_size=None):
+        """
+        대화 기록 없이 여러 질문에 대한 응답을 한꺼번에 생성
+        
+        스케줄러가 연결되어 있으면 모든 요청을 제출해 연속 배칭에 맡기고, 아니면 길이순
+        마이크로 배치로 나눠 왼쪽 패딩한 배치 생성을 실행합니다.
+        
+        Args:
+            prompts: 질문 목록
+            max_new_tokens: 최대 생성 토큰 수 (기본값: Config.MAX_NEW_TOKENS)
+            temperature: 응답 다양성 (0이면 결정적)
+            stop_strings: 종료 문자열 목록 (기본값: DEFAULT_STOP_STRINGS)
+            batch_size: 배치당 최대 프롬프트 수 (기본값: Config.GENERATION_BATCH_SIZE)
             
-            # 응답을 기록에 추가
-            self.add_to_history("assistant", response)
+        Returns:
+            입력 순서대로 정렬된 응답 목록
+        """
+        max_new_tokens = max_new_tokens or Config.MAX_NEW_TOKENS
+        stop_strings = DEFAULT_STOP_STRINGS if stop_strings is None else stop_strings
+        prompt_ids_list = [
+            self._prefix_ids + self._encode(f"Human: {prompt}\n\n") + self._assistant_prefix_ids
+            for prompt in prompts
+        ]
+        
+        if self.scheduler is not None:
+            requests = [
+                self.scheduler.submit(prompt_ids, max_new_tokens, temperature, stop_strings=stop_strings)
+                for prompt_ids in prompt_ids_list
+            ]
+            return [
+                truncate_at_stop(self.tokenizer, request.wait().output_ids, stop_strings)[0].strip()
+                for request in requests
+            ]
+        
+        with self._lock, adapter_context(self.adapters, [None]):
+            return generate_batch(
+                self.model, self.tokenizer, prompt_ids_list, max_new_tokens,
+                temperature=temperature, stop_strings=stop_strings, batch_size=batch_size
+            )
+    
+    def summarize(self, text, max_new_tokens=256):
+        """
+        대화 내용 요약 (컨텍스트 관리자의 백그라운드 작업자에서 호출)
+        
+        대화용 KV 캐시는 건드리지 않습니다.
+        
+        Args:
+            text: 요약할 대화 내용
+            max_new_tokens: 요약문 최대 토큰 수
             
-            return response
+        Returns:
+            요약문
+        """
+        prompt = f"Human: 다음 대화를 이후 대화에 필요한 핵심 정보만 남겨 간결하게 요약해 주세요.\n\n{text}\n\nAssistant:"
+        return self._generate_stateless(
+            self._prefix_ids + self._encode(prompt), max_new_tokens, stop_strings=get_stop_strings("summary")
+        )
+    
+    def warmup(self, max_new_tokens=8):
+        """
+        워밍업 생성 (첫 요청이 커널 초기화·메모리 할당 비용을 떠안지 않도록 서비스 전에 실행)
         
-        except Exception as e:
-            logger.error(f"응답 생성 중 오류 발생: {str(e)}")
-            error_msg = f"오류가 발생했습니다: {str(e)}"
-            self.add_to_history("assistant", error_msg)
-            return error_msg
+        Args:
+            max_new_tokens: 생성할 토큰 수
+        """
+        start = time.perf_counter()
+        self._generate_stateless(self._prefix_ids + self._encode("Human: hello\n\nAssistant:"), max_new_tokens)
+        logger.info(f"워밍업 생성 완료 ({time.perf_counter() - start:.2f}초)")
     
-    def clear_history(self):
+    def clear_history(self, session=None):
         """대화 기록 초기화"""
-        self.conversation_history = []
-        return "대화 기록이 초기화되었습니다."
\ No newline at end of file
+        session = session or self.session
+        with session.lock:
+            session.reset()
+        return "대화 기록이 초기화되었습니다."
+
+def _strip_leading_whitespace(chunks):
+    """응답 앞의 공백 생략 (generate_response의 strip()과 결과를 맞춤)"""
+    started = False
+    for text in chunks:
+        if not started:
+            text = text.lstrip()
+            if not text:
+                continue
+            started = True
+        yield text
+
+class _StreamerCancelled(StoppingCriteria):
+    """스트림 소비자가 반복을 멈추면 생성을 중단하는 조건"""
+    
+    def __init__(self, streamer):
+        self.streamer = streamer
+    
+    def __call__(self, input_ids, scores, **kwargs):
+        return torch.full((input_ids.shape[0],), self.streamer.cancelled, dtype=torch.bool, device=input_ids.device)
+
+class _TokenCancelled(StoppingCriteria):
+    """요청이 취소되었거나 기한이 지나면 생성을 중단하는 조건"""
+    
+    def __init__(self, cancel_token):
+        self.cancel_token = cancel_token
+    
+    def __call__(self, input_ids, scores, **kwargs):
+        return torch.full((input_ids.shape[0],), self.cancel_token.stopped, dtype=torch.bool, device=input_ids.device)
+
+class _TokenTimed(StoppingCriteria):
+    """생성 단계마다 GenerationTimer에 토큰을 기록하는 조건 (생성을 멈추지 않음)"""
+    
+    def __init__(self, timer):
+        self.timer = timer
+    
+    def __call__(self, input_ids, scores, **kwargs):
+        self.timer.token()
+        return torch.zeros((input_ids.shape[0],), dtype=torch.bool, device=input_ids.device)
\ No newline at end of file
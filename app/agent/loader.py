@@ -0,0 +1,130 @@
+import time
+import threading
+from app.config import Config
+from app.utils.logger import setup_logger
+from app.utils.metrics import request_labels
+from app.utils.system_utils import get_rss_bytes
+
+logger = setup_logger(__name__)
+
+class AgentLoader:
+    """
+    백그라운드 에이전트 로더
+    
+    웹 서버가 모델 로딩을 기다리지 않고 바로 포트를 열 수 있도록 torch/transformers 임포트,
+    모델 로딩, 준비 작업(스케줄러 연결 등), 워밍업 생성을 별도 스레드에서 실행합니다.
+    워밍업까지 끝나야 준비 완료로 보고합니다.
+    """
+    
+    # 로딩 단계 (진행률 계산에 사용)
+    STAGES = ["pending", "importing", "loading_model", "preparing", "warming_up", "ready"]
+    
+    def __init__(self, model_name=None, precision=None, on_loaded=None, warmup_tokens=None, agent=None):
+        """
+        로더 초기화
+        
+        Args:
+            model_name: 사용할 모델 이름
+            precision: 정밀도 모드
+            on_loaded: 모델 로딩 직후 에이전트를 받아 호출할 준비 함수
+            warmup_tokens: 워밍업 생성 토큰 수 (기본값: Config.MODEL_WARMUP_TOKENS, 0이면 생략)
+            agent: 이미 로드된 에이전트 (fork 전에 로드한 경우, 준비와 워밍업만 실행)
+        """
+        self.model_name = model_name or (agent.model_name if agent is not None else None)
+        self.preloaded = agent
+        self.precision = precision
+        self.on_loaded = on_loaded
+        self.warmup_tokens = Config.MODEL_WARMUP_TOKENS if warmup_tokens is None else warmup_tokens
+        
+        self.agent = None
+        self.stage = "pending"
+        self.error = None
+        self._started_at = None
+        self._finished_at = None
+        self._done = threading.Event()
+        self._thread = None
+    
+    def start(self):
+        """백그라운드 로딩 시작"""
+        if self._thread is None:
+            self._started_at = time.monotonic()
+            self._thread = threading.Thread(target=self._run, name="agent-loader", daemon=True)
+            self._thread.start()
+        return self
+    
+    @property
+    def ready(self):
+        """서비스 준비 여부"""
+        return self.stage == "ready"
+    
+    @property
+    def failed(self):
+        """로딩 실패 여부"""
+        return self.stage == "failed"
+    
+    def wait(self, timeout=None):
+        """
+        로딩이 끝날 때까지 대기
+        
+        Returns:
+            준비 완료 여부
+        """
+        self._done.wait(timeout)
+        return self.ready
+    
+    def status(self):
+        """로딩 진행 상황 반환"""
+        if self._started_at is None:
+            elapsed = 0.0
+        else:
+            elapsed = (self._finished_at or time.monotonic()) - self._started_at
+        
+        if self.failed:
+            progress = 0.0
+        else:
+            progress = self.STAGES.index(self.stage) / (len(self.STAGES) - 1)
+        
+        status = {
+            "status": self.stage,
+            "progress": round(progress, 2),
+            "elapsed_seconds": round(elapsed, 2),
+            "model": self.model_name or Config.DEFAULT_MODEL,
+            "rss_bytes": get_rss_bytes(),
+        }
+        if self.error:
+            status["error"] = self.error
+        return status
+    
+    def _run(self):
+        """로딩 스레드 본체"""
+        try:
+            if self.preloaded is not None:
+                agent = self.preloaded
+            else:
+                # torch/transformers 임포트 자체도 수 초가 걸리므로 로딩 스레드에서 처리
+                self.stage = "importing"
+                from app.agent.deepseek_agent import DeepSeekAgent
+                
+                self.stage = "loading_model"
+                agent = DeepSeekAgent(self.model_name, self.precision)
+            
+            self.stage = "preparing"
+            if self.on_loaded is not None:
+                self.on_loaded(agent)
+            
+            if self.warmup_tokens > 0:
+                self.stage = "warming_up"
+                with request_labels("warmup", "warmup", agent.model_name):
+                    agent.warmup(self.warmup_tokens)
+            
+            self.agent = agent
+            self.stage = "ready"
+            self._finished_at = time.monotonic()
+            logger.info(f"서비스 준비 완료 ({self._finished_at - self._started_at:.1f}초)")
+        except Exception as e:
+            self.error = str(e)
+            self.stage = "failed"
+            self._finished_at = time.monotonic()
+            logger.error(f"에이전트 로딩 실패: {str(e)}")
+        finally:
+            self._done.set()
\ No newline at end of file
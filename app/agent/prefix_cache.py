@@ -0,0 +1,239 @@
+import time
+import threading
+import torch
+from app.config import Config
+from app.agent.scheduler import build_cache
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+class _Node:
+    """라딕스 트리 노드 (간선 토큰들과 그 위치의 KV 블록)"""
+    
+    def __init__(self, parent=None, token_ids=(), layers=None):
+        self.parent = parent
+        self.token_ids = list(token_ids)
+        self.layers = layers or []  # 레이어별 (key, value) / key: [1, heads, len(token_ids), dim]
+        self.children = {}
+        self.ref_count = 0
+        self.last_access = time.monotonic()
+    
+    @property
+    def nbytes(self):
+        return sum(k.nelement() * k.element_size() + v.nelement() * v.element_size() for k, v in self.layers)
+
+class PrefixMatch:
+    """프리픽스 조회 결과 (release() 전까지 일치한 경로의 노드는 제거되지 않음)"""
+    
+    def __init__(self, length, cache, node):
+        self.length = length
+        self.cache = cache
+        self.node = node
+
+class PrefixCache:
+    """
+    요청 간 공유 프리픽스 KV 캐시
+    
+    프롬프트 토큰을 라딕스 트리로 저장하고 각 간선에 해당 위치의 KV 블록을 둡니다.
+    새 프롬프트가 캐시된 프롬프트와 앞부분을 공유하면 그만큼의 KV를 이어 붙여 재사용하므로,
+    작업 지시문이나 시스템 프롬프트처럼 고정된 앞부분은 한 번만 프리필됩니다.
+    사용 중인 노드는 참조 카운트로 보호하고, 메모리 한도를 넘으면 사용하지 않는
+    말단 노드부터 LRU 순서로 제거합니다. 참조는 일치한 경로의 마지막 노드에만 걸며,
+    그 조상 노드는 말단이 아니므로 함께 보호됩니다.
+    LoRA 어댑터마다 같은 토큰의 KV가 다르므로 네임스페이스(어댑터 이름)별로 트리를 따로 둡니다.
+    """
+    
+    def __init__(self, max_bytes=None, min_match_tokens=None):
+        """
+        프리픽스 캐시 초기화
+        
+        Args:
+            max_bytes: KV 블록 최대 총 메모리(바이트)
+            min_match_tokens: 재사용할 최소 일치 토큰 수 (짧은 일치는 복사 비용이 더 큼)
+        """
+        self.max_bytes = max_bytes or Config.PREFIX_CACHE_MB * 1024 * 1024
+        self.min_match_tokens = Config.PREFIX_CACHE_MIN_TOKENS if min_match_tokens is None else min_match_tokens
+        
+        self._roots = {None: _Node()}
+        self._lock = threading.Lock()
+        self._bytes = 0
+        
+        # 통계
+        self.lookups = 0
+        self.hits = 0
+        self.tokens_saved = 0
+        self.tokens_requested = 0
+        self.evictions = 0
+    
+    def match(self, token_ids, namespace=None):
+        """
+        가장 긴 공통 프리픽스의 KV 캐시 조회
+        
+        최소 한 토큰은 새로 프리필해야 하므로 마지막 토큰은 일치 대상에서 제외합니다.
+        반환된 결과는 사용이 끝나면 release()로 반납해야 합니다.
+        
+        Args:
+            token_ids: 프롬프트 토큰 ID 목록
+            namespace: KV를 만든 어댑터 이름 (기반 모델이면 None)
+        
+        Returns:
+            PrefixMatch (일치가 짧으면 cache는 None)
+        """
+        limit = len(token_ids) - 1
+        with self._lock:
+            self.lookups += 1
+            self.tokens_requested += len(token_ids)
+            
+            nodes, length = [], 0
+            node = self._roots.get(namespace) or _Node()
+            while length < limit:
+                child = node.children.get(token_ids[length])
+                if child is None:
+                    break
+                common = _common_length(child.token_ids, token_ids[length:limit])
+                if common < len(child.token_ids):
+                    if common == 0:
+                        break
+                    child = self._split(child, common)
+                nodes.append(child)
+                length += common
+                node = child
+            
+            if not nodes or length < self.min_match_tokens:
+                return PrefixMatch(0, None, None)
+            
+            now = time.monotonic()
+            for node in nodes:
+                node.last_access = now
+            nodes[-1].ref_count += 1
+            self.hits += 1
+            self.tokens_saved += length
+            
+            # 블록을 이어 붙여 새 텐서로 복사 (모델이 캐시를 늘려도 원본 블록은 그대로 유지)
+            num_layers = len(nodes[0].layers)
+            layers = [
+                (torch.cat([n.layers[i][0] for n in nodes], dim=-2), torch.cat([n.layers[i][1] for n in nodes], dim=-2))
+                for i in range(num_layers)
+            ]
+        return PrefixMatch(length, build_cache(layers), nodes[-1])
+    
+    def release(self, match):
+        """조회 결과 반납 (참조 카운트 감소)"""
+        if match is None or match.node is None:
+            return
+        with self._lock:
+            match.node.ref_count -= 1
+            match.node = None
+    
+    def insert(self, token_ids, layers, namespace=None):
+        """
+        프롬프트의 KV를 캐시에 추가 (이미 있는 부분은 건너뜀)
+        
+        Args:
+            token_ids: 프롬프트 토큰 ID 목록
+            layers: 레이어별 (key, value) 텐서 목록 (배치 크기 1, 0번 위치부터 최소 len(token_ids) 토큰)
+            namespace: KV를 만든 어댑터 이름 (기반 모델이면 None)
+        """
+        with self._lock:
+            node = self._roots.setdefault(namespace, _Node())
+            length = 0
+            now = time.monotonic()
+            while length < len(token_ids):
+                child = node.children.get(token_ids[length])
+                if child is None:
+                    # 나머지 토큰을 새 말단 노드로 저장
+                    block = [
+                        (k[:, :, length:len(token_ids)].clone(), v[:, :, length:len(token_ids)].clone())
+                        for k, v in layers
+                    ]
+                    child = _Node(node, token_ids[length:], block)
+                    node.children[token_ids[length]] = child
+                    self._bytes += child.nbytes
+                    length = len(token_ids)
+                else:
+                    common = _common_length(child.token_ids, token_ids[length:])
+                    if common < len(child.token_ids):
+                        child = self._split(child, common)
+                    length += common
+                child.last_access = now
+                node = child
+            
+            if self._bytes > self.max_bytes:
+                self._evict()
+    
+    def stats(self):
+        """프리픽스 캐시 통계 반환"""
+        with self._lock:
+            return {
+                "nodes": sum(self._count_nodes(root) - 1 for root in self._roots.values()),
+                "bytes": self._bytes,
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "hit_ratio": self.hits / self.lookups if self.lookups else 0.0,
+                "tokens_saved": self.tokens_saved,
+                "token_reuse_ratio": self.tokens_saved / self.tokens_requested if self.tokens_requested else 0.0,
+                "evictions": self.evictions,
+            }
+    
+    def clear(self):
+        """사용 중이지 않은 모든 블록 제거"""
+        with self._lock:
+            self._evict(target=0)
+    
+    def _split(self, node, length):
+        """
+        노드를 앞쪽 length 토큰과 나머지로 분할 (self._lock을 잡은 상태에서 호출)
+        
+        Returns:
+            앞쪽 절반 노드
+        """
+        head = _Node(
+            node.parent,
+            node.token_ids[:length],
+            [(k[:, :, :length].clone(), v[:, :, :length].clone()) for k, v in node.layers]
+        )
+        head.last_access = node.last_access
+        node.parent.children[node.token_ids[0]] = head
+        
+        node.layers = [(k[:, :, length:].clone(), v[:, :, length:].clone()) for k, v in node.layers]
+        node.token_ids = node.token_ids[length:]
+        node.parent = head
+        head.children[node.token_ids[0]] = node
+        return head
+    
+    def _evict(self, target=None):
+        """한도의 90% 이하가 될 때까지 사용하지 않는 말단 노드를 LRU 순서로 제거"""
+        target = int(self.max_bytes * 0.9) if target is None else target
+        while self._bytes > target:
+            leaves = [
+                node for root in self._roots.values() for node in self._leaves(root) if node.ref_count == 0
+            ]
+            if not leaves:
+                break
+            leaves.sort(key=lambda node: node.last_access)
+            for node in leaves:
+                if self._bytes <= target:
+                    break
+                del node.parent.children[node.token_ids[0]]
+                self._bytes -= node.nbytes
+                self.evictions += 1
+        logger.debug(f"프리픽스 캐시 정리 완료: {self._bytes} 바이트")
+    
+    def _leaves(self, node):
+        for child in node.children.values():
+            if child.children:
+                yield from self._leaves(child)
+            else:
+                yield child
+    
+    def _count_nodes(self, node):
+        return 1 + sum(self._count_nodes(child) for child in node.children.values())
+
+def _common_length(a, b):
+    """두 토큰 목록의 공통 프리픽스 길이"""
+    length = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        length += 1
+    return length
\ No newline at end of file
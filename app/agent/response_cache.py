@@ -0,0 +1,155 @@
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from app.config import Config
+from app.utils.disk_cache import DiskLRU
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+def normalize_prompt(prompt):
+    """
+    캐시 키용 프롬프트 정규화
+    
+    줄바꿈 형식과 줄 끝 공백, 앞뒤 빈 줄처럼 결과에 영향이 없는 차이를 없앱니다.
+    """
+    lines = prompt.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip("\n")
+
+def is_deterministic(temperature, seed=None):
+    """같은 입력에 같은 출력이 나오는 생성 설정인지 확인"""
+    return seed is not None or temperature is None or temperature <= 0
+
+class ResponseCache:
+    """
+    결정적 생성 요청용 응답 캐시
+    
+    모델 이름, 정규화된 프롬프트, 작업, 생성 인자의 해시를 키로 사용합니다.
+    메모리 LRU 계층과 Config.DATA_DIR 아래의 디스크 계층으로 구성되며,
+    디스크 계층은 전체 크기가 한도를 넘으면 가장 오래 쓰이지 않은 파일부터 지웁니다.
+    """
+    
+    def __init__(self, cache_dir=None, max_memory_entries=None, max_disk_bytes=None):
+        """
+        응답 캐시 초기화
+        
+        Args:
+            cache_dir: 디스크 캐시 디렉토리
+            max_memory_entries: 메모리 계층 최대 항목 수
+            max_disk_bytes: 디스크 계층 최대 크기(바이트)
+        """
+        self.cache_dir = cache_dir or os.path.join(Config.DATA_DIR, "cache", "responses")
+        self.max_memory_entries = max_memory_entries or Config.RESPONSE_CACHE_MEMORY_ENTRIES
+        self.max_disk_bytes = max_disk_bytes or Config.RESPONSE_CACHE_DISK_MB * 1024 * 1024
+        
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk = DiskLRU(self.cache_dir, ".json", self.max_disk_bytes, "응답 캐시")
+        
+        # 통계
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+    
+    def make_key(self, model_name, prompt, task=None, **params):
+        """
+        캐시 키 생성
+        
+        Args:
+            model_name: 모델 이름
+            prompt: 프롬프트
+            task: 작업 이름
+            params: 생성 인자 (max_new_tokens, temperature, seed 등)
+        
+        Returns:
+            SHA-256 16진수 문자열
+        """
+        payload = json.dumps({
+            "model": model_name,
+            "prompt": normalize_prompt(prompt),
+            "task": task,
+            "params": params,
+        }, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def get(self, key):
+        """
+        캐시된 응답 조회
+        
+        Returns:
+            응답 문자열 (없으면 None)
+        """
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return self._memory[key]
+        
+        data = self._disk.read(key)
+        response = self._decode(data) if data is not None else None
+        if response is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        
+        with self._lock:
+            self.disk_hits += 1
+            self._remember(key, response)
+        return response
+    
+    def put(self, key, response):
+        """응답을 메모리와 디스크 계층에 저장"""
+        with self._lock:
+            self._remember(key, response)
+        
+        try:
+            self._disk.write(key, json.dumps({"response": response}, ensure_ascii=False).encode("utf-8"))
+        except OSError as e:
+            logger.warning(f"응답 캐시 저장 실패: {str(e)}")
+    
+    def get_or_generate(self, key, generate_fn):
+        """
+        캐시에 있으면 반환하고, 없으면 생성 후 저장
+        
+        Args:
+            key: 캐시 키
+            generate_fn: 응답을 생성하는 함수
+        
+        Returns:
+            (응답, 캐시 적중 여부)
+        """
+        response = self.get(key)
+        if response is not None:
+            return response, True
+        response = generate_fn()
+        self.put(key, response)
+        return response, False
+    
+    def stats(self):
+        """캐시 통계 반환"""
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_entries": len(self._memory),
+            "disk_bytes": self._disk.bytes,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self._disk.evictions,
+            "hit_ratio": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
+    
+    def _remember(self, key, response):
+        """메모리 계층에 저장 (self._lock을 잡은 상태에서 호출)"""
+        self._memory[key] = response
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+    
+    def _decode(self, data):
+        """디스크 파일 내용에서 응답 추출 (깨진 파일이면 None)"""
+        try:
+            return json.loads(data.decode("utf-8"))["response"]
+        except (ValueError, KeyError, TypeError):
+            return None
\ No newline at end of file
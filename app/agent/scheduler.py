@@ -0,0 +1,478 @@
+import time
+import queue
+import threading
+from contextlib import nullcontext
+import torch
+import torch.nn.functional as F
+from transformers import DynamicCache
+from app.config import Config
+from app.agent.adapters import adapter_context
+from app.agent.stopping import StopMatcher
+from app.utils.logger import setup_logger
+from app.utils.metrics import GenerationTimer
+from app.utils.tracing import profiler, profiling
+
+logger = setup_logger(__name__)
+
+def cache_layers(cache):
+    """KV 캐시를 레이어별 (key, value) 텐서 목록으로 변환"""
+    if hasattr(cache, "layers"):
+        return [(layer.keys, layer.values) for layer in cache.layers]
+    if hasattr(cache, "to_legacy_cache"):
+        return list(cache.to_legacy_cache())
+    return list(cache)
+
+def build_cache(layers):
+    """레이어별 (key, value) 텐서 목록으로 DynamicCache 생성"""
+    if hasattr(DynamicCache, "from_legacy_cache"):
+        return DynamicCache.from_legacy_cache(tuple(layers))
+    return DynamicCache(layers)
+
+def sample_tokens(logits, temperatures, generators=None):
+    """
+    행마다 다른 온도로 다음 토큰 샘플링
+    
+    Args:
+        logits: [batch, vocab] 로짓
+        temperatures: [batch] 온도 (0 이하이면 그리디)
+        generators: 행별 난수 생성기 목록 (시드가 고정된 요청만, 나머지는 None)
+    
+    Returns:
+        [batch] 토큰 ID
+    """
+    greedy = logits.argmax(dim=-1)
+    probs = torch.softmax(logits.float() / temperatures.clamp(min=1e-5).unsqueeze(1), dim=-1)
+    sampled = torch.multinomial(probs, num_samples=1).squeeze(1)
+    
+    # 시드가 고정된 행은 자기 생성기로 다시 샘플링하여 배치 구성과 무관하게 재현되도록 함
+    for row, generator in enumerate(generators or []):
+        if generator is not None:
+            sampled[row] = torch.multinomial(probs[row], num_samples=1, generator=generator)[0]
+    return torch.where(temperatures <= 0, greedy, sampled)
+
+class GenerationRequest:
+    """스케줄러에 제출된 생성 요청"""
+    
+    def __init__(self, prompt_ids, max_new_tokens, temperature=0.7, past_key_values=None, streamer=None,
+                 generator=None, stop_matcher=None, adapter=None, cancel_token=None):
+        """
+        생성 요청 초기화
+        
+        Args:
+            prompt_ids: 프롬프트 토큰 ID 목록
+            max_new_tokens: 최대 생성 토큰 수
+            temperature: 샘플링 온도 (0 이하이면 그리디)
+            past_key_values: 프롬프트 앞부분에 대한 기존 KV 캐시 (배치 크기 1)
+            streamer: 생성된 토큰을 받을 스트리머 (put/end)
+            generator: 샘플링에 쓸 난수 생성기 (시드 고정 시)
+            stop_matcher: 종료 문자열 검사기 (StopMatcher)
+            adapter: 적용할 LoRA 어댑터 이름 (None이면 기반 모델)
+            cancel_token: 취소·기한 확인용 CancellationToken
+        """
+        self.prompt_ids = list(prompt_ids)
+        self.max_new_tokens = max_new_tokens
+        self.temperature = temperature
+        self.generator = generator
+        self.stop_matcher = stop_matcher
+        self.adapter = adapter
+        self.cancel_token = cancel_token
+        self.initial_cache = past_key_values
+        self.streamer = streamer
+        self.output_ids = []
+        self.error = None
+        self.cancelled = False
+        # 제출한 스레드의 지표 레이블로 단계별 시간 측정
+        self.timer = GenerationTimer(len(self.prompt_ids))
+        # torch 프로파일러로 측정 중인 요청이면 스케줄러 스레드에서도 측정
+        self.profile_name = profiling()
+        
+        # 완료 후 채워지는 결과 (model.generate 결과와 같은 속성 이름)
+        self.sequences = None
+        self.past_key_values = None
+        self._done = threading.Event()
+    
+    @property
+    def is_cancelled(self):
+        return (
+            self.cancelled
+            or (self.streamer is not None and getattr(self.streamer, "cancelled", False))
+            or (self.cancel_token is not None and self.cancel_token.stopped)
+        )
+    
+    def cancel(self):
+        """다음 디코딩 단계에서 생성 중단"""
+        self.cancelled = True
+    
+    def wait(self, timeout=None):
+        """
+        생성 완료까지 대기
+        
+        Args:
+            timeout: 최대 대기 시간(초)
+        
+        Returns:
+            완료된 요청 (sequences, past_key_values 속성 사용)
+        """
+        if not self._done.wait(timeout):
+            raise TimeoutError("생성 요청 대기 시간이 초과되었습니다.")
+        if self.error is not None:
+            raise self.error
+        return self
+    
+    def _finish(self, cache_layers_row=None, error=None):
+        self.error = error
+        if error is None:
+            self.sequences = torch.tensor([self.prompt_ids + self.output_ids])
+            if cache_layers_row is not None:
+                self.past_key_values = build_cache(cache_layers_row)
+        # 입력 캐시는 더 이상 필요 없음
+        self.initial_cache = None
+        self.timer.finish()
+        if self.streamer is not None:
+            self.streamer.end()
+        self._done.set()
+
+class _Slot:
+    """배치 안에서 디코딩 중인 시퀀스 하나의 상태"""
+    
+    def __init__(self, request, first_token):
+        self.request = request
+        self.last_token = first_token
+        # 다음에 입력될 토큰(last_token)의 위치
+        self.position = len(request.prompt_ids)
+
+class GenerationScheduler:
+    """
+    연속 배칭(continuous batching) 생성 스케줄러
+    
+    여러 스레드에서 들어온 요청을 하나의 디코딩 루프로 모아 한 단계씩 함께 디코딩합니다.
+    새 요청은 단계 사이에 프리필 후 배치에 합류하고, 끝난 시퀀스는 즉시 빠집니다.
+    배치의 KV 캐시는 왼쪽 패딩으로 길이를 맞추고 어텐션 마스크로 패딩을 가립니다.
+    """
+    
+    def __init__(self, model, tokenizer, device, max_batch_size=None, prefix_cache=None, adapters=None):
+        """
+        스케줄러 초기화
+        
+        Args:
+            model: 생성에 사용할 모델
+            tokenizer: 토크나이저
+            device: 장치
+            max_batch_size: 동시에 디코딩할 최대 시퀀스 수
+            prefix_cache: 기존 KV 캐시가 없는 요청의 프리필에 쓸 PrefixCache
+            adapters: 요청별 LoRA 어댑터를 적용할 AdapterManager
+        """
+        self.model = model
+        self.tokenizer = tokenizer
+        self.device = device
+        self.max_batch_size = max_batch_size or Config.SCHEDULER_MAX_BATCH_SIZE
+        self.prefix_cache = prefix_cache
+        self.adapters = adapters
+        
+        eos_token_id = model.generation_config.eos_token_id
+        if eos_token_id is None:
+            eos_token_id = tokenizer.eos_token_id
+        self.eos_token_ids = set(eos_token_id if isinstance(eos_token_id, (list, tuple)) else [eos_token_id])
+        
+        self._pending = queue.Queue()
+        self._slots = []
+        self._layers = None
+        self._attention_mask = None
+        self._thread = None
+        self._running = False
+        self._profiled = set()
+        self._profiler = None
+        self._profile_name = None
+        
+        # 통계
+        self.steps = 0
+        self.batched_tokens = 0
+        self.generated_tokens = 0
+        self.completed_requests = 0
+        self.cancelled_requests = 0
+    
+    def start(self):
+        """디코딩 루프 스레드 시작"""
+        if self._running:
+            return self
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="generation-scheduler", daemon=True)
+        self._thread.start()
+        logger.info(f"생성 스케줄러 시작 (최대 배치 크기: {self.max_batch_size})")
+        return self
+    
+    def stop(self):
+        """디코딩 루프 스레드 종료"""
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+    
+    def submit(self, prompt_ids, max_new_tokens, temperature=0.7, past_key_values=None, streamer=None, seed=None,
+               stop_strings=None, adapter=None, cancel_token=None):
+        """
+        생성 요청 제출 (어느 스레드에서나 호출 가능)
+        
+        LoRA 어댑터를 지정한 경우 호출자가 요청이 끝날 때까지 어댑터를 acquire()해 두어야 합니다.
+        
+        Returns:
+            GenerationRequest (wait()로 결과 대기)
+        """
+        generator = None
+        if seed is not None:
+            generator = torch.Generator(device=self.device).manual_seed(seed)
+        stop_matcher = StopMatcher(self.tokenizer, stop_strings) if stop_strings else None
+        request = GenerationRequest(
+            prompt_ids, max_new_tokens, temperature, past_key_values, streamer, generator, stop_matcher, adapter,
+            cancel_token
+        )
+        if max_new_tokens <= 0:
+            request._finish()
+            return request
+        self._pending.put(request)
+        return request
+    
+    def generate(self, prompt_ids, max_new_tokens, temperature=0.7, seed=None, timeout=None, stop_strings=None,
+                 cancel_token=None):
+        """요청을 제출하고 생성된 토큰 ID 목록을 반환"""
+        request = self.submit(prompt_ids, max_new_tokens, temperature, seed=seed, stop_strings=stop_strings,
+                              cancel_token=cancel_token)
+        return request.wait(timeout).output_ids
+    
+    def stats(self):
+        """스케줄러 통계 반환"""
+        return {
+            "active": len(self._slots),
+            "pending": self._pending.qsize(),
+            "steps": self.steps,
+            "generated_tokens": self.generated_tokens,
+            "completed_requests": self.completed_requests,
+            "cancelled_requests": self.cancelled_requests,
+            "avg_batch_size": self.batched_tokens / self.steps if self.steps else 0.0,
+        }
+    
+    def _run(self):
+        """디코딩 루프"""
+        while self._running:
+            try:
+                self._admit()
+                if self._slots:
+                    with torch.no_grad(), self._region("scheduler.decode_step"):
+                        self._step()
+            except Exception as e:
+                logger.error(f"생성 스케줄러 오류: {str(e)}")
+                self._fail_all(e)
+    
+    def _admit(self):
+        """빈 자리만큼 대기 중인 요청을 프리필하여 배치에 합류"""
+        while len(self._slots) < self.max_batch_size:
+            try:
+                # 배치가 비어 있으면 새 요청이 올 때까지 잠시 대기
+                request = self._pending.get(timeout=0.1) if not self._slots else self._pending.get_nowait()
+            except queue.Empty:
+                return
+            if request.is_cancelled:
+                self.cancelled_requests += 1
+                request._finish()
+                continue
+            if request.profile_name is not None:
+                self._start_profile(request)
+            try:
+                with torch.no_grad(), self._region("scheduler.prefill"):
+                    self._prefill(request)
+            except Exception as e:
+                logger.error(f"프리필 중 오류: {str(e)}")
+                request._finish(error=e)
+                self._stop_profile(request)
+    
+    def _prefill(self, request):
+        """요청 하나를 프리필하고 첫 토큰을 샘플링한 뒤 배치에 추가"""
+        past = request.initial_cache
+        
+        # 기존 캐시가 없으면 공유 프리픽스 캐시에서 앞부분 KV를 가져옴
+        prefix_match = None
+        if past is None and self.prefix_cache is not None:
+            prefix_match = self.prefix_cache.match(request.prompt_ids, namespace=request.adapter)
+            past = prefix_match.cache
+        
+        past_length = past.get_seq_length() if past is not None else 0
+        prompt_length = len(request.prompt_ids)
+        
+        input_ids = torch.tensor([request.prompt_ids[past_length:]], device=self.device)
+        attention_mask = torch.ones((1, prompt_length), dtype=torch.long, device=self.device)
+        position_ids = torch.arange(past_length, prompt_length, device=self.device).unsqueeze(0)
+        
+        start = time.perf_counter()
+        try:
+            with adapter_context(self.adapters, [request.adapter]):
+                outputs = self.model(
+                    input_ids=input_ids,
+                    attention_mask=attention_mask,
+                    position_ids=position_ids,
+                    past_key_values=past if past is not None else DynamicCache(),
+                    use_cache=True
+                )
+            if prefix_match is not None:
+                self.prefix_cache.insert(
+                    request.prompt_ids, cache_layers(outputs.past_key_values), namespace=request.adapter
+                )
+        finally:
+            if prefix_match is not None:
+                self.prefix_cache.release(prefix_match)
+        temperature = torch.tensor([request.temperature], device=self.device)
+        token = sample_tokens(outputs.logits[:, -1, :], temperature, [request.generator])[0].item()
+        # item()에서 장치 동기화가 끝난 뒤 측정 (프리픽스 캐시 조회·삽입 포함)
+        request.timer.prefill(time.perf_counter() - start)
+        
+        slot = _Slot(request, token)
+        self._merge(cache_layers(outputs.past_key_values), attention_mask)
+        self._slots.append(slot)
+        if self._emit(slot, token):
+            self._retire([len(self._slots) - 1])
+    
+    def _merge(self, layers, attention_mask):
+        """새 시퀀스의 KV 캐시를 왼쪽 패딩으로 길이를 맞춰 배치에 붙임"""
+        if self._layers is None:
+            self._layers = [(k, v) for k, v in layers]
+            self._attention_mask = attention_mask
+            return
+        
+        batch_length = self._attention_mask.shape[1]
+        new_length = attention_mask.shape[1]
+        if new_length > batch_length:
+            pad = new_length - batch_length
+            self._layers = [(F.pad(k, (0, 0, pad, 0)), F.pad(v, (0, 0, pad, 0))) for k, v in self._layers]
+            self._attention_mask = F.pad(self._attention_mask, (pad, 0))
+        elif new_length < batch_length:
+            pad = batch_length - new_length
+            layers = [(F.pad(k, (0, 0, pad, 0)), F.pad(v, (0, 0, pad, 0))) for k, v in layers]
+            attention_mask = F.pad(attention_mask, (pad, 0))
+        
+        self._layers = [
+            (torch.cat([k, new_k], dim=0), torch.cat([v, new_v], dim=0))
+            for (k, v), (new_k, new_v) in zip(self._layers, layers)
+        ]
+        self._attention_mask = torch.cat([self._attention_mask, attention_mask], dim=0)
+    
+    def _step(self):
+        """배치 전체에 대해 한 토큰 디코딩"""
+        batch_size = len(self._slots)
+        input_ids = torch.tensor([[slot.last_token] for slot in self._slots], device=self.device)
+        position_ids = torch.tensor([[slot.position] for slot in self._slots], device=self.device)
+        self._attention_mask = torch.cat(
+            [self._attention_mask, self._attention_mask.new_ones((batch_size, 1))], dim=1
+        )
+        
+        # 행마다 다른 LoRA 어댑터를 적용 (모두 기반 모델이면 어댑터 계산 없음)
+        with adapter_context(self.adapters, [slot.request.adapter for slot in self._slots]):
+            outputs = self.model(
+                input_ids=input_ids,
+                attention_mask=self._attention_mask,
+                position_ids=position_ids,
+                past_key_values=build_cache(self._layers),
+                use_cache=True
+            )
+        self._layers = cache_layers(outputs.past_key_values)
+        
+        temperatures = torch.tensor([slot.request.temperature for slot in self._slots], device=self.device)
+        generators = [slot.request.generator for slot in self._slots]
+        tokens = sample_tokens(outputs.logits[:, -1, :], temperatures, generators).tolist()
+        
+        self.steps += 1
+        self.batched_tokens += batch_size
+        
+        finished = []
+        for index, (slot, token) in enumerate(zip(self._slots, tokens)):
+            slot.position += 1
+            slot.last_token = token
+            if self._emit(slot, token):
+                finished.append(index)
+        if finished:
+            self._retire(finished)
+    
+    def _emit(self, slot, token):
+        """
+        생성된 토큰을 요청에 전달
+        
+        Returns:
+            시퀀스가 끝났는지 여부
+        """
+        request = slot.request
+        if request.is_cancelled:
+            # 다음 단계 전에 배치에서 빠지므로 자리와 KV 메모리가 바로 반환됨
+            self.cancelled_requests += 1
+            return True
+        
+        request.output_ids.append(token)
+        request.timer.token()
+        self.generated_tokens += 1
+        if request.streamer is not None:
+            request.streamer.put(torch.tensor([token]))
+        
+        if token in self.eos_token_ids or len(request.output_ids) >= request.max_new_tokens:
+            return True
+        return request.stop_matcher is not None and request.stop_matcher.update([token])
+    
+    def _retire(self, indices):
+        """끝난 시퀀스를 결과와 함께 배치에서 제거"""
+        for index in indices:
+            slot = self._slots[index]
+            # 왼쪽 패딩을 제외한 이 시퀀스의 KV 캐시만 복사하여 돌려줌
+            padding = int((self._attention_mask[index] == 0).sum().item())
+            row = [
+                (k[index:index + 1, :, padding:, :].clone(), v[index:index + 1, :, padding:, :].clone())
+                for k, v in self._layers
+            ]
+            slot.request._finish(cache_layers_row=row)
+            self.completed_requests += 1
+            self._stop_profile(slot.request)
+        
+        keep = [i for i in range(len(self._slots)) if i not in set(indices)]
+        self._slots = [self._slots[i] for i in keep]
+        if not self._slots:
+            self._layers = None
+            self._attention_mask = None
+            return
+        
+        keep_index = torch.tensor(keep, device=self.device)
+        self._attention_mask = self._attention_mask.index_select(0, keep_index)
+        # 남은 시퀀스 모두가 패딩인 앞쪽 열은 잘라냄
+        trim = int((self._attention_mask == 0).all(dim=0).long().cumprod(dim=0).sum().item())
+        self._attention_mask = self._attention_mask[:, trim:]
+        self._layers = [
+            (k.index_select(0, keep_index)[:, :, trim:, :], v.index_select(0, keep_index)[:, :, trim:, :])
+            for k, v in self._layers
+        ]
+    
+    def _fail_all(self, error):
+        """디코딩 중 오류 발생 시 배치의 모든 요청을 실패 처리"""
+        for slot in self._slots:
+            slot.request._finish(error=error)
+            self._stop_profile(slot.request)
+        self._slots = []
+        self._layers = None
+        self._attention_mask = None
+    
+    def _start_profile(self, request):
+        """프로파일 대상 요청이 배치에 있는 동안 스케줄러 스레드 측정"""
+        if self._profiler is None:
+            self._profiler = profiler.start()
+            if self._profiler is None:
+                return
+            self._profile_name = f"{request.profile_name}_scheduler"
+        self._profiled.add(request)
+    
+    def _region(self, name):
+        """측정 중이면 프로파일 결과에 구간 이름 표시"""
+        if self._profiler is None:
+            return nullcontext()
+        return torch.autograd.profiler.record_function(name)
+    
+    def _stop_profile(self, request):
+        """프로파일 대상 요청이 모두 끝나면 측정 종료"""
+        if request not in self._profiled:
+            return
+        self._profiled.discard(request)
+        if not self._profiled and self._profiler is not None:
+            profiler.stop(self._profiler, self._profile_name)
+            self._profiler = None
\ No newline at end of file
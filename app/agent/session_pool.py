@@ -0,0 +1,187 @@
+import time
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from app.config import Config
+from app.agent.conversation import ConversationState
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+class SessionPool:
+    """
+    세션별 대화 상태 풀
+    
+    LRU 순서로 세션을 관리하며, 유휴 시간 초과·세션 수·토큰 수·KV 메모리 상한을 넘으면
+    오래된 세션부터 정리합니다. KV 메모리가 넘치면 먼저 KV 캐시만 버리고, 그래도 넘치는
+    한도가 있으면 세션을 압축된 기록으로 보관했다가 다음 접근 때 복원합니다.
+    요청이 사용 중인 세션(use()로 고정된 세션)은 보관하지 않습니다.
+    """
+    
+    def __init__(self, agent, max_sessions=None, idle_ttl=None, max_cached_tokens=None,
+                 max_kv_bytes=None, max_archived=None):
+        """
+        세션 풀 초기화
+        
+        Args:
+            agent: DeepSeekAgent 인스턴스
+            max_sessions: 메모리에 유지할 최대 세션 수
+            idle_ttl: 세션 유휴 시간 한도(초)
+            max_cached_tokens: 활성 세션 기록의 최대 총 토큰 수
+            max_kv_bytes: 활성 세션 KV 캐시의 최대 총 메모리(바이트)
+            max_archived: 압축 보관할 최대 세션 수
+        """
+        self.agent = agent
+        self.max_sessions = max_sessions or Config.SESSION_MAX_SESSIONS
+        self.idle_ttl = idle_ttl or Config.SESSION_IDLE_TTL
+        self.max_cached_tokens = max_cached_tokens or Config.SESSION_MAX_CACHED_TOKENS
+        self.max_kv_bytes = max_kv_bytes or Config.SESSION_MAX_KV_MB * 1024 * 1024
+        self.max_archived = max_archived or Config.SESSION_MAX_ARCHIVED
+        
+        self._active = OrderedDict()
+        self._archived = OrderedDict()
+        # 세션 ID별 사용 중인 요청 수 (입장 대기 중인 요청 포함)
+        self._pins = {}
+        self._lock = threading.Lock()
+        
+        # 통계
+        self.created = 0
+        self.restored = 0
+        self.archived = 0
+        self.expired = 0
+        self.kv_dropped = 0
+    
+    def get(self, session_id, pin=False):
+        """
+        세션 ID에 해당하는 대화 상태 반환 (없으면 생성, 보관 중이면 복원)
+        
+        Args:
+            session_id: 세션 ID
+            pin: True이면 release()를 호출할 때까지 보관하지 않도록 고정
+        
+        Returns:
+            ConversationState
+        """
+        with self._lock:
+            if pin:
+                self._pins[session_id] = self._pins.get(session_id, 0) + 1
+            state = self._active.pop(session_id, None)
+            if state is None:
+                data = self._archived.pop(session_id, None)
+                if data is not None:
+                    state = ConversationState.from_compact(self.agent, session_id, data)
+                    self.restored += 1
+                else:
+                    state = ConversationState(self.agent, session_id)
+                    self.created += 1
+            state.touch()
+            self._active[session_id] = state
+            self._enforce_limits(session_id)
+        return state
+    
+    def release(self, session_id):
+        """get(pin=True)로 고정한 세션의 고정 해제"""
+        with self._lock:
+            count = self._pins.get(session_id, 0) - 1
+            if count > 0:
+                self._pins[session_id] = count
+            else:
+                self._pins.pop(session_id, None)
+    
+    @contextmanager
+    def use(self, session_id):
+        """
+        요청이 끝날 때까지 세션을 고정한 채로 대화 상태 사용
+        
+        요청은 입장 대기열을 지난 뒤에야 state.lock을 잡으므로, 그 사이에 다른 요청의
+        get()이 이 세션을 보관해 대화 기록이 끊기지 않도록 고정합니다.
+        
+        Yields:
+            ConversationState
+        """
+        state = self.get(session_id, pin=True)
+        try:
+            yield state
+        finally:
+            self.release(session_id)
+    
+    def remove(self, session_id):
+        """세션 삭제"""
+        with self._lock:
+            self._active.pop(session_id, None)
+            self._archived.pop(session_id, None)
+    
+    def stats(self):
+        """세션 풀 통계 반환"""
+        with self._lock:
+            states = list(self._active.values())
+        return {
+            "active_sessions": len(states),
+            "archived_sessions": len(self._archived),
+            "pinned_sessions": len(self._pins),
+            "cached_tokens": sum(state.history_tokens() for state in states),
+            "kv_bytes": sum(state.kv_bytes() for state in states),
+            "created": self.created,
+            "restored": self.restored,
+            "archived": self.archived,
+            "expired": self.expired,
+            "kv_dropped": self.kv_dropped,
+        }
+    
+    def _enforce_limits(self, current_id):
+        """상한을 넘은 세션 정리 (self._lock을 잡은 상태에서 호출)"""
+        now = time.monotonic()
+        candidates = [sid for sid in self._active if sid != current_id]
+        
+        # 1. 유휴 시간이 지난 세션 보관
+        for sid in candidates:
+            if now - self._active[sid].last_access > self.idle_ttl and self._archive(sid):
+                self.expired += 1
+        candidates = [sid for sid in candidates if sid in self._active]
+        
+        # 2. KV 메모리 상한: 오래된 세션의 KV 캐시부터 폐기 (기록은 유지)
+        kv_bytes = sum(state.kv_bytes() for state in self._active.values())
+        for sid in candidates:
+            if kv_bytes <= self.max_kv_bytes:
+                break
+            state = self._active[sid]
+            size = state.kv_bytes()
+            if size and state.lock.acquire(blocking=False):
+                try:
+                    state.reset_kv_cache()
+                finally:
+                    state.lock.release()
+                kv_bytes -= size
+                self.kv_dropped += 1
+        
+        # 3. 세션 수·토큰 수 상한: 오래된 세션부터 보관
+        tokens = sum(state.history_tokens() for state in self._active.values())
+        for sid in candidates:
+            if len(self._active) <= self.max_sessions and tokens <= self.max_cached_tokens:
+                break
+            size = self._active[sid].history_tokens()
+            if self._archive(sid):
+                tokens -= size
+    
+    def _archive(self, session_id):
+        """
+        세션을 압축된 기록으로 보관
+        
+        Returns:
+            보관 여부 (요청이 사용 중이거나 생성 중인 세션은 건너뜀)
+        """
+        state = self._active[session_id]
+        if self._pins.get(session_id) or not state.lock.acquire(blocking=False):
+            return False
+        try:
+            self._archived[session_id] = state.to_compact()
+            state.context.reset()
+            del self._active[session_id]
+            self.archived += 1
+        finally:
+            state.lock.release()
+        
+        while len(self._archived) > self.max_archived:
+            self._archived.popitem(last=False)
+        logger.debug(f"세션 보관: {session_id}")
+        return True
\ No newline at end of file
@@ -0,0 +1,206 @@
+import time
+import threading
+import torch
+from transformers import DynamicCache
+from app.agent.conversation import cache_length
+from app.utils.logger import setup_logger
+from app.utils.metrics import GenerationTimer
+
+logger = setup_logger(__name__)
+
+class SpeculativeResult:
+    """추측 디코딩 결과 (model.generate 결과와 같은 속성 이름)"""
+    
+    def __init__(self, sequences, past_key_values, proposed, accepted):
+        self.sequences = sequences
+        self.past_key_values = past_key_values
+        self.proposed = proposed
+        self.accepted = accepted
+
+class SpeculativeDecoder:
+    """
+    드래프트 모델을 이용한 추측 디코딩 (배치 크기 1)
+    
+    작은 드래프트 모델이 토큰 몇 개를 먼저 제안하면 대상 모델이 한 번의 forward로 모두
+    검증합니다. 그리디 디코딩에서는 대상 모델의 argmax와 일치하는 토큰만 받아들이므로
+    결과가 일반 디코딩과 같고, 샘플링에서는 거절 샘플링으로 대상 모델의 분포를 유지합니다.
+    """
+    
+    def __init__(self, model, draft_model, num_draft_tokens=4):
+        """
+        추측 디코더 초기화
+        
+        Args:
+            model: 대상 모델
+            draft_model: 드래프트 모델 (대상 모델과 같은 토크나이저 사용)
+            num_draft_tokens: 검증 한 번에 드래프트 모델이 제안할 토큰 수
+        """
+        self.model = model
+        self.draft_model = draft_model
+        self.num_draft_tokens = num_draft_tokens
+        
+        # 통계
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.proposed_tokens = 0
+        self.accepted_tokens = 0
+        self.generated_tokens = 0
+        self.target_forwards = 0
+    
+    def generate(self, prompt_ids, max_new_tokens, temperature=0, past_key_values=None, eos_token_id=None,
+                 generator=None, stop_matcher=None, cancel_token=None):
+        """
+        추측 디코딩으로 토큰 생성
+        
+        Args:
+            prompt_ids: 프롬프트 토큰 ID 목록
+            max_new_tokens: 최대 생성 토큰 수
+            temperature: 샘플링 온도 (0 이하이면 그리디)
+            past_key_values: 프롬프트 앞부분에 대한 대상 모델의 기존 KV 캐시
+            eos_token_id: 종료 토큰 ID
+            generator: 샘플링에 쓸 난수 생성기
+            stop_matcher: 종료 문자열 검사기 (StopMatcher)
+            cancel_token: 검증 단계마다 확인할 CancellationToken
+        
+        Returns:
+            SpeculativeResult
+        """
+        if max_new_tokens < 1:
+            raise ValueError(f"생성할 토큰 수가 없습니다 (프롬프트가 최대 길이를 넘음): {max_new_tokens}")
+        
+        device = self.model.device
+        sampling = temperature is not None and temperature > 0
+        target_cache = past_key_values if past_key_values is not None else DynamicCache()
+        draft_cache = DynamicCache()
+        output_ids = []
+        proposed = accepted = forwards = 0
+        timer = GenerationTimer(len(prompt_ids))
+        
+        with torch.no_grad():
+            # 대상 모델 프리필 (캐시에 없는 부분만)
+            new_ids = prompt_ids[cache_length(target_cache) if past_key_values is not None else 0:]
+            logits = self._forward(self.model, new_ids, target_cache, device)[-1]
+            forwards += 1
+            output_ids.append(self._select(logits, temperature, generator))
+            timer.prefill(time.perf_counter() - timer.start)
+            timer.token()
+            stopped = stop_matcher is not None and stop_matcher.update(output_ids)
+            
+            while not stopped and len(output_ids) < max_new_tokens and output_ids[-1] != eos_token_id:
+                if cancel_token is not None and cancel_token.stopped:
+                    break
+                sequence = prompt_ids + output_ids
+                k = min(self.num_draft_tokens, max_new_tokens - len(output_ids) - 1)
+                
+                # 1. 드래프트 모델이 k개 토큰 제안 (드래프트 캐시에 없는 부분부터 이어서)
+                draft_ids, draft_probs = [], []
+                pending = sequence[cache_length(draft_cache):]
+                for _ in range(k):
+                    draft_logits = self._forward(self.draft_model, pending, draft_cache, device)[-1]
+                    if sampling:
+                        probs = torch.softmax(draft_logits.float() / temperature, dim=-1)
+                        token = torch.multinomial(probs, 1, generator=generator).item()
+                        draft_probs.append(probs)
+                    else:
+                        token = draft_logits.argmax().item()
+                    draft_ids.append(token)
+                    pending = [token]
+                
+                # 2. 대상 모델이 마지막 확정 토큰과 제안 토큰을 한 번에 검증
+                target_logits = self._forward(self.model, [output_ids[-1]] + draft_ids, target_cache, device)
+                forwards += 1
+                
+                new_tokens = []
+                num_accepted = 0
+                for i, token in enumerate(draft_ids):
+                    if sampling:
+                        p = torch.softmax(target_logits[i].float() / temperature, dim=-1)
+                        q = draft_probs[i]
+                        u = torch.rand(1, generator=generator, device=p.device).item()
+                        if u < min(1.0, (p[token] / q[token]).item()):
+                            new_tokens.append(token)
+                            num_accepted += 1
+                            continue
+                        # 거절: 두 분포의 차이에서 다시 샘플링
+                        residual = torch.clamp(p - q, min=0)
+                        residual = residual / residual.sum() if residual.sum() > 0 else p
+                        new_tokens.append(torch.multinomial(residual, 1, generator=generator).item())
+                        break
+                    target_token = target_logits[i].argmax().item()
+                    new_tokens.append(target_token)
+                    if target_token != token:
+                        break
+                    num_accepted += 1
+                else:
+                    # 모두 받아들이면 대상 모델의 다음 토큰 하나를 추가로 얻음
+                    new_tokens.append(self._select(target_logits[k], temperature, generator))
+                
+                proposed += k
+                accepted += num_accepted
+                
+                # 3. 받아들여지지 않은 위치를 캐시에서 잘라냄
+                valid = len(sequence) + num_accepted
+                self._crop(target_cache, valid)
+                self._crop(draft_cache, valid)
+                
+                if eos_token_id in new_tokens:
+                    new_tokens = new_tokens[:new_tokens.index(eos_token_id) + 1]
+                new_tokens = new_tokens[:max_new_tokens - len(output_ids)]
+                output_ids.extend(new_tokens)
+                timer.token(len(new_tokens))
+                stopped = stop_matcher is not None and stop_matcher.update(new_tokens)
+            
+            # 캐시에는 마지막 토큰을 제외한 시퀀스만 남김 (model.generate와 같은 규칙)
+            self._crop(target_cache, len(prompt_ids) + len(output_ids) - 1)
+        timer.finish()
+        
+        with self._lock:
+            self.requests += 1
+            self.proposed_tokens += proposed
+            self.accepted_tokens += accepted
+            self.generated_tokens += len(output_ids)
+            self.target_forwards += forwards
+        
+        logger.debug(f"추측 디코딩: {len(output_ids)} 토큰, 제안 {proposed} / 수락 {accepted}, 대상 forward {forwards}회")
+        sequences = torch.tensor([prompt_ids + output_ids], device=device)
+        return SpeculativeResult(sequences, target_cache, proposed, accepted)
+    
+    def stats(self):
+        """추측 디코딩 통계 반환"""
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "num_draft_tokens": self.num_draft_tokens,
+                "proposed_tokens": self.proposed_tokens,
+                "accepted_tokens": self.accepted_tokens,
+                "acceptance_rate": self.accepted_tokens / self.proposed_tokens if self.proposed_tokens else 0.0,
+                "tokens_per_target_forward": (
+                    self.generated_tokens / self.target_forwards if self.target_forwards else 0.0
+                ),
+            }
+    
+    def _forward(self, model, token_ids, cache, device):
+        """
+        캐시를 이어 붙여 forward 실행
+        
+        Returns:
+            [len(token_ids), vocab] 로짓
+        """
+        input_ids = torch.tensor([token_ids], device=device)
+        past = cache_length(cache)
+        attention_mask = torch.ones((1, past + len(token_ids)), dtype=torch.long, device=device)
+        outputs = model(input_ids=input_ids, attention_mask=attention_mask, past_key_values=cache, use_cache=True)
+        return outputs.logits[0]
+    
+    def _select(self, logits, temperature, generator):
+        """로짓에서 다음 토큰 선택 (0 이하 온도는 그리디)"""
+        if temperature is None or temperature <= 0:
+            return logits.argmax().item()
+        probs = torch.softmax(logits.float() / temperature, dim=-1)
+        return torch.multinomial(probs, 1, generator=generator).item()
+    
+    def _crop(self, cache, length):
+        """캐시를 앞에서부터 length 토큰만 남기고 잘라냄"""
+        excess = cache_length(cache) - length
+        if excess > 0:
+            cache.crop(-excess)
\ No newline at end of file
@@ -0,0 +1,155 @@
+from app.config import Config
+from app.agent.streaming import IncrementalDetokenizer
+
+# 모델이 다음 사용자 턴을 지어내기 시작하면 응답이 끝난 것으로 봄
+DEFAULT_STOP_STRINGS = ("\n\nHuman:",)
+
+# 작업별 종료 문자열
+TASK_STOP_STRINGS = {
+    "chat": ("\n\nHuman:",),
+    "optimize": ("\n\nHuman:",),
+    "refactor": ("\n\nHuman:",),
+    "explain": ("\n\nHuman:",),
+    "summary": ("\n\nHuman:", "\n\nAssistant:"),
+}
+
+def get_stop_strings(task=None):
+    """
+    작업에 맞는 종료 문자열 목록 반환
+    
+    Args:
+        task: 작업 이름 (없거나 모르는 작업이면 기본값)
+    
+    Returns:
+        종료 문자열 튜플 (Config.EXTRA_STOP_STRINGS 포함)
+    """
+    stop_strings = TASK_STOP_STRINGS.get(task, DEFAULT_STOP_STRINGS)
+    extra = tuple(s for s in Config.EXTRA_STOP_STRINGS if s not in stop_strings)
+    return stop_strings + extra
+
+def find_stop(text, stop_strings):
+    """
+    텍스트에서 가장 먼저 나오는 종료 문자열의 위치
+    
+    Returns:
+        시작 인덱스 (없으면 None)
+    """
+    positions = [text.find(s) for s in stop_strings or ()]
+    positions = [p for p in positions if p >= 0]
+    return min(positions) if positions else None
+
+def truncate_at_stop(tokenizer, token_ids, stop_strings):
+    """
+    생성 결과를 종료 문자열 앞에서 자름
+    
+    Args:
+        tokenizer: 토크나이저
+        token_ids: 생성된 토큰 ID 목록
+        stop_strings: 종료 문자열 목록
+    
+    Returns:
+        (자른 텍스트, 텍스트와 정확히 대응하는 토큰 ID 목록 또는 None)
+        종료 문자열이 토큰 중간에서 시작하면 대응하는 토큰 목록이 없으므로 None을 반환합니다.
+    """
+    text = tokenizer.decode(token_ids, skip_special_tokens=True)
+    cut = find_stop(text, stop_strings)
+    if cut is None:
+        return text, list(token_ids)
+    
+    # 종료 문자열은 끝부분에서 발견되므로 뒤에서부터 몇 토큰만 확인하면 됨
+    keep = len(token_ids)
+    while keep > 0 and len(tokenizer.decode(token_ids[:keep], skip_special_tokens=True)) > cut:
+        keep -= 1
+    
+    text = text[:cut]
+    if tokenizer.decode(token_ids[:keep], skip_special_tokens=True) == text:
+        return text, list(token_ids[:keep])
+    return text, None
+
+class StopMatcher:
+    """
+    토큰 스트림에서 EOS와 종료 문자열을 점진적으로 찾는 검사기
+    
+    토큰이 들어올 때마다 새로 확정된 텍스트만 디코딩하고, 종료 문자열 길이만큼의
+    꼬리 텍스트와 이어 붙여 검사하므로 토큰당 비용이 생성 길이와 무관합니다.
+    """
+    
+    def __init__(self, tokenizer, stop_strings=None, eos_token_ids=()):
+        """
+        검사기 초기화
+        
+        Args:
+            tokenizer: 토크나이저
+            stop_strings: 종료 문자열 목록
+            eos_token_ids: 종료 토큰 ID 목록
+        """
+        self.stop_strings = tuple(s for s in stop_strings or () if s)
+        self.eos_token_ids = set(eos_token_ids)
+        self.detokenizer = IncrementalDetokenizer(tokenizer)
+        self._tail_length = max((len(s) for s in self.stop_strings), default=1) - 1
+        self._tail = ""
+        self.stopped = False
+        self.reason = None
+    
+    def update(self, token_ids):
+        """
+        새 토큰 반영
+        
+        Args:
+            token_ids: 새로 생성된 토큰 ID 목록
+        
+        Returns:
+            생성을 멈춰야 하는지 여부
+        """
+        if self.stopped:
+            return True
+        if any(token_id in self.eos_token_ids for token_id in token_ids):
+            self.stopped, self.reason = True, "eos"
+            return True
+        if not self.stop_strings:
+            return False
+        
+        text = self.detokenizer.add(list(token_ids))
+        if text:
+            window = self._tail + text
+            if find_stop(window, self.stop_strings) is not None:
+                self.stopped, self.reason = True, "stop_string"
+                return True
+            self._tail = window[-self._tail_length:] if self._tail_length else ""
+        return False
+
+def filter_stop_strings(chunks, stop_strings):
+    """
+    스트리밍 텍스트에서 종료 문자열과 그 뒤를 제거
+    
+    종료 문자열의 앞부분일 수 있는 꼬리는 다음 조각이 올 때까지 내보내지 않습니다.
+    
+    Args:
+        chunks: 텍스트 조각 이터레이터
+        stop_strings: 종료 문자열 목록
+    
+    Yields:
+        종료 문자열 앞까지의 텍스트 조각
+    """
+    stop_strings = tuple(s for s in stop_strings or () if s)
+    pending = ""
+    for chunk in chunks:
+        pending += chunk
+        cut = find_stop(pending, stop_strings)
+        if cut is not None:
+            if pending[:cut]:
+                yield pending[:cut]
+            return
+        
+        # 종료 문자열의 접두사와 겹치는 가장 긴 꼬리는 보류
+        hold = 0
+        for stop in stop_strings:
+            for length in range(min(len(stop) - 1, len(pending)), hold, -1):
+                if pending.endswith(stop[:length]):
+                    hold = length
+                    break
+        if len(pending) > hold:
+            yield pending[:len(pending) - hold]
+            pending = pending[len(pending) - hold:]
+    if pending:
+        yield pending
\ No newline at end of file
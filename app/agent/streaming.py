@@ -0,0 +1,105 @@
+import queue
+
+class IncrementalDetokenizer:
+    """토큰을 하나씩 받아 새로 확정된 텍스트만 돌려주는 디토크나이저"""
+    
+    def __init__(self, tokenizer, skip_special_tokens=True):
+        """
+        디토크나이저 초기화
+        
+        Args:
+            tokenizer: 사용할 토크나이저
+            skip_special_tokens: 특수 토큰 제외 여부
+        """
+        self.tokenizer = tokenizer
+        self.skip_special_tokens = skip_special_tokens
+        self.token_ids = []
+        # prefix_offset~read_offset: 이미 출력한 텍스트의 기준이 되는 토큰 구간
+        self.prefix_offset = 0
+        self.read_offset = 0
+    
+    def _decode(self, token_ids):
+        return self.tokenizer.decode(token_ids, skip_special_tokens=self.skip_special_tokens)
+    
+    def add(self, token_ids):
+        """
+        새 토큰 추가
+        
+        바이트 수준 BPE에서는 한글 한 글자(UTF-8 3바이트)가 여러 토큰으로 나뉠 수 있으므로,
+        디코딩 결과가 미완성 문자(U+FFFD)로 끝나면 다음 토큰이 올 때까지 출력을 미룹니다.
+        
+        Args:
+            token_ids: 새 토큰 ID 목록
+        
+        Returns:
+            새로 확정된 텍스트 (없으면 빈 문자열)
+        """
+        self.token_ids.extend(token_ids)
+        prefix_text = self._decode(self.token_ids[self.prefix_offset:self.read_offset])
+        new_text = self._decode(self.token_ids[self.prefix_offset:])
+        
+        if len(new_text) > len(prefix_text) and not new_text.endswith("�"):
+            self.prefix_offset = self.read_offset
+            self.read_offset = len(self.token_ids)
+            return new_text[len(prefix_text):]
+        return ""
+    
+    def flush(self):
+        """남은 토큰을 모두 디코딩하여 반환"""
+        prefix_text = self._decode(self.token_ids[self.prefix_offset:self.read_offset])
+        new_text = self._decode(self.token_ids[self.prefix_offset:])
+        self.prefix_offset = self.read_offset = len(self.token_ids)
+        return new_text[len(prefix_text):]
+
+class TokenStreamer:
+    """
+    model.generate의 토큰을 받아 텍스트 조각으로 전달하는 스트리머
+    
+    model.generate는 스트리머의 put()과 end()만 호출하므로 transformers의 BaseStreamer를
+    상속하지 않습니다. 덕분에 이 모듈은 transformers 없이 가져올 수 있습니다.
+    """
+    
+    def __init__(self, tokenizer, skip_prompt=True, timeout=None):
+        """
+        스트리머 초기화
+        
+        Args:
+            tokenizer: 사용할 토크나이저
+            skip_prompt: 처음 전달되는 프롬프트 토큰 무시 여부
+            timeout: 다음 텍스트 조각을 기다릴 최대 시간(초)
+        """
+        self.detokenizer = IncrementalDetokenizer(tokenizer)
+        self.skip_prompt = skip_prompt
+        self.timeout = timeout
+        self.cancelled = False
+        self._next_is_prompt = True
+        self._queue = queue.Queue()
+    
+    def put(self, value):
+        """생성 루프에서 새 토큰을 받을 때 호출됨"""
+        if self._next_is_prompt:
+            self._next_is_prompt = False
+            if self.skip_prompt:
+                return
+        
+        text = self.detokenizer.add(value.flatten().tolist())
+        if text:
+            self._queue.put(text)
+    
+    def end(self):
+        """생성이 끝났을 때 호출됨"""
+        text = self.detokenizer.flush()
+        if text:
+            self._queue.put(text)
+        self._queue.put(None)
+    
+    def cancel(self):
+        """소비자가 더 이상 읽지 않음을 표시 (생성 중단 조건에서 확인)"""
+        self.cancelled = True
+    
+    def __iter__(self):
+        while True:
+            text = self._queue.get(timeout=self.timeout)
+            if text is None:
+                return
+            yield text
\ No newline at end of file
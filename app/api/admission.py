@@ -0,0 +1,238 @@
+import math
+import time
+import threading
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from app.config import Config
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+class AdmissionRejected(Exception):
+    """요청을 받아들일 수 없을 때 발생하는 예외 (HTTP 응답으로 변환)"""
+    
+    def __init__(self, reason, message, status_code=429, retry_after=None):
+        super().__init__(message)
+        self.reason = reason
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+class _Ticket:
+    """대기열에 들어간 요청 하나"""
+    
+    def __init__(self, client_id, tokens):
+        self.client_id = client_id
+        self.tokens = tokens
+        self.enqueued_at = time.monotonic()
+        self.admitted_at = None
+        self.event = threading.Event()
+    
+    @property
+    def wait_seconds(self):
+        """대기열에서 기다린 시간(초)"""
+        return (self.admitted_at or time.monotonic()) - self.enqueued_at
+
+class AdmissionController:
+    """
+    생성 요청 앞단의 입장 제어
+    
+    동시에 생성하는 요청 수와 그 요청들이 필요로 하는 토큰 수(프롬프트 + 최대 생성 토큰)를
+    제한하고, 나머지는 길이가 제한된 대기열에 넣습니다. 대기열은 클라이언트별로 나눠
+    라운드 로빈으로 꺼내므로 한 클라이언트의 연속 요청이 다른 클라이언트를 밀어내지 않습니다.
+    대기열이 가득 찼거나 클라이언트별 한도를 넘은 요청은 기다리지 않고 바로 거절합니다.
+    """
+    
+    def __init__(self, max_concurrent=None, max_queue=None, max_per_client=None, token_budget=None,
+                 queue_timeout=None):
+        """
+        입장 제어기 초기화
+        
+        Args:
+            max_concurrent: 동시에 생성할 최대 요청 수 (기본값: Config.ADMISSION_MAX_CONCURRENT,
+                0이면 스케줄러 배치 크기 또는 1)
+            max_queue: 최대 대기 요청 수
+            max_per_client: 클라이언트별 최대 요청 수 (대기 + 실행 중)
+            token_budget: 실행 중인 요청이 함께 사용할 수 있는 최대 토큰 수
+            queue_timeout: 대기열 최대 대기 시간(초)
+        """
+        if max_concurrent is None:
+            max_concurrent = Config.ADMISSION_MAX_CONCURRENT
+        if not max_concurrent:
+            max_concurrent = Config.SCHEDULER_MAX_BATCH_SIZE if Config.SCHEDULER_ENABLED else 1
+        self.max_concurrent = max_concurrent
+        self.max_queue = Config.ADMISSION_MAX_QUEUE if max_queue is None else max_queue
+        self.max_per_client = max_per_client or Config.ADMISSION_MAX_PER_CLIENT
+        self.token_budget = token_budget or Config.ADMISSION_TOKEN_BUDGET
+        self.queue_timeout = queue_timeout or Config.ADMISSION_QUEUE_TIMEOUT
+        
+        self._lock = threading.Lock()
+        self._waiting = OrderedDict()  # 클라이언트 ID -> 대기 중인 _Ticket deque (라운드 로빈 순서)
+        self._queued = 0
+        self._running = 0
+        self._running_tokens = 0
+        self._per_client = {}
+        
+        # 통계
+        self.admitted = 0
+        self.rejected = {"queue_full": 0, "client_limit": 0, "too_large": 0, "timeout": 0}
+        self._waits = deque(maxlen=1000)
+        self._service_times = deque(maxlen=100)
+        self.max_wait = 0.0
+    
+    @contextmanager
+    def admit(self, client_id, tokens, cancel_token=None):
+        """
+        입장 허가를 받은 동안 블록 실행
+        
+        Args:
+            client_id: 클라이언트 식별자 (공정성과 클라이언트별 한도에 사용)
+            tokens: 요청이 필요로 하는 토큰 수 추정치
+            cancel_token: 요청의 CancellationToken (대기 중 취소·기한 초과 시 대기열에서 빠짐)
+        
+        Raises:
+            AdmissionRejected: 대기열이 가득 찼거나, 한도를 넘었거나, 대기 시간이 초과된 경우
+            GenerationCancelled: 대기 중 요청이 취소되었거나 기한이 지난 경우
+        
+        Yields:
+            입장한 요청의 티켓 (wait_seconds로 대기 시간 확인)
+        """
+        ticket = self.acquire(client_id, tokens, cancel_token)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+    
+    def acquire(self, client_id, tokens, cancel_token=None):
+        """
+        입장 허가 요청 (허가될 때까지 대기)
+        
+        Returns:
+            release()에 넘길 티켓
+        """
+        ticket = _Ticket(client_id, tokens)
+        with self._lock:
+            if tokens > self.token_budget:
+                self.rejected["too_large"] += 1
+                raise AdmissionRejected(
+                    "too_large",
+                    f"요청에 필요한 토큰 수({tokens})가 처리 한도({self.token_budget})를 넘습니다.",
+                    status_code=413
+                )
+            if self._per_client.get(client_id, 0) >= self.max_per_client:
+                self.rejected["client_limit"] += 1
+                raise AdmissionRejected(
+                    "client_limit", "처리 중인 요청이 너무 많습니다. 잠시 후 다시 시도해 주세요.",
+                    retry_after=self._retry_after()
+                )
+            # 대기열이 가득 차도 기다리는 요청이 없고 바로 실행할 수 있으면 받아들임
+            if self._queued >= self.max_queue and (self._waiting or not self._fits(tokens)):
+                self.rejected["queue_full"] += 1
+                raise AdmissionRejected(
+                    "queue_full", "서버가 바쁩니다. 잠시 후 다시 시도해 주세요.",
+                    retry_after=self._retry_after()
+                )
+            
+            self._per_client[client_id] = self._per_client.get(client_id, 0) + 1
+            self._waiting.setdefault(client_id, deque()).append(ticket)
+            self._queued += 1
+            self._dispatch()
+        
+        # 취소를 알아챌 수 있도록 짧게 나눠서 대기
+        deadline = ticket.enqueued_at + self.queue_timeout
+        while not ticket.event.is_set():
+            if cancel_token is not None and cancel_token.stopped:
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            ticket.event.wait(min(remaining, 0.25))
+        
+        with self._lock:
+            if ticket.admitted_at is None:
+                # 대기열에서 빼고 거절
+                self._waiting[client_id].remove(ticket)
+                if not self._waiting[client_id]:
+                    del self._waiting[client_id]
+                self._queued -= 1
+                self._release_client(client_id)
+                self._waits.append(time.monotonic() - ticket.enqueued_at)
+                if cancel_token is not None and cancel_token.stopped:
+                    cancel_token.raise_if_stopped()
+                self.rejected["timeout"] += 1
+                raise AdmissionRejected(
+                    "timeout", "대기 시간이 초과되었습니다. 잠시 후 다시 시도해 주세요.",
+                    retry_after=self._retry_after()
+                )
+        return ticket
+    
+    def release(self, ticket):
+        """실행이 끝난 요청의 자리를 반납하고 다음 요청 입장"""
+        with self._lock:
+            self._running -= 1
+            self._running_tokens -= ticket.tokens
+            self._release_client(ticket.client_id)
+            self._service_times.append(time.monotonic() - ticket.admitted_at)
+            self._dispatch()
+    
+    def stats(self):
+        """대기열 깊이, 대기 시간 등 입장 제어 통계 반환"""
+        with self._lock:
+            waits = sorted(self._waits)
+            return {
+                "queue_depth": self._queued,
+                "waiting_clients": len(self._waiting),
+                "running": self._running,
+                "running_tokens": self._running_tokens,
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "token_budget": self.token_budget,
+                "admitted": self.admitted,
+                "rejected": dict(self.rejected),
+                "avg_wait_seconds": sum(waits) / len(waits) if waits else 0.0,
+                "p95_wait_seconds": waits[int(len(waits) * 0.95)] if waits else 0.0,
+                "max_wait_seconds": self.max_wait,
+            }
+    
+    def _fits(self, tokens):
+        """지금 바로 실행할 수 있는지 (self._lock을 잡은 상태에서 호출)"""
+        return self._running < self.max_concurrent and self._running_tokens + tokens <= self.token_budget
+    
+    def _dispatch(self):
+        """
+        자리가 있는 만큼 대기 요청을 클라이언트 라운드 로빈으로 입장 (self._lock을 잡은 상태에서 호출)
+        
+        다음 차례 요청이 남은 토큰 예산에 맞지 않으면 뒤의 작은 요청을 먼저 넣지 않고 기다려서,
+        큰 요청이 계속 밀리지 않도록 합니다.
+        """
+        while self._waiting:
+            client_id, tickets = next(iter(self._waiting.items()))
+            ticket = tickets[0]
+            if not self._fits(ticket.tokens):
+                return
+            
+            tickets.popleft()
+            if tickets:
+                self._waiting.move_to_end(client_id)
+            else:
+                del self._waiting[client_id]
+            self._queued -= 1
+            self._running += 1
+            self._running_tokens += ticket.tokens
+            self.admitted += 1
+            
+            ticket.admitted_at = time.monotonic()
+            wait = ticket.admitted_at - ticket.enqueued_at
+            self._waits.append(wait)
+            self.max_wait = max(self.max_wait, wait)
+            ticket.event.set()
+    
+    def _release_client(self, client_id):
+        """클라이언트별 요청 수 감소 (self._lock을 잡은 상태에서 호출)"""
+        self._per_client[client_id] -= 1
+        if not self._per_client[client_id]:
+            del self._per_client[client_id]
+    
+    def _retry_after(self):
+        """대기열이 빠지는 데 걸릴 시간 추정(초) (self._lock을 잡은 상태에서 호출)"""
+        service_time = sum(self._service_times) / len(self._service_times) if self._service_times else 1.0
+        return max(1, math.ceil(service_time * (self._queued + 1) / self.max_concurrent))
\ No newline at end of file
@@ -1,15 +1,37 @@
 from flask import jsonify
+from app.agent.cancellation import GenerationCancelled
+from app.agent.response_cache import is_deterministic
+from app.agent.stopping import get_stop_strings
 from app.utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
-def chat_handler(agent, data):
+# 코드 향상 작업별 지시문
+ENHANCE_TASKS = {
+    "optimize": "다음 코드를 최적화해 주세요. 성능과 가독성을 개선하세요.",
+    "refactor": "다음 코드를 리팩토링해 주세요. 클린 코드 원칙을 적용하세요.",
+    "explain": "다음 코드를 상세히 설명해 주세요. 각 부분의 역할과 로직을 설명하세요."
+}
+
+def cancelled_response(e):
+    """
+    중단된 요청의 응답
+    
+    취소는 클라이언트가 이미 떠난 경우이므로 499(클라이언트 연결 종료),
+    기한 초과는 504와 함께 그때까지 생성된 부분 응답을 돌려줍니다.
+    """
+    status_code = 499 if e.reason == "cancelled" else 504
+    return jsonify({"error": str(e), "reason": e.reason, "partial_response": e.partial}), status_code
+
+def chat_handler(agent, data, session=None, cancel_token=None):
     """
     채팅 요청 처리
     
     Args:
         agent: DeepSeekAgent 인스턴스
         data: 요청 데이터
+        session: 대화 세션 (기본값: 에이전트의 기본 세션)
+        cancel_token: 요청의 CancellationToken (취소·기한 초과 시 생성 중단)
     
     Returns:
         Flask 응답
@@ -20,27 +42,44 @@ def chat_handler(agent, data):
         return jsonify({"error": "질문이 없습니다."}), 400
     
     if query.lower() == 'clear':
-        return jsonify({"response": agent.clear_history()})
+        return jsonify({"response": agent.clear_history(session=session)})
     
     try:
-        # 선택적 매개변수
-        max_length = data.get('max_length', 2048)
+        # 선택적 매개변수 (max_length는 이전 클라이언트 호환용으로 생성 토큰 수로 취급)
+        max_new_tokens = data.get('max_new_tokens', data.get('max_length'))
         temperature = data.get('temperature', 0.7)
+        speculative = bool(data.get('speculative', False))
+        stop_strings = get_stop_strings('chat') + tuple(data.get('stop') or ())
+        adapter = data.get('adapter') or None
+        
+        if adapter is not None and (agent.adapters is None or not agent.adapters.has(adapter)):
+            return jsonify({"error": f"등록되지 않은 어댑터입니다: {adapter}"}), 400
         
-        response = agent.generate_response(query, max_length, temperature)
+        response = agent.generate_response(query, max_new_tokens, temperature, session=session,
+                                           speculative=speculative, stop_strings=stop_strings, adapter=adapter,
+                                           cancel_token=cancel_token)
         return jsonify({"response": response})
     
+    except GenerationCancelled as e:
+        return cancelled_response(e)
     except Exception as e:
         logger.error(f"채팅 처리 중 오류: {str(e)}")
         return jsonify({"error": f"요청 처리 중 오류가 발생했습니다: {str(e)}"}), 500
 
-def enhance_code_handler(agent, data):
+def enhance_code_handler(agent, data, session=None, cache=None, cancel_token=None):
     """
     코드 향상 요청 처리
     
+    응답 캐시가 있으면 결정적 생성 요청(temperature 0 또는 seed 지정)은 대화 기록과 무관한
+    단발성 생성으로 처리하고 캐시를 사용합니다. 이런 요청은 상태가 없으므로 세션을 읽지도 않고
+    세션의 대화 기록에 턴을 남기지도 않습니다 (같은 요청은 세션과 관계없이 같은 응답을 받음).
+    
     Args:
         agent: DeepSeekAgent 인스턴스
         data: 요청 데이터
+        session: 대화 세션 (기본값: 에이전트의 기본 세션, 캐시를 쓰는 결정적 요청에는 사용하지 않음)
+        cache: ResponseCache 인스턴스 (None이면 캐시 사용 안 함)
+        cancel_token: 요청의 CancellationToken (중단된 부분 결과는 캐시하지 않음)
     
     Returns:
         Flask 응답
@@ -51,18 +90,30 @@ def enhance_code_handler(agent, data):
     if not code:
         return jsonify({"error": "코드가 없습니다."}), 400
     
-    tasks = {
-        "optimize": "다음 코드를 최적화해 주세요. 성능과 가독성을 개선하세요.",
-        "refactor": "다음 코드를 리팩토링해 주세요. 클린 코드 원칙을 적용하세요.",
-        "explain": "다음 코드를 상세히 설명해 주세요. 각 부분의 역할과 로직을 설명하세요."
-    }
-    
-    prompt = f"{tasks.get(task, tasks['optimize'])}\n\n```python\n{code}\n```"
+    if task not in ENHANCE_TASKS:
+        task = 'optimize'
+    prompt = f"{ENHANCE_TASKS[task]}\n\n```python\n{code}\n```"
     
     try:
-        response = agent.generate_response(prompt)
+        max_new_tokens = data.get('max_new_tokens', data.get('max_length'))
+        temperature = data.get('temperature', 0.7)
+        seed = data.get('seed')
+        stop_strings = get_stop_strings(task) + tuple(data.get('stop') or ())
+        
+        if cache is not None and is_deterministic(temperature, seed):
+            key = cache.make_key(agent.model_name, code, task, max_new_tokens=max_new_tokens,
+                                 temperature=temperature, seed=seed, stop=list(stop_strings))
+            response, cached = cache.get_or_generate(
+                key, lambda: agent.generate_once(prompt, max_new_tokens, temperature, seed, stop_strings, cancel_token)
+            )
+            return jsonify({"response": response, "cached": cached})
+        
+        response = agent.generate_response(prompt, max_new_tokens, temperature, session=session,
+                                           stop_strings=stop_strings, cancel_token=cancel_token)
         return jsonify({"response": response})
     
+    except GenerationCancelled as e:
+        return cancelled_response(e)
     except Exception as e:
         logger.error(f"코드 향상 중 오류: {str(e)}")
         return jsonify({"error": f"요청 처리 중 오류가 발생했습니다: {str(e)}"}), 500
\ No newline at end of file
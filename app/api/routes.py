@@ -1,13 +1,32 @@
-from flask import Flask, request, jsonify, render_template
-from app.agent.deepseek_agent import DeepSeekAgent
+import math
+import time
+import uuid
+import threading
+from flask import Flask, Response, g, request, jsonify, render_template, session
+from app.agent.cancellation import CancellationRegistry, CancellationToken, GenerationCancelled
+from app.agent.loader import AgentLoader
+from app.agent.response_cache import ResponseCache
 from app.config import Config
-from app.api.handlers import chat_handler, enhance_code_handler
+from app.api.admission import AdmissionController, AdmissionRejected
+from app.api.handlers import ENHANCE_TASKS, cancelled_response, chat_handler, enhance_code_handler
 from app.utils.logger import setup_logger
+from app.utils.metrics import QUEUE_WAIT_SECONDS, REQUEST_SECONDS, registry as metrics_registry, request_labels
+from app.utils.tracing import Tracer, profiler
 
 logger = setup_logger(__name__)
 
-def create_app(model_name=None):
-    """Flask 앱 생성 및 설정"""
+def create_app(model_name=None, precision=None, agent=None):
+    """
+    Flask 앱 생성 및 설정
+    
+    모델은 백그라운드에서 로딩되므로 앱은 바로 요청을 받을 수 있습니다.
+    로딩이 끝나기 전의 API 요청에는 503과 Retry-After로 응답합니다.
+    
+    Args:
+        model_name: 사용할 모델 이름
+        precision: 정밀도 모드
+        agent: 이미 로드된 에이전트 (워커 서버가 fork 전에 로드한 경우)
+    """
     app = Flask(__name__, 
                 template_folder=Config.BASE_DIR + '/templates',
                 static_folder=Config.BASE_DIR + '/static')
@@ -16,8 +35,310 @@ def create_app(model_name=None):
     app.config['SECRET_KEY'] = Config.SECRET_KEY
     app.config['DEBUG'] = Config.DEBUG
     
-    # 에이전트 인스턴스
-    agent = DeepSeekAgent(model_name)
+    # 모델 로딩 후 채워지는 구성 요소
+    services = {}
+    
+    def prepare(agent):
+        """모델 로딩 직후 (워밍업 전) 서비스 구성 요소 준비"""
+        from app.agent.scheduler import GenerationScheduler
+        from app.agent.session_pool import SessionPool
+        
+        # 동시 요청을 하나의 디코딩 루프로 묶는 스케줄러가 모델을 소유
+        if Config.SCHEDULER_ENABLED:
+            scheduler = GenerationScheduler(
+                agent.model, agent.tokenizer, agent.device, prefix_cache=agent.prefix_cache, adapters=agent.adapters
+            ).start()
+            agent.attach_scheduler(scheduler)
+        
+        # 클라이언트별 대화 상태
+        services['sessions'] = SessionPool(agent)
+    
+    # 에이전트 인스턴스 (백그라운드 로딩)
+    loader = AgentLoader(model_name, precision, on_loaded=prepare, agent=agent).start()
+    
+    # 결정적 요청용 응답 캐시
+    response_cache = ResponseCache() if Config.RESPONSE_CACHE_ENABLED else None
+    
+    # 자주 쓰는 TTS 문구 미리 합성 (워커 서버는 fork 전에 부모 프로세스에서 처리)
+    if agent is None and Config.TTS_CACHE_ENABLED and Config.TTS_WARMUP_FILE:
+        from app.audio.tts import warm_tts_cache
+        threading.Thread(target=warm_tts_cache, name="tts-warmup", daemon=True).start()
+    
+    # 생성 요청 대기열과 동시 실행 한도
+    admission = AdmissionController()
+    
+    # 요청 ID별 취소 토큰 (POST /api/cancel로 진행 중인 생성을 중단)
+    cancellations = CancellationRegistry()
+    
+    # 지표의 모델 레이블
+    model_label = loader.model_name or Config.DEFAULT_MODEL
+    
+    # 요청 단계별 구간 추적 (Chrome trace JSON으로 내보냄)
+    tracer = Tracer()
+    
+    def current_session(data):
+        """
+        요청의 세션 ID(본문의 session_id 또는 쿠키)에 해당하는 대화 상태
+        
+        with 문으로 사용하며, 요청이 끝날 때까지 세션이 보관되지 않도록 고정합니다.
+        """
+        session_id = data.get('session_id') if data else None
+        if not session_id:
+            if 'session_id' not in session:
+                session['session_id'] = uuid.uuid4().hex
+            session_id = session['session_id']
+        return services['sessions'].use(session_id)
+    
+    def parse_max_new_tokens(data):
+        """
+        요청의 최대 생성 토큰 수 검증
+        
+        max_length는 이전 클라이언트 호환용 이름이며, Config.MAX_NEW_TOKENS를 넘는 값은 잘라냅니다.
+        
+        Returns:
+            1 이상 Config.MAX_NEW_TOKENS 이하의 정수
+        
+        Raises:
+            ValueError: 정수가 아니거나 1보다 작은 경우
+        """
+        value = data.get('max_new_tokens', data.get('max_length'))
+        if value is None:
+            return Config.MAX_NEW_TOKENS
+        if isinstance(value, bool) or not isinstance(value, (int, str)):
+            raise ValueError(value)
+        value = int(value)
+        if value < 1:
+            raise ValueError(value)
+        return min(value, Config.MAX_NEW_TOKENS)
+    
+    def parse_temperature(data):
+        """
+        요청의 샘플링 온도 검증 (JSON 문자열로 온 숫자도 허용)
+        
+        Returns:
+            0 이상의 실수 (없으면 0.7)
+        
+        Raises:
+            ValueError: 숫자가 아니거나 음수, 무한대인 경우
+        """
+        value = data.get('temperature', 0.7)
+        if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+            raise ValueError(value)
+        value = float(value)
+        if not math.isfinite(value) or value < 0:
+            raise ValueError(value)
+        return value
+    
+    def parse_seed(data):
+        """
+        요청의 샘플링 시드 검증
+        
+        Returns:
+            0 이상 2^63 미만의 정수 (없으면 None)
+        
+        Raises:
+            ValueError: 정수가 아니거나 범위를 벗어난 경우
+        """
+        value = data.get('seed')
+        if value is None:
+            return None
+        if isinstance(value, bool) or not isinstance(value, (int, str)):
+            raise ValueError(value)
+        value = int(value)
+        if not 0 <= value < 2 ** 63:
+            raise ValueError(value)
+        return value
+    
+    def parse_stop(data):
+        """
+        요청의 추가 종료 문자열 검증
+        
+        Returns:
+            종료 문자열 목록 (문자열 하나는 목록으로 감쌈, 없으면 빈 목록)
+        
+        Raises:
+            ValueError: 비어 있지 않은 문자열의 목록이 아닌 경우
+        """
+        value = data.get('stop')
+        if value is None:
+            return []
+        if isinstance(value, str):
+            value = [value]
+        if not isinstance(value, list) or not all(isinstance(stop, str) and stop for stop in value):
+            raise ValueError(value)
+        return value
+    
+    def token_need(agent, data, text, conversation=None):
+        """요청이 필요로 할 토큰 수 추정 (프롬프트 + 대화 기록 + 최대 생성 토큰, data는 검증된 값)"""
+        history_tokens = min(conversation.history_tokens(), Config.CONTEXT_TOKEN_BUDGET) if conversation else 0
+        return len(agent.tokenizer.encode(text)) + history_tokens + data['max_new_tokens']
+    
+    def invalid_request(data):
+        """
+        생성 요청 본문 검증 (최대 생성 토큰 수, 온도, 시드, 종료 문자열은 검증된 값으로 data에 다시 기록)
+        
+        Returns:
+            잘못된 요청이면 400 응답, 아니면 None
+        """
+        if not isinstance(data, dict):
+            return jsonify({"error": "요청 본문은 JSON 객체여야 합니다."}), 400
+        try:
+            data['max_new_tokens'] = parse_max_new_tokens(data)
+        except ValueError:
+            return jsonify({"error": "max_new_tokens는 1 이상의 정수여야 합니다."}), 400
+        try:
+            data['temperature'] = parse_temperature(data)
+        except ValueError:
+            return jsonify({"error": "temperature는 0 이상의 숫자여야 합니다."}), 400
+        try:
+            data['seed'] = parse_seed(data)
+        except ValueError:
+            return jsonify({"error": "seed는 0 이상의 정수여야 합니다."}), 400
+        try:
+            data['stop'] = parse_stop(data)
+        except ValueError:
+            return jsonify({"error": "stop은 비어 있지 않은 문자열 또는 그 목록이어야 합니다."}), 400
+        return None
+    
+    def cancel_token_for(data):
+        """
+        요청의 처리 기한으로 취소 토큰 생성
+        
+        기한은 본문의 timeout 또는 X-Request-Timeout 헤더(초)이며 Config.REQUEST_TIMEOUT을 넘을 수 없습니다.
+        """
+        timeout = Config.REQUEST_TIMEOUT or None
+        requested = data.get('timeout') or request.headers.get('X-Request-Timeout')
+        try:
+            requested = float(requested) if requested else None
+        except (TypeError, ValueError):
+            requested = None
+        if requested and requested > 0:
+            timeout = min(timeout, requested) if timeout else requested
+        return CancellationToken(timeout)
+    
+    def request_id_for(data):
+        """클라이언트가 정한 요청 ID (본문의 request_id 또는 X-Request-Id 헤더)"""
+        return data.get('request_id') or request.headers.get('X-Request-Id')
+    
+    def run_generation(endpoint, task, data, need, handler):
+        """
+        입장 제어, 취소 토큰, 지표 레이블을 적용해 생성 핸들러 실행
+        
+        Args:
+            endpoint: 지표의 엔드포인트 레이블
+            task: 지표의 작업 레이블
+            data: 요청 데이터
+            need: 요청이 필요로 할 토큰 수
+            handler: 취소 토큰을 받아 Flask 응답을 반환하는 함수
+        """
+        g.metrics_task = task
+        labels = (endpoint, task, model_label)
+        request_id = request_id_for(data)
+        trace_requested = bool(data.get('trace') or request.headers.get('X-Trace'))
+        # 스케줄러가 모델을 실행하면 측정은 스케줄러 스레드가 맡음 (추측 디코딩은 요청 스레드에서 실행)
+        profile_locally = loader.agent.scheduler is None or bool(data.get('speculative'))
+        try:
+            with profiler.request(request_id or endpoint, profile_locally) as profiling, \
+                    tracer.trace(endpoint, request_id, trace_requested or profiling, profiling) as trace, \
+                    request_labels(*labels), \
+                    cancellations.track(request_id, cancel_token_for(data), request.remote_addr) as token:
+                admit_start = time.perf_counter()
+                with admission.admit(request.remote_addr, need, token) as ticket:
+                    QUEUE_WAIT_SECONDS.observe(ticket.wait_seconds, labels)
+                    if trace is not None:
+                        trace.add("admission", admit_start, time.perf_counter())
+                    return handler(token)
+        except AdmissionRejected as e:
+            return rejected_response(e)
+        except GenerationCancelled as e:
+            return cancelled_response(e)
+    
+    def admin_allowed():
+        """관리자 API 접근 허용 여부 (ADMIN_TOKEN이 없으면 로컬 접속만 허용)"""
+        if Config.ADMIN_TOKEN:
+            return request.headers.get('X-Admin-Token') == Config.ADMIN_TOKEN
+        return request.remote_addr in ('127.0.0.1', '::1')
+    
+    def rejected_response(e):
+        """입장 거절 응답 (429 또는 413, Retry-After 포함)"""
+        response = jsonify({"error": str(e), "reason": e.reason})
+        if e.retry_after is not None:
+            response.headers['Retry-After'] = str(e.retry_after)
+        response.status_code = e.status_code
+        return response
+    
+    def not_ready_response():
+        """모델이 준비되지 않았을 때의 503 응답"""
+        status = loader.status()
+        if loader.failed:
+            response = jsonify({"error": "모델 로딩에 실패했습니다.", **status})
+        else:
+            response = jsonify({"error": "모델을 로딩 중입니다. 잠시 후 다시 시도해 주세요.", **status})
+            response.headers['Retry-After'] = '5'
+        response.status_code = 503
+        return response
+    
+    @app.before_request
+    def start_timer():
+        g.request_start = time.perf_counter()
+    
+    @app.after_request
+    def record_request(response):
+        """요청 처리 시간 기록 (라우트에 맞지 않은 요청과 정적 파일 제외)"""
+        if Config.METRICS_ENABLED and request.url_rule is not None and request.endpoint != 'static':
+            REQUEST_SECONDS.observe(
+                time.perf_counter() - g.request_start,
+                (request.endpoint, g.get('metrics_task', ''), model_label, str(response.status_code))
+            )
+        return response
+    
+    @app.route('/metrics')
+    def metrics():
+        """Prometheus 텍스트 형식의 지표 (모델 로딩 중에도 응답)"""
+        if not Config.METRICS_ENABLED:
+            return jsonify({"error": "지표 수집이 꺼져 있습니다."}), 404
+        return Response(metrics_registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+    
+    @app.route('/api/admin/traces')
+    def traces():
+        """
+        최근 요청 추적을 Chrome trace JSON으로 내보냄 (chrome://tracing, Perfetto에서 열기)
+        
+        ?request_id=로 한 요청만 내보낼 수 있고, ?summary=1이면 요청별 처리 시간 목록만 반환합니다.
+        """
+        if not admin_allowed():
+            return jsonify({"error": "권한이 없습니다."}), 403
+        if request.args.get('summary'):
+            return jsonify(tracer.stats())
+        return jsonify(tracer.export(request.args.get('request_id')))
+    
+    @app.route('/api/admin/profile', methods=['GET', 'POST'])
+    def profile():
+        """
+        다음 N개 생성 요청을 torch.profiler로 측정 (POST {"requests": N}, GET은 상태 조회)
+        
+        결과는 Config.LOG_DIR/profiles 아래에 Chrome trace JSON으로 저장됩니다.
+        """
+        if not admin_allowed():
+            return jsonify({"error": "권한이 없습니다."}), 403
+        if request.method == 'POST':
+            data = request.get_json(silent=True) or {}
+            try:
+                profiler.arm(data.get('requests', 1))
+            except (TypeError, ValueError):
+                return jsonify({"error": "requests는 정수여야 합니다."}), 400
+        return jsonify(profiler.stats())
+    
+    @app.route('/healthz')
+    def healthz():
+        """생존 확인 (로딩 중에도 정상, 로딩 실패 시에만 503)"""
+        status = loader.status()
+        return jsonify(status), 503 if loader.failed else 200
+    
+    @app.route('/readyz')
+    def readyz():
+        """준비 확인 (모델 로딩과 워밍업이 끝나야 200)"""
+        return jsonify(loader.status()), 200 if loader.ready else 503
     
     @app.route('/')
     def home():
@@ -29,17 +350,72 @@ def create_app(model_name=None):
         """채팅 페이지"""
         return render_template('chat.html')
     
+    @app.route('/api/stats')
+    def stats():
+        """서비스 구성 요소별 통계"""
+        if not loader.ready:
+            return not_ready_response()
+        agent = loader.agent
+        return jsonify({
+            "admission": admission.stats(),
+            "sessions": services['sessions'].stats(),
+            "scheduler": agent.scheduler.stats() if agent.scheduler is not None else None,
+            "speculative": agent.speculative.stats() if agent.speculative is not None else None,
+            "prefix_cache": agent.prefix_cache.stats() if agent.prefix_cache is not None else None,
+            "response_cache": response_cache.stats() if response_cache is not None else None,
+            "adapters": agent.adapters.stats() if agent.adapters is not None else None,
+            "models": agent.registry.stats(),
+            "requests": cancellations.stats(),
+        })
+    
     @app.route('/api/chat', methods=['POST'])
     def chat():
         """채팅 API 엔드포인트"""
+        if not loader.ready:
+            return not_ready_response()
         data = request.json
-        return chat_handler(agent, data)
+        invalid = invalid_request(data)
+        if invalid is not None:
+            return invalid
+        with current_session(data) as conversation:
+            need = token_need(loader.agent, data, data.get('query', ''), conversation)
+            return run_generation(
+                'chat', 'chat', data, need, lambda token: chat_handler(loader.agent, data, conversation, token)
+            )
     
     @app.route('/api/enhance', methods=['POST'])
     def enhance():
         """코드 향상 API 엔드포인트"""
+        if not loader.ready:
+            return not_ready_response()
         data = request.json
-        return enhance_code_handler(agent, data)
+        invalid = invalid_request(data)
+        if invalid is not None:
+            return invalid
+        task = data.get('task') if data.get('task') in ENHANCE_TASKS else 'optimize'
+        with current_session(data) as conversation:
+            need = token_need(loader.agent, data, data.get('code', ''), conversation)
+            return run_generation(
+                'enhance', task, data, need,
+                lambda token: enhance_code_handler(loader.agent, data, conversation, response_cache, token)
+            )
+    
+    @app.route('/api/cancel', methods=['POST'])
+    def cancel():
+        """
+        진행 중인 요청 취소
+        
+        WSGI 서버는 클라이언트 연결이 끊긴 것을 생성이 끝날 때까지 알 수 없으므로,
+        프런트엔드가 요청을 중단할 때(navigator.sendBeacon 포함) 이 엔드포인트로 알립니다.
+        요청을 보낸 클라이언트만 취소할 수 있으며, 관리자는 모든 요청을 취소할 수 있습니다.
+        """
+        # sendBeacon은 text/plain으로 보내므로 Content-Type과 관계없이 JSON으로 파싱
+        data = request.get_json(force=True, silent=True) or {}
+        request_id = data.get('request_id') or request.headers.get('X-Request-Id')
+        if not request_id:
+            return jsonify({"error": "request_id가 필요합니다."}), 400
+        owner = None if admin_allowed() else request.remote_addr
+        return jsonify({"request_id": request_id, "cancelled": cancellations.cancel(request_id, owner)})
     
     @app.errorhandler(404)
     def page_not_found(e):
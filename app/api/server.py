@@ -0,0 +1,144 @@
+import gc
+import os
+import shutil
+from gunicorn.app.base import BaseApplication
+from app.config import Config
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+def cpu_slices(workers, cores=None):
+    """
+    사용 가능한 코어를 워커 수만큼 연속된 구간으로 나눔
+    
+    Args:
+        workers: 워커 수
+        cores: 나눌 코어 번호 목록 (기본값: 현재 프로세스에 허용된 코어)
+    
+    Returns:
+        워커별 코어 번호 목록 (코어보다 워커가 많으면 코어를 돌아가며 하나씩 공유)
+    """
+    if cores is None:
+        cores = os.sched_getaffinity(0) if hasattr(os, "sched_getaffinity") else range(os.cpu_count() or 1)
+    cores = sorted(cores)
+    if workers >= len(cores):
+        return [[cores[i % len(cores)]] for i in range(workers)]
+    
+    size, extra = divmod(len(cores), workers)
+    slices = []
+    start = 0
+    for i in range(workers):
+        end = start + size + (1 if i < extra else 0)
+        slices.append(cores[start:end])
+        start = end
+    return slices
+
+class PreforkServer(BaseApplication):
+    """
+    모델을 한 번 로드한 뒤 여러 워커 프로세스를 fork하는 운영용 웹 서버 (gunicorn)
+    
+    모델 가중치는 fork 전에 부모 프로세스에서 로드되므로 워커들이 copy-on-write로 같은 메모리
+    페이지를 공유합니다. 각 워커는 코어 구간 하나에 고정되고 그 코어 수만큼 torch 연산 스레드를
+    사용하며, 스케줄러·세션·입장 제어는 워커마다 따로 둡니다.
+    """
+    
+    def __init__(self, model_name=None, precision=None, port=5000, workers=None, threads=None,
+                 http_threads=None, host="0.0.0.0"):
+        """
+        서버 초기화
+        
+        Args:
+            model_name: 사용할 모델 이름
+            precision: 정밀도 모드
+            port: 포트
+            workers: 워커 프로세스 수 (기본값: Config.WEB_WORKERS)
+            threads: 워커별 torch 연산 스레드 수 (기본값: Config.WEB_THREADS, 0이면 할당된 코어 수)
+            http_threads: 워커별 요청 처리 스레드 수 (기본값: Config.WEB_HTTP_THREADS)
+            host: 바인딩할 주소
+        """
+        self.model_name = model_name
+        self.precision = precision
+        self.workers = workers or Config.WEB_WORKERS
+        self.threads = Config.WEB_THREADS if threads is None else threads
+        self.http_threads = http_threads or Config.WEB_HTTP_THREADS
+        self.bind = f"{host}:{port}"
+        self.slices = cpu_slices(self.workers)
+        self.metrics_dir = os.path.join(Config.DATA_DIR, "metrics")
+        self.agent = None
+        super().__init__()
+    
+    def load_config(self):
+        """gunicorn 설정"""
+        options = {
+            "bind": self.bind,
+            "workers": self.workers,
+            "worker_class": "gthread",
+            "threads": self.http_threads,
+            # 생성 요청이 요청 처리 기한보다 오래 걸려도 워커를 죽이지 않도록 여유를 둠
+            "timeout": int(Config.REQUEST_TIMEOUT or 600) + 30,
+            "on_starting": self._on_starting,
+            "pre_fork": self._pre_fork,
+            "post_fork": self._post_fork,
+        }
+        for key, value in options.items():
+            self.cfg.set(key, value)
+    
+    def load(self):
+        """워커 프로세스에서 앱 생성 (fork 전에 로드한 에이전트 사용)"""
+        from app.api.routes import create_app
+        return create_app(self.model_name, self.precision, agent=self.agent)
+    
+    def run(self):
+        """모델을 로드하고 워커를 띄운 뒤 서버 실행"""
+        self.agent = self._preload()
+        logger.info(
+            f"워커 서버 시작: {self.bind}, 워커 {self.workers}개, "
+            f"워커별 코어 {[len(cores) for cores in self.slices]}, 요청 처리 스레드 {self.http_threads}개"
+        )
+        super().run()
+    
+    def _preload(self):
+        """부모 프로세스에서 모델 로드"""
+        import torch
+        from app.agent.deepseek_agent import DeepSeekAgent
+        
+        # 부모에서 연산 스레드 풀을 만들면 fork된 워커의 OpenMP 풀이 멈출 수 있으므로 단일 스레드로 로드
+        torch.set_num_threads(1)
+        agent = DeepSeekAgent(self.model_name, self.precision)
+        
+        # 자주 쓰는 TTS 문구를 미리 합성해 디스크 캐시를 채움 (워커가 함께 사용)
+        if Config.TTS_CACHE_ENABLED and Config.TTS_WARMUP_FILE:
+            from app.audio.tts import warm_tts_cache
+            warm_tts_cache()
+        
+        # 로드 중 생긴 객체를 GC 추적에서 빼서 워커의 GC가 공유 페이지에 쓰지 않도록 함
+        gc.collect()
+        gc.freeze()
+        return agent
+    
+    def _on_starting(self, server):
+        """이전 실행의 워커별 지표 파일 정리 (마스터 프로세스)"""
+        shutil.rmtree(self.metrics_dir, ignore_errors=True)
+    
+    def _pre_fork(self, server, worker):
+        """비어 있는 코어 구간을 워커에 배정 (마스터 프로세스)"""
+        used = {getattr(w, "slot", None) for w in server.WORKERS.values()}
+        worker.slot = next((i for i in range(len(self.slices)) if i not in used), len(used) % len(self.slices))
+    
+    def _post_fork(self, server, worker):
+        """워커 프로세스를 코어 구간에 고정하고 연산 스레드 수 설정"""
+        import torch
+        from app.utils.metrics import registry as metrics_registry
+        
+        cores = self.slices[worker.slot]
+        if hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, cores)
+        torch.set_num_threads(self.threads or len(cores))
+        
+        # 같은 포트를 나눠 받으므로 지표는 모든 워커의 값을 합쳐 출력
+        if Config.METRICS_ENABLED and self.workers > 1:
+            metrics_registry.share(self.metrics_dir)
+        logger.info(
+            f"워커 {worker.slot} (pid {os.getpid()}): 코어 {cores[0]}-{cores[-1]}, "
+            f"torch 스레드 {torch.get_num_threads()}개"
+        )
\ No newline at end of file
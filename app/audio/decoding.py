@@ -0,0 +1,80 @@
+import io
+from functools import lru_cache
+from math import gcd
+import numpy as np
+import soundfile as sf
+from scipy.signal import firwin, resample_poly
+
+# Whisper가 입력으로 기대하는 샘플링 레이트
+WHISPER_SAMPLE_RATE = 16000
+
+class AudioDecodeError(ValueError):
+    """메모리에서 디코딩할 수 없는 오디오 형식 (WAV, FLAC, OGG 등 libsndfile 지원 형식만 가능)"""
+
+def decode_audio(data):
+    """
+    오디오 바이트를 메모리에서 모노 float32 배열로 디코딩
+    
+    Args:
+        data: WAV, FLAC, OGG 등의 오디오 데이터 (바이트)
+    
+    Returns:
+        (샘플 배열, 샘플링 레이트)
+    
+    Raises:
+        AudioDecodeError: libsndfile이 읽을 수 없는 형식인 경우
+    """
+    try:
+        audio, sample_rate = sf.read(io.BytesIO(data), dtype="float32", always_2d=True)
+    except (sf.LibsndfileError, RuntimeError, TypeError) as e:
+        raise AudioDecodeError(f"오디오 디코딩 실패: {str(e)}") from e
+    
+    # 여러 채널이면 평균으로 모노 변환
+    if audio.shape[1] == 1:
+        return audio[:, 0], sample_rate
+    return audio.mean(axis=1, dtype=np.float32), sample_rate
+
+@lru_cache(maxsize=8)
+def _polyphase_filter(up, down):
+    """resample_poly 기본값과 같은 저역 통과 필터 (변환 비율마다 한 번만 설계)"""
+    max_rate = max(up, down)
+    half_len = 10 * max_rate
+    taps = firwin(2 * half_len + 1, 1.0 / max_rate, window=("kaiser", 5.0))
+    taps.setflags(write=False)
+    return taps
+
+def resample(audio, orig_sr, target_sr=WHISPER_SAMPLE_RATE):
+    """
+    폴리페이즈 필터로 샘플링 레이트 변환 (예: 22050 Hz → 16000 Hz는 320/441배)
+    
+    Args:
+        audio: 모노 float32 샘플 배열
+        orig_sr: 원본 샘플링 레이트
+        target_sr: 목표 샘플링 레이트
+    
+    Returns:
+        변환된 float32 샘플 배열
+    """
+    if orig_sr == target_sr or len(audio) == 0:
+        return audio
+    divisor = gcd(int(orig_sr), int(target_sr))
+    up, down = int(target_sr) // divisor, int(orig_sr) // divisor
+    resampled = resample_poly(audio, up, down, window=_polyphase_filter(up, down))
+    return resampled.astype(np.float32, copy=False)
+
+def load_audio_bytes(data, sample_rate=WHISPER_SAMPLE_RATE):
+    """
+    오디오 바이트를 디코딩하고 목표 샘플링 레이트로 변환 (임시 파일, ffmpeg 없이)
+    
+    Args:
+        data: 오디오 데이터 (바이트)
+        sample_rate: 목표 샘플링 레이트
+    
+    Returns:
+        모노 float32 샘플 배열
+    
+    Raises:
+        AudioDecodeError: 메모리에서 디코딩할 수 없는 형식인 경우
+    """
+    audio, orig_sr = decode_audio(data)
+    return resample(audio, orig_sr, sample_rate)
\ No newline at end of file
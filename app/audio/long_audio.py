@@ -0,0 +1,219 @@
+import os
+import re
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from app.audio.decoding import WHISPER_SAMPLE_RATE, AudioDecodeError, load_audio_bytes
+from app.audio.streaming import EnergyVAD
+from app.config import Config
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# 워커 프로세스마다 한 번만 로드하는 Whisper 모델
+_worker_model = None
+
+def load_audio_file(path, sample_rate=WHISPER_SAMPLE_RATE):
+    """
+    오디오 파일을 16 kHz 모노 float32 배열로 로드
+    
+    WAV, FLAC, OGG는 메모리에서 디코딩하고, 그 밖의 형식은 Whisper의 ffmpeg 디코딩을 사용합니다.
+    
+    Args:
+        path: 오디오 파일 경로
+        sample_rate: 목표 샘플링 레이트
+    
+    Returns:
+        모노 float32 샘플 배열
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    try:
+        return load_audio_bytes(data, sample_rate)
+    except AudioDecodeError:
+        from whisper.audio import load_audio
+        return load_audio(path, sr=sample_rate)
+
+def plan_chunks(audio, sample_rate=WHISPER_SAMPLE_RATE, chunk_seconds=None, overlap_seconds=None, search_seconds=5.0):
+    """
+    긴 오디오를 가장 조용한 지점에서 자르고 앞 청크와 조금씩 겹치게 나눔
+    
+    각 청크의 끝은 목표 길이 직전 search_seconds 안에서 에너지가 가장 낮은 프레임으로 정하고,
+    다음 청크는 그 지점보다 overlap_seconds 앞에서 시작합니다.
+    
+    Args:
+        audio: 모노 float32 샘플 배열
+        sample_rate: 샘플링 레이트
+        chunk_seconds: 최대 청크 길이 (기본값: Config.STT_CHUNK_SECONDS)
+        overlap_seconds: 청크 사이 겹침 길이 (기본값: Config.STT_CHUNK_OVERLAP_SECONDS)
+        search_seconds: 자를 지점을 찾는 구간 길이
+    
+    Returns:
+        (시작 샘플, 끝 샘플) 목록 (끝 샘플이 다음 청크와의 경계)
+    """
+    chunk_seconds = chunk_seconds or Config.STT_CHUNK_SECONDS
+    overlap_seconds = Config.STT_CHUNK_OVERLAP_SECONDS if overlap_seconds is None else overlap_seconds
+    total = len(audio)
+    chunk = int(chunk_seconds * sample_rate)
+    if total <= chunk:
+        return [(0, total)]
+    
+    overlap = int(min(overlap_seconds, chunk_seconds / 4) * sample_rate)
+    search = int(min(search_seconds, chunk_seconds / 2) * sample_rate)
+    vad = EnergyVAD(sample_rate)
+    frame = vad.frame_size
+    count = total // frame
+    energies = vad.frame_energies(audio[:count * frame].reshape(count, frame))
+    
+    chunks = []
+    start = 0
+    while True:
+        end = start + chunk
+        if end >= total:
+            chunks.append((start, total))
+            return chunks
+        low, high = max(start + 2 * overlap, end - search) // frame, end // frame
+        cut = (low + int(np.argmin(energies[low:high]))) * frame if high > low else end
+        chunks.append((start, cut))
+        start = cut - overlap
+
+def _init_worker(model_name, threads):
+    """워커 프로세스 초기화 (Whisper를 한 번만 로드)"""
+    global _worker_model
+    import torch
+    import whisper
+    
+    torch.set_num_threads(threads)
+    _worker_model = whisper.load_model(model_name)
+
+def _transcribe_chunk(audio, offset, language):
+    """
+    워커 프로세스에서 청크 하나를 변환
+    
+    Returns:
+        전체 오디오 기준 시각으로 바꾼 구간 목록
+    """
+    result = _worker_model.transcribe(audio, language=language, fp16=False)
+    return [
+        {"start": round(segment["start"] + offset, 3), "end": round(segment["end"] + offset, 3),
+         "text": segment["text"].strip()}
+        for segment in result["segments"]
+        if segment["text"].strip()
+    ]
+
+def _normalize_word(word):
+    return re.sub(r"[^\w]", "", word.lower())
+
+def _trim_repeated_words(previous, segment, max_words=15):
+    """앞 청크 끝과 겹쳐 다시 인식된 단어를 다음 청크 첫 구간에서 제거"""
+    tail = [_normalize_word(word) for word in previous.split()[-max_words:]]
+    words = segment["text"].split()
+    head = [_normalize_word(word) for word in words[:max_words]]
+    for size in range(min(len(tail), len(head)), 1, -1):
+        if tail[-size:] == head[:size]:
+            return dict(segment, text=" ".join(words[size:]))
+    return segment
+
+def merge_chunks(chunks, results):
+    """
+    청크별 변환 결과를 겹침 없이 이어 붙임
+    
+    겹친 구간은 청크를 자른 지점(무음)을 경계로 중심 시각이 경계 앞이면 앞 청크, 뒤면 다음
+    청크의 구간을 사용하고, 경계에 걸쳐 두 번 인식된 단어는 다음 청크에서 제거합니다.
+    
+    Args:
+        chunks: plan_chunks()의 (시작 샘플, 끝 샘플) 목록
+        results: 청크별 구간 목록 (전체 오디오 기준 시각)
+    
+    Returns:
+        이어 붙인 구간 목록
+    """
+    merged = []
+    for index, segments in enumerate(results):
+        # 이번 청크는 앞 청크를 자른 지점부터 자신을 자른 지점까지를 맡음
+        low = chunks[index - 1][1] / WHISPER_SAMPLE_RATE if index > 0 else float("-inf")
+        high = chunks[index][1] / WHISPER_SAMPLE_RATE if index < len(chunks) - 1 else float("inf")
+        kept = [segment for segment in segments if low <= (segment["start"] + segment["end"]) / 2 < high]
+        if kept and merged:
+            kept[0] = _trim_repeated_words(merged[-1]["text"], kept[0])
+        merged.extend(segment for segment in kept if segment["text"])
+    return merged
+
+class LongAudioTranscriber:
+    """
+    긴 녹음을 청크로 나눠 프로세스 풀에서 병렬 변환
+    
+    Whisper는 워커 프로세스마다 한 번만 로드되고 여러 파일을 변환하는 동안 재사용됩니다.
+    워커들은 코어를 나눠 쓰도록 torch 연산 스레드 수를 (코어 수 / 워커 수)로 맞춥니다.
+    """
+    
+    def __init__(self, model_name=None, language=None, workers=None, chunk_seconds=None, overlap_seconds=None):
+        """
+        Args:
+            model_name: Whisper 모델 이름 (기본값: Config.WHISPER_MODEL)
+            language: 언어 코드 (None이면 청크마다 자동 감지)
+            workers: 워커 프로세스 수 (기본값: Config.STT_WORKERS, 0이면 코어 수)
+            chunk_seconds: 최대 청크 길이 (기본값: Config.STT_CHUNK_SECONDS)
+            overlap_seconds: 청크 사이 겹침 길이 (기본값: Config.STT_CHUNK_OVERLAP_SECONDS)
+        """
+        self.model_name = model_name or Config.WHISPER_MODEL
+        self.language = language
+        cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+        self.workers = workers or Config.STT_WORKERS or cores
+        self.threads = max(1, cores // self.workers)
+        self.chunk_seconds = chunk_seconds
+        self.overlap_seconds = overlap_seconds
+        self._pool = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+    
+    @property
+    def pool(self):
+        """워커 프로세스 풀 (처음 사용할 때 생성)"""
+        if self._pool is None:
+            # fork된 자식에서 torch 스레드 풀이 멈추지 않도록 spawn 사용
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.model_name, self.threads)
+            )
+            logger.info(f"STT 워커 {self.workers}개 시작 (워커당 torch 스레드 {self.threads}개)")
+        return self._pool
+    
+    def transcribe(self, path):
+        """
+        오디오 파일 하나를 변환
+        
+        Args:
+            path: 오디오 파일 경로
+        
+        Returns:
+            {"text": 전체 텍스트, "segments": 구간 목록, "duration": 길이(초), "chunks": 청크 수}
+        """
+        audio = load_audio_file(path)
+        chunks = plan_chunks(audio, WHISPER_SAMPLE_RATE, self.chunk_seconds, self.overlap_seconds)
+        logger.info(f"'{path}' 변환 중: {len(audio) / WHISPER_SAMPLE_RATE:.1f}초, 청크 {len(chunks)}개")
+        
+        futures = [
+            self.pool.submit(_transcribe_chunk, audio[start:end], start / WHISPER_SAMPLE_RATE, self.language)
+            for start, end in chunks
+        ]
+        segments = merge_chunks(chunks, [future.result() for future in futures])
+        return {
+            "text": " ".join(segment["text"] for segment in segments),
+            "segments": segments,
+            "duration": round(len(audio) / WHISPER_SAMPLE_RATE, 3),
+            "chunks": len(chunks),
+        }
+    
+    def close(self):
+        """워커 프로세스 종료"""
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
\ No newline at end of file
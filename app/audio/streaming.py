@@ -0,0 +1,219 @@
+from collections import deque
+import numpy as np
+from app.audio.decoding import WHISPER_SAMPLE_RATE, resample
+from app.config import Config
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+class EnergyVAD:
+    """
+    프레임 에너지 기반 음성 구간 검출기
+    
+    프레임(기본 30ms)마다 RMS 에너지(dBFS)를 구해, 고정 임계값과 배경 잡음 추정치보다
+    충분히 큰 프레임을 음성으로 판단합니다. 배경 잡음은 무음 프레임의 지수 이동 평균으로
+    추적하므로 잡음이 있는 환경에서도 임계값이 따라 올라갑니다.
+    """
+    
+    def __init__(self, sample_rate=WHISPER_SAMPLE_RATE, frame_ms=30, threshold_db=None, margin_db=10.0):
+        """
+        Args:
+            sample_rate: 입력 샘플링 레이트
+            frame_ms: 프레임 길이(밀리초)
+            threshold_db: 음성으로 볼 최소 에너지 (기본값: Config.STT_VAD_THRESHOLD_DB)
+            margin_db: 배경 잡음보다 이만큼 커야 음성으로 판단
+        """
+        self.frame_size = max(1, int(sample_rate * frame_ms / 1000))
+        self.threshold_db = Config.STT_VAD_THRESHOLD_DB if threshold_db is None else threshold_db
+        self.margin_db = margin_db
+        self.noise_db = self.threshold_db - margin_db
+    
+    def frame_energies(self, frames):
+        """
+        프레임별 에너지 계산
+        
+        Args:
+            frames: (프레임 수, frame_size) float32 배열
+        
+        Returns:
+            프레임별 에너지(dBFS) 배열
+        """
+        power = np.mean(np.square(frames, dtype=np.float32), axis=1)
+        return 10.0 * np.log10(power + 1e-10)
+    
+    def is_speech(self, energy_db):
+        """
+        프레임 하나의 음성 여부 (무음이면 배경 잡음 추정치 갱신)
+        
+        Args:
+            energy_db: 프레임 에너지(dBFS)
+        
+        Returns:
+            음성 여부
+        """
+        if energy_db > max(self.threshold_db, self.noise_db + self.margin_db):
+            return True
+        self.noise_db = 0.95 * self.noise_db + 0.05 * energy_db
+        return False
+
+class StreamingTranscription:
+    """
+    도착하는 오디오 조각을 무음에서 끊어 구간마다 바로 변환하는 스트리밍 세션
+    
+    feed()로 받은 오디오를 VAD로 나눠, 말이 끝나면(STT_SILENCE_MS 무음) 그 구간만 변환해
+    최종 결과를 돌려주고, 말하는 중에는 STT_PARTIAL_INTERVAL마다 진행 중인 구간의 중간 결과를
+    돌려줍니다. 따라서 말이 끝난 뒤 텍스트가 나오기까지의 지연은 전체 클립이 아니라 마지막
+    구간의 변환 시간입니다. Whisper 모델은 SpeechToText의 공유 레지스트리에서 가져오므로
+    세션마다 다시 로드하지 않습니다. 한 세션은 한 스레드에서만 사용해야 합니다.
+    """
+    
+    def __init__(self, stt, language=None, sample_rate=WHISPER_SAMPLE_RATE, silence_ms=None,
+                 max_segment_seconds=None, partial_interval=None, vad=None):
+        """
+        Args:
+            stt: SpeechToText 인스턴스
+            language: 언어 코드 (None이면 구간마다 자동 감지)
+            sample_rate: 입력 오디오 샘플링 레이트 (구간을 변환할 때 16 kHz로 리샘플링)
+            silence_ms: 구간을 끝낼 무음 길이 (기본값: Config.STT_SILENCE_MS)
+            max_segment_seconds: 최대 구간 길이 (기본값: Config.STT_MAX_SEGMENT_SECONDS)
+            partial_interval: 중간 결과 간격(초) (기본값: Config.STT_PARTIAL_INTERVAL, 0이면 사용 안 함)
+            vad: 음성 구간 검출기 (기본값: EnergyVAD)
+        """
+        self.stt = stt
+        self.language = language
+        self.sample_rate = sample_rate
+        self.vad = vad or EnergyVAD(sample_rate)
+        frame_size = self.vad.frame_size
+        frame_seconds = frame_size / sample_rate
+        
+        silence_ms = Config.STT_SILENCE_MS if silence_ms is None else silence_ms
+        max_segment_seconds = max_segment_seconds or Config.STT_MAX_SEGMENT_SECONDS
+        partial_interval = Config.STT_PARTIAL_INTERVAL if partial_interval is None else partial_interval
+        self.silence_frames = max(1, int(silence_ms / 1000 / frame_seconds))
+        self.max_segment_frames = max(1, int(max_segment_seconds / frame_seconds))
+        self.partial_frames = int(partial_interval / frame_seconds) if partial_interval > 0 else 0
+        # 말소리가 이만큼 이어져야 구간 시작 (클릭 같은 짧은 잡음 무시)
+        self.min_speech_frames = max(1, int(0.09 / frame_seconds))
+        
+        # 말 시작 직전 소리도 구간에 포함 (첫 자음이 잘리지 않도록)
+        self._preroll = deque(maxlen=max(self.min_speech_frames, int(0.2 / frame_seconds)))
+        self._pending = np.zeros(0, dtype=np.float32)
+        # 네트워크 조각이 샘플 중간에서 끊겼을 때 남은 바이트
+        self._pending_bytes = b""
+        self._segment = []
+        self._segment_start = 0
+        self._speech_run = 0
+        self._silence_run = 0
+        self._last_partial = 0
+        self._frames_seen = 0
+        self.segments = []
+    
+    @property
+    def text(self):
+        """지금까지 확정된 전체 텍스트"""
+        return " ".join(segment["text"] for segment in self.segments if segment["text"])
+    
+    def feed(self, chunk):
+        """
+        오디오 조각 추가
+        
+        Args:
+            chunk: 16비트 PCM 바이트(리틀 엔디언, 모노, 길이는 홀수여도 됨) 또는 모노 float32 샘플 배열
+        
+        Returns:
+            이번 조각으로 생긴 결과 목록
+            ({"type": "partial" 또는 "final", "text": 텍스트, "start": 시작(초), "end": 끝(초)})
+        """
+        if isinstance(chunk, (bytes, bytearray, memoryview)):
+            data = self._pending_bytes + bytes(chunk)
+            usable = len(data) - len(data) % 2
+            self._pending_bytes = data[usable:]
+            samples = np.frombuffer(data[:usable], dtype="<i2").astype(np.float32) / 32768.0
+        else:
+            samples = np.asarray(chunk, dtype=np.float32).reshape(-1)
+        if len(self._pending):
+            samples = np.concatenate([self._pending, samples])
+        
+        # 프레임 단위로 나누고 에너지는 한 번에 계산
+        frame_size = self.vad.frame_size
+        count = len(samples) // frame_size
+        self._pending = samples[count * frame_size:]
+        if not count:
+            return []
+        frames = samples[:count * frame_size].reshape(count, frame_size)
+        energies = self.vad.frame_energies(frames)
+        
+        events = []
+        for frame, energy in zip(frames, energies):
+            event = self._process_frame(frame, self.vad.is_speech(energy))
+            if event is not None:
+                events.append(event)
+        
+        if self._segment and self.partial_frames and len(self._segment) - self._last_partial >= self.partial_frames:
+            self._last_partial = len(self._segment)
+            events.append(self._transcribe_segment("partial"))
+        return events
+    
+    def finish(self):
+        """
+        스트림 종료 (말하는 중이던 구간을 마저 변환)
+        
+        Returns:
+            마지막 결과 목록
+        """
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._pending_bytes = b""
+        if not self._segment:
+            return []
+        return [self._close_segment()]
+    
+    def _process_frame(self, frame, speech):
+        """프레임 하나를 구간 상태에 반영하고, 구간이 끝났으면 최종 결과 반환"""
+        self._frames_seen += 1
+        if not self._segment:
+            self._preroll.append(frame)
+            self._speech_run = self._speech_run + 1 if speech else 0
+            if self._speech_run >= self.min_speech_frames:
+                self._segment = list(self._preroll)
+                self._segment_start = self._frames_seen - len(self._segment)
+                self._preroll.clear()
+                self._silence_run = 0
+                self._last_partial = 0
+            return None
+        
+        self._segment.append(frame)
+        self._silence_run = 0 if speech else self._silence_run + 1
+        if self._silence_run >= self.silence_frames or len(self._segment) >= self.max_segment_frames:
+            return self._close_segment()
+        return None
+    
+    def _close_segment(self):
+        """진행 중인 구간을 확정 변환"""
+        # 끝의 무음은 대부분 잘라 내되 말끝이 잘리지 않도록 조금 남김
+        keep = len(self._segment) - max(0, self._silence_run - self._preroll.maxlen)
+        self._segment = self._segment[:max(keep, 1)]
+        event = self._transcribe_segment("final")
+        self.segments.append(event)
+        logger.debug(f"구간 변환 완료: {event['start']:.2f}-{event['end']:.2f}초")
+        self._segment = []
+        self._speech_run = 0
+        self._silence_run = 0
+        return event
+    
+    def _transcribe_segment(self, kind):
+        """진행 중인 구간을 16 kHz로 변환해 Whisper로 인식"""
+        audio = resample(np.concatenate(self._segment), self.sample_rate)
+        options = {}
+        if self.segments:
+            # 앞 구간의 텍스트를 문맥으로 넘겨 구간 경계의 인식 품질 유지
+            options["initial_prompt"] = self.text[-200:]
+        text = self.stt.transcribe_array(audio, self.language, **options).strip()
+        
+        frame_seconds = self.vad.frame_size / self.sample_rate
+        start = self._segment_start * frame_seconds
+        return {
+            "type": kind,
+            "text": text,
+            "start": round(start, 3),
+            "end": round(start + len(self._segment) * frame_seconds, 3),
+        }
\ No newline at end of file
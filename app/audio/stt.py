@@ -1,25 +1,43 @@
 import os
 import tempfile
-import whisper
+from app.audio.decoding import WHISPER_SAMPLE_RATE, AudioDecodeError, load_audio_bytes
+from app.audio.streaming import StreamingTranscription
 from app.config import Config
 from app.utils.logger import setup_logger
+from app.utils.model_registry import get_registry
+from app.utils.tracing import span
 
 logger = setup_logger(__name__)
 
+def _load_whisper(model_name):
+    """Whisper 모델 로드 (레지스트리 로더)"""
+    import whisper
+    return whisper.load_model(model_name)
+
 class SpeechToText:
     """음성을 텍스트로 변환하는 클래스"""
     
-    def __init__(self, model_name="base"):
+    def __init__(self, model_name=None, registry=None):
         """
         음성-텍스트 변환기 초기화
         
+        모델은 처음 변환할 때 로드되며, 같은 모델 이름을 쓰는 인스턴스끼리 공유됩니다.
+        
         Args:
-            model_name: Whisper 모델 이름 ('tiny', 'base', 'small', 'medium', 'large')
+            model_name: Whisper 모델 이름 ('tiny', 'base', 'small', 'medium', 'large', 기본값: Config.WHISPER_MODEL)
+            registry: 모델 레지스트리 (기본값: 프로세스 공유 레지스트리)
         """
+        model_name = model_name or Config.WHISPER_MODEL
+        self.model_name = model_name
+        self.registry = registry or get_registry()
+        self.model_key = f"whisper:{self.model_name}"
+        self.registry.register(self.model_key, lambda: _load_whisper(model_name))
+    
+    @property
+    def model(self):
+        """Whisper 모델 (로드되어 있지 않으면 로드)"""
         try:
-            logger.info(f"Whisper 모델 '{model_name}' 로딩 중...")
-            self.model = whisper.load_model(model_name)
-            logger.info("Whisper 모델 로딩 완료")
+            return self.registry.get(self.model_key)
         except Exception as e:
             logger.error(f"Whisper 모델 로딩 실패: {str(e)}")
             raise
@@ -37,13 +55,25 @@ class SpeechToText:
         """
         try:
             logger.info(f"오디오 파일 '{audio_file}' 변환 중...")
-            result = self.model.transcribe(
-                audio_file,
-                language=language,
-                fp16=False
-            )
-            logger.info("오디오 변환 완료")
-            return result["text"]
+            return self._transcribe(audio_file, language)
+        except Exception as e:
+            logger.error(f"오디오 변환 실패: {str(e)}")
+            raise
+    
+    def transcribe_array(self, audio, language=None, **options):
+        """
+        16 kHz 모노 float32 샘플 배열에서 텍스트 추출 (ffmpeg 프로세스 없이 바로 변환)
+        
+        Args:
+            audio: 16 kHz 모노 float32 NumPy 배열
+            language: 언어 코드
+            **options: Whisper transcribe 추가 옵션 (initial_prompt 등)
+        
+        Returns:
+            추출된 텍스트
+        """
+        try:
+            return self._transcribe(audio, language, **options)
         except Exception as e:
             logger.error(f"오디오 변환 실패: {str(e)}")
             raise
@@ -52,6 +82,9 @@ class SpeechToText:
         """
         오디오 데이터(바이트)에서 텍스트 추출
         
+        WAV, FLAC, OGG는 메모리에서 디코딩·리샘플링하고, 그 밖의 형식(MP3, WebM 등)만
+        임시 파일에 저장해 Whisper의 ffmpeg 디코딩을 사용합니다.
+        
         Args:
             audio_data: 오디오 데이터 (바이트)
             language: 언어 코드
@@ -59,19 +92,56 @@ class SpeechToText:
         Returns:
             추출된 텍스트
         """
+        try:
+            with span("stt.decode", bytes=len(audio_data)):
+                audio = load_audio_bytes(audio_data)
+        except AudioDecodeError:
+            return self._transcribe_via_file(audio_data, language)
+        
+        return self.transcribe_array(audio, language)
+    
+    def stream(self, language=None, sample_rate=WHISPER_SAMPLE_RATE, **kwargs):
+        """
+        스트리밍 변환 세션 생성 (오디오 조각을 받는 대로 무음에서 끊어 구간별로 변환)
+        
+        Args:
+            language: 언어 코드
+            sample_rate: 입력 오디오 샘플링 레이트
+            **kwargs: StreamingTranscription 추가 설정 (silence_ms, partial_interval 등)
+        
+        Returns:
+            StreamingTranscription 인스턴스
+        """
+        return StreamingTranscription(self, language, sample_rate, **kwargs)
+    
+    def _transcribe(self, audio, language, **options):
+        """파일 경로 또는 샘플 배열을 Whisper로 변환"""
+        with span("stt.load_model", model=self.model_name):
+            self.model
+        with self.registry.use(self.model_key) as model, span("stt.transcribe"):
+            result = model.transcribe(
+                audio,
+                language=language,
+                fp16=False,
+                **options
+            )
+        logger.info("오디오 변환 완료")
+        return result["text"]
+    
+    def _transcribe_via_file(self, audio_data, language):
+        """메모리에서 디코딩할 수 없는 형식을 임시 파일을 거쳐 변환"""
         try:
             # 임시 파일에 오디오 데이터 저장
-            with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_file:
+            with span("stt.write_temp", bytes=len(audio_data)), \
+                    tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_file:
                 temp_filename = temp_file.name
                 temp_file.write(audio_data)
             
-            # 변환
-            result = self.transcribe_file(temp_filename, language)
-            
-            # 임시 파일 삭제
-            os.unlink(temp_filename)
-            
-            return result
+            try:
+                return self.transcribe_file(temp_filename, language)
+            finally:
+                # 임시 파일 삭제
+                os.unlink(temp_filename)
         except Exception as e:
             logger.error(f"오디오 데이터 변환 실패: {str(e)}")
             raise
\ No newline at end of file
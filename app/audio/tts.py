@@ -1,37 +1,138 @@
-import os
-import io
-import tempfile
-from TTS.api import TTS
+import re
+import struct
+import numpy as np
+from app.audio.tts_cache import get_tts_cache
 from app.config import Config
 from app.utils.logger import setup_logger
+from app.utils.model_registry import get_registry
+from app.utils.tracing import span
 
 logger = setup_logger(__name__)
 
+def _load_tts(model_name):
+    """Coqui TTS 모델 로드 (레지스트리 로더)"""
+    from TTS.api import TTS
+    return TTS(model_name)
+
+# 문장 끝 문장부호 뒤의 공백 또는 줄바꿈에서 나눔
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?。！？…])\s+|(?<=[.!?。！？…][\"'”’)\]])\s+|\n+")
+# 이 단어로 끝나면 문장 끝이 아닌 약어로 봄
+_ABBREVIATIONS = {"mr.", "mrs.", "ms.", "dr.", "prof.", "sr.", "jr.", "st.", "vs.", "etc.", "e.g.", "i.e.", "no.", "fig."}
+
+def split_sentences(text, max_chars=200):
+    """
+    TTS용 문장 분리 (한국어, 영어)
+    
+    문장부호(. ! ? 등) 뒤 공백과 줄바꿈에서 나누되, 소수점(3.14)이나 약어(Mr., e.g.),
+    이니셜(J.)에서는 나누지 않습니다. max_chars보다 긴 문장은 쉼표나 공백에서 더 나눕니다.
+    
+    Args:
+        text: 나눌 텍스트
+        max_chars: 문장 최대 길이
+    
+    Returns:
+        문장 목록
+    """
+    sentences = []
+    pending = ""
+    for piece in _SENTENCE_BREAK.split(text):
+        piece = piece.strip()
+        if not piece:
+            continue
+        pending = f"{pending} {piece}" if pending else piece
+        last_word = pending.rsplit(None, 1)[-1].lower()
+        if last_word in _ABBREVIATIONS or re.fullmatch(r"[a-z]\.", last_word):
+            continue
+        sentences.extend(_split_long(pending, max_chars))
+        pending = ""
+    if pending:
+        sentences.extend(_split_long(pending, max_chars))
+    return sentences
+
+def _split_long(sentence, max_chars):
+    """긴 문장을 쉼표, 없으면 공백에서 max_chars 이하로 나눔"""
+    parts = []
+    while len(sentence) > max_chars:
+        cut = sentence.rfind(",", 0, max_chars)
+        if cut <= 0:
+            cut = sentence.rfind(" ", 0, max_chars)
+        if cut <= 0:
+            cut = max_chars - 1
+        parts.append(sentence[:cut + 1].strip())
+        sentence = sentence[cut + 1:].strip()
+    if sentence:
+        parts.append(sentence)
+    return parts
+
+def normalize_peak(wav):
+    """최대 진폭 기준 정규화 (Coqui TTS의 save_wav와 같은 방식, 거의 무음이면 키우지 않음)"""
+    if not len(wav):
+        return wav
+    return wav / max(0.01, float(np.max(np.abs(wav))))
+
+def to_pcm16(wav):
+    """
+    float 파형을 [-1, 1]로 자른 뒤 16비트 리틀 엔디언 PCM 바이트로 변환
+    
+    Args:
+        wav: float 파형 배열
+    """
+    return (np.clip(wav, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+
+def wav_header(sample_rate, data_size=None, channels=1, sample_width=2):
+    """
+    16비트 PCM WAV 헤더
+    
+    Args:
+        sample_rate: 샘플링 레이트
+        data_size: PCM 데이터 길이 (None이면 스트리밍용으로 길이를 최대값으로 둠)
+        channels: 채널 수
+        sample_width: 샘플 바이트 수
+    """
+    data_size = 0xFFFFFFFF - 36 if data_size is None else data_size
+    byte_rate = sample_rate * channels * sample_width
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + data_size, b"WAVE", b"fmt ", 16, 1, channels, sample_rate, byte_rate,
+        channels * sample_width, sample_width * 8, b"data", data_size
+    )
+
 class TextToSpeech:
     """텍스트를 음성으로 변환하는 클래스"""
     
-    def __init__(self, model_name=None, language="ko"):
+    def __init__(self, model_name=None, language="ko", registry=None, cache=None):
         """
         텍스트-음성 변환기 초기화
         
+        모델은 처음 합성할 때 로드되며, 같은 모델 이름을 쓰는 인스턴스끼리 공유됩니다.
+        
         Args:
-            model_name: TTS 모델 이름 (None=자동 선택)
+            model_name: TTS 모델 이름 (None=Config.TTS_MODEL 또는 언어별 자동 선택)
             language: 언어 코드
+            registry: 모델 레지스트리 (기본값: 프로세스 공유 레지스트리)
+            cache: TTSCache 인스턴스 (기본값: 프로세스 공유 캐시, Config.TTS_CACHE_ENABLED가 꺼져 있으면 사용 안 함)
         """
+        model_name = model_name or Config.TTS_MODEL
+        
+        # 모델 이름이 지정되지 않은 경우 언어에 따라 기본 모델 선택
+        if not model_name:
+            if language == "ko":
+                model_name = "tts_models/ko/glow-tts/korean-universal"
+            else:
+                model_name = "tts_models/en/ljspeech/tacotron2-DDC"
+        
+        self.model_name = model_name
+        self.language = language
+        self.registry = registry or get_registry()
+        self.model_key = f"tts:{model_name}"
+        self.registry.register(self.model_key, lambda: _load_tts(model_name))
+        self.cache = cache or get_tts_cache()
+    
+    @property
+    def tts(self):
+        """TTS 모델 (로드되어 있지 않으면 로드)"""
         try:
-            logger.info("TTS 모델 로딩 중...")
-            
-            # 모델 이름이 지정되지 않은 경우 언어에 따라 기본 모델 선택
-            if model_name is None:
-                if language == "ko":
-                    model_name = "tts_models/ko/glow-tts/korean-universal"
-                else:
-                    model_name = "tts_models/en/ljspeech/tacotron2-DDC"
-            
-            self.tts = TTS(model_name)
-            logger.info(f"TTS 모델 '{model_name}' 로딩 완료")
-            
-            self.language = language
+            return self.registry.get(self.model_key)
         except Exception as e:
             logger.error(f"TTS 모델 로딩 실패: {str(e)}")
             raise
@@ -40,6 +141,9 @@ class TextToSpeech:
         """
         텍스트를 음성 파일로 변환
         
+        synthesize()의 파형을 16비트 WAV로 저장하므로 캐시를 함께 사용하고,
+        바이트·스트리밍 출력과 같은 샘플을 씁니다.
+        
         Args:
             text: 변환할 텍스트
             output_file: 출력 파일 경로
@@ -50,44 +154,142 @@ class TextToSpeech:
         """
         try:
             logger.info(f"텍스트를 음성으로 변환 중...")
-            self.tts.tts_to_file(
-                text=text,
-                file_path=output_file,
-                speaker=speaker
-            )
+            data = self.synthesize_to_bytes(text, speaker)
+            with open(output_file, "wb") as f:
+                f.write(data)
             logger.info(f"음성 파일 '{output_file}' 생성 완료")
             return output_file
         except Exception as e:
             logger.error(f"텍스트 음성 변환 실패: {str(e)}")
             raise
     
-    def synthesize_to_bytes(self, text, speaker=None):
+    @property
+    def sample_rate(self):
+        """모델 출력 샘플링 레이트"""
+        return self.tts.synthesizer.output_sample_rate
+    
+    def synthesize(self, text, speaker=None):
+        """
+        텍스트를 파형 배열로 변환 (파일 입출력 없음)
+        
+        합성 직후 최대 진폭 기준으로 한 번 정규화한 뒤 캐시에 넣으므로 캐시, 파일, 바이트,
+        스트리밍 출력이 모두 같은 샘플을 씁니다.
+        
+        Args:
+            text: 변환할 텍스트
+            speaker: 화자 ID (다중 화자 모델인 경우)
+        
+        Returns:
+            (모노 float32 파형 배열, 샘플링 레이트) (캐시에서 가져온 배열은 읽기 전용)
+        """
+        key = None
+        if self.cache is not None:
+            key = self.cache.make_key(self.model_name, text, speaker, self.language)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+        
+        with span("tts.load_model", model=self.model_name):
+            self.tts
+        with self.registry.use(self.model_key) as tts, span("tts.synthesize", chars=len(text)):
+            wav = tts.tts(text=text, speaker=speaker)
+            sample_rate = tts.synthesizer.output_sample_rate
+        wav = normalize_peak(np.asarray(wav, dtype=np.float32).reshape(-1))
+        if key is not None:
+            self.cache.put(key, wav, sample_rate)
+        return wav, sample_rate
+    
+    def warmup(self, phrases=None, speaker=None):
+        """
+        자주 쓰는 문구를 미리 합성해 캐시에 넣음
+        
+        Args:
+            phrases: 문구 목록 (기본값: Config.TTS_WARMUP_FILE의 각 줄)
+            speaker: 화자 ID
+        
+        Returns:
+            새로 합성한 문구 수
+        """
+        if self.cache is None:
+            return 0
+        if phrases is None:
+            if not Config.TTS_WARMUP_FILE:
+                return 0
+            with open(Config.TTS_WARMUP_FILE, "r", encoding="utf-8") as f:
+                phrases = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+        
+        synthesized = 0
+        for phrase in phrases:
+            # 문장 단위 스트리밍에서도 적중하도록 문장별로 합성
+            for sentence in split_sentences(phrase):
+                if not self.cache.contains(self.cache.make_key(self.model_name, sentence, speaker, self.language)):
+                    self.synthesize(sentence, speaker)
+                    synthesized += 1
+        logger.info(f"TTS 캐시 준비 완료: 문구 {len(phrases)}개, 새로 합성 {synthesized}개")
+        return synthesized
+    
+    def synthesize_to_bytes(self, text, speaker=None, audio_format="wav"):
         """
         텍스트를 음성 바이트로 변환
         
+        합성된 파형(synthesize()에서 정규화됨)을 메모리에서 바로 16비트 PCM으로 바꿉니다.
+        
         Args:
             text: 변환할 텍스트
             speaker: 화자 ID (다중 화자 모델인 경우)
+            audio_format: 'wav' (WAV 파일) 또는 'pcm' (헤더 없는 16비트 리틀 엔디언 PCM)
             
         Returns:
             음성 데이터 (바이트)
         """
         try:
-            # 임시 파일에 음성 저장
-            with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_file:
-                temp_filename = temp_file.name
-            
-            # 음성 합성
-            self.synthesize_to_file(text, temp_filename, speaker)
-            
-            # 파일 읽기
-            with open(temp_filename, 'rb') as f:
-                audio_bytes = f.read()
-            
-            # 임시 파일 삭제
-            os.unlink(temp_filename)
-            
-            return audio_bytes
+            wav, sample_rate = self.synthesize(text, speaker)
+            pcm = to_pcm16(wav)
+            if audio_format == "pcm":
+                return pcm
+            return wav_header(sample_rate, len(pcm)) + pcm
         except Exception as e:
             logger.error(f"텍스트 음성 변환 실패: {str(e)}")
-            raise
\ No newline at end of file
+            raise
+    
+    def stream(self, text, speaker=None, audio_format="pcm"):
+        """
+        텍스트를 문장 단위로 합성해 문장마다 바로 음성 조각을 돌려줌
+        
+        첫 음성이 나오기까지의 시간은 전체 텍스트가 아니라 첫 문장의 합성 시간입니다.
+        문장별 캐시를 공유하므로 각 문장은 synthesize_to_bytes로 합성한 것과 같은 샘플입니다.
+        
+        Args:
+            text: 변환할 텍스트
+            speaker: 화자 ID (다중 화자 모델인 경우)
+            audio_format: 'pcm' (16비트 PCM 조각) 또는 'wav' (첫 조각에 길이를 정하지 않은 WAV 헤더 포함)
+        
+        Yields:
+            문장 하나의 음성 데이터 (바이트)
+        """
+        header_sent = audio_format != "wav"
+        for sentence in split_sentences(text):
+            try:
+                wav, sample_rate = self.synthesize(sentence, speaker)
+            except Exception as e:
+                logger.error(f"문장 음성 변환 실패: {str(e)}")
+                raise
+            pcm = to_pcm16(wav)
+            if not header_sent:
+                header_sent = True
+                pcm = wav_header(sample_rate) + pcm
+            yield pcm
+
+def warm_tts_cache(phrases=None):
+    """
+    기본 TTS 모델로 자주 쓰는 문구를 미리 합성 (서버 시작 시 호출)
+    
+    실패해도 서비스에는 영향이 없으므로 경고만 남깁니다.
+    
+    Args:
+        phrases: 문구 목록 (기본값: Config.TTS_WARMUP_FILE의 각 줄)
+    """
+    try:
+        TextToSpeech().warmup(phrases)
+    except Exception as e:
+        logger.warning(f"TTS 캐시 준비 실패: {str(e)}")
\ No newline at end of file
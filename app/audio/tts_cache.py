@@ -0,0 +1,186 @@
+import io
+import os
+import json
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+import numpy as np
+import soundfile as sf
+from app.config import Config
+from app.utils.disk_cache import DiskLRU
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+_cache = None
+_cache_lock = threading.Lock()
+
+# 캐시에 저장하는 파형 형식의 버전 (형식이 바뀌면 올려서 이전 캐시 파일을 쓰지 않도록 함)
+# 2: synthesize()에서 최대 진폭 기준으로 정규화한 파형
+CACHE_FORMAT_VERSION = 2
+
+def normalize_text(text):
+    """
+    캐시 키용 텍스트 정규화
+    
+    유니코드 조합 형식(NFC)과 공백 차이처럼 합성 결과에 영향이 없는 차이를 없앱니다.
+    문장부호는 억양에 영향을 주므로 그대로 둡니다.
+    """
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+class TTSCache:
+    """
+    합성된 음성 캐시
+    
+    모델 이름, 화자, 언어, 정규화된 텍스트의 해시를 키로 사용합니다. 메모리 계층은 파형 배열을
+    바이트 한도 안에서 LRU로 보관하고, Config.DATA_DIR 아래의 디스크 계층은 FLAC으로 압축해
+    저장하며 전체 크기가 한도를 넘으면 가장 오래 쓰이지 않은 파일부터 지웁니다.
+    """
+    
+    def __init__(self, cache_dir=None, max_memory_bytes=None, max_disk_bytes=None):
+        """
+        TTS 캐시 초기화
+        
+        Args:
+            cache_dir: 디스크 캐시 디렉토리
+            max_memory_bytes: 메모리 계층 최대 크기(바이트)
+            max_disk_bytes: 디스크 계층 최대 크기(바이트)
+        """
+        self.cache_dir = cache_dir or os.path.join(Config.DATA_DIR, "cache", "tts")
+        self.max_memory_bytes = max_memory_bytes or Config.TTS_CACHE_MEMORY_MB * 1024 * 1024
+        self.max_disk_bytes = max_disk_bytes or Config.TTS_CACHE_DISK_MB * 1024 * 1024
+        
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._disk = DiskLRU(self.cache_dir, ".flac", self.max_disk_bytes, "TTS 캐시")
+        
+        # 통계
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+    
+    def make_key(self, model_name, text, speaker=None, language=None):
+        """
+        캐시 키 생성
+        
+        Args:
+            model_name: TTS 모델 이름
+            text: 합성할 텍스트
+            speaker: 화자 ID
+            language: 언어 코드
+        
+        Returns:
+            SHA-256 16진수 문자열
+        """
+        payload = json.dumps({
+            "model": model_name,
+            "text": normalize_text(text),
+            "speaker": speaker,
+            "language": language,
+            "version": CACHE_FORMAT_VERSION,
+        }, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def get(self, key):
+        """
+        캐시된 음성 조회
+        
+        Returns:
+            (float32 파형 배열, 샘플링 레이트) (없으면 None)
+        """
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return self._memory[key]
+        
+        data = self._disk.read(key)
+        entry = self._decode(data) if data is not None else None
+        if entry is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        
+        with self._lock:
+            self.disk_hits += 1
+            self._remember(key, entry)
+        return entry
+    
+    def contains(self, key):
+        """캐시에 있는지 확인 (통계와 LRU 순서에 영향 없음)"""
+        with self._lock:
+            if key in self._memory:
+                return True
+        return self._disk.contains(key)
+    
+    def put(self, key, wav, sample_rate):
+        """
+        음성을 메모리와 디스크 계층에 저장
+        
+        16비트 FLAC으로 저장하므로 [-1, 1]을 넘는 파형은 최대 진폭으로 나눠 저장합니다.
+        
+        Args:
+            key: 캐시 키
+            wav: float32 파형 배열
+            sample_rate: 샘플링 레이트
+        """
+        peak = float(np.max(np.abs(wav))) if len(wav) else 0.0
+        if peak > 1.0:
+            wav = wav / peak
+        # 캐시된 배열은 여러 호출자가 공유하므로 읽기 전용
+        wav.setflags(write=False)
+        entry = (wav, sample_rate)
+        with self._lock:
+            self._remember(key, entry)
+        
+        try:
+            buffer = io.BytesIO()
+            sf.write(buffer, wav, sample_rate, format="FLAC", subtype="PCM_16")
+            self._disk.write(key, buffer.getvalue())
+        except (OSError, RuntimeError) as e:
+            logger.warning(f"TTS 캐시 저장 실패: {str(e)}")
+    
+    def stats(self):
+        """캐시 통계 반환"""
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_bytes,
+            "disk_bytes": self._disk.bytes,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self._disk.evictions,
+            "hit_ratio": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
+    
+    def _remember(self, key, entry):
+        """메모리 계층에 저장하고 한도를 넘으면 오래된 항목 제거 (self._lock을 잡은 상태에서 호출)"""
+        if key in self._memory:
+            self._memory_bytes -= self._memory.pop(key)[0].nbytes
+        self._memory[key] = entry
+        self._memory_bytes += entry[0].nbytes
+        while self._memory_bytes > self.max_memory_bytes and len(self._memory) > 1:
+            _, (wav, _) = self._memory.popitem(last=False)
+            self._memory_bytes -= wav.nbytes
+    
+    def _decode(self, data):
+        """디스크 파일 내용(FLAC)에서 (읽기 전용 파형, 샘플링 레이트) 복원 (깨진 파일이면 None)"""
+        try:
+            wav, sample_rate = sf.read(io.BytesIO(data), dtype="float32")
+        except RuntimeError:
+            return None
+        wav.setflags(write=False)
+        return wav, sample_rate
+
+def get_tts_cache():
+    """프로세스 전체에서 공유하는 TTS 캐시 반환 (Config.TTS_CACHE_ENABLED가 꺼져 있으면 None)"""
+    global _cache
+    if not Config.TTS_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = TTSCache()
+        return _cache
\ No newline at end of file
@@ -13,6 +13,78 @@ class Config:
     # 모델 설정
     DEFAULT_MODEL = os.getenv('DEFAULT_MODEL', 'deepseek-ai/deepseek-coder-6.7b-instruct')
     DEVICE = os.getenv('DEVICE', 'cuda' if os.getenv('USE_GPU', 'True').lower() in ('true', '1', 't') else 'cpu')
+    MODEL_PRECISION = os.getenv('MODEL_PRECISION', 'auto')  # 'auto', 'fp32', 'fp16', 'bf16', 'int8'
+    MODEL_WARMUP_TOKENS = int(os.getenv('MODEL_WARMUP_TOKENS', '8'))  # 0이면 워밍업 생략
+    
+    # LoRA 어댑터 설정 ('이름=경로,이름=경로', 요청에서 이름으로 선택)
+    LORA_ADAPTERS = os.getenv('LORA_ADAPTERS', '')
+    LORA_ADAPTER_CACHE_MB = int(os.getenv('LORA_ADAPTER_CACHE_MB', '1024'))
+    
+    # 추측 디코딩 설정 (드래프트 모델이 비어 있으면 사용 안 함)
+    DRAFT_MODEL = os.getenv('DRAFT_MODEL', '')  # 예: 'deepseek-ai/deepseek-coder-1.3b-instruct'
+    SPECULATIVE_DRAFT_TOKENS = int(os.getenv('SPECULATIVE_DRAFT_TOKENS', '4'))
+    
+    # 생성 길이와 종료 조건 설정
+    MAX_NEW_TOKENS = int(os.getenv('MAX_NEW_TOKENS', '1024'))
+    GENERATION_BATCH_SIZE = int(os.getenv('GENERATION_BATCH_SIZE', '8'))  # generate_batch의 마이크로 배치 크기
+    GENERATION_BATCH_MAX_TOKENS = int(os.getenv('GENERATION_BATCH_MAX_TOKENS', '32768'))
+    # 작업별 기본 종료 문자열에 더할 문자열 ('|'로 구분, 문자 그대로의 \n은 줄바꿈으로 변환)
+    EXTRA_STOP_STRINGS = [s.replace('\\n', '\n') for s in os.getenv('EXTRA_STOP_STRINGS', '').split('|') if s]
+    
+    # 대화 컨텍스트 설정
+    CONTEXT_TOKEN_BUDGET = int(os.getenv('CONTEXT_TOKEN_BUDGET', '1536'))
+    HISTORY_COMPACTION = os.getenv('HISTORY_COMPACTION', 'summarize')  # 'summarize' 또는 'drop'
+    SUMMARY_MAX_TOKENS = int(os.getenv('SUMMARY_MAX_TOKENS', '256'))
+    
+    # 생성 스케줄러 설정 (웹 모드의 동시 요청 연속 배칭)
+    SCHEDULER_ENABLED = os.getenv('SCHEDULER_ENABLED', 'True').lower() in ('true', '1', 't')
+    SCHEDULER_MAX_BATCH_SIZE = int(os.getenv('SCHEDULER_MAX_BATCH_SIZE', '8'))
+    
+    # 프리픽스 KV 캐시 설정 (작업 지시문 등 요청 간 공통 앞부분 재사용)
+    PREFIX_CACHE_ENABLED = os.getenv('PREFIX_CACHE_ENABLED', 'True').lower() in ('true', '1', 't')
+    PREFIX_CACHE_MB = int(os.getenv('PREFIX_CACHE_MB', '512'))
+    PREFIX_CACHE_MIN_TOKENS = int(os.getenv('PREFIX_CACHE_MIN_TOKENS', '16'))
+    
+    # 입장 제어 설정 (/api/chat, /api/enhance 앞단의 대기열)
+    ADMISSION_MAX_CONCURRENT = int(os.getenv('ADMISSION_MAX_CONCURRENT', '0'))  # 0이면 스케줄러 배치 크기
+    ADMISSION_MAX_QUEUE = int(os.getenv('ADMISSION_MAX_QUEUE', '32'))
+    ADMISSION_MAX_PER_CLIENT = int(os.getenv('ADMISSION_MAX_PER_CLIENT', '4'))
+    ADMISSION_TOKEN_BUDGET = int(os.getenv('ADMISSION_TOKEN_BUDGET', '32768'))  # 실행 중 요청의 프롬프트 + 생성 토큰 합
+    ADMISSION_QUEUE_TIMEOUT = float(os.getenv('ADMISSION_QUEUE_TIMEOUT', '30'))  # 초
+    
+    # 요청 처리 기한 (클라이언트가 timeout으로 더 짧게 줄일 수 있음)
+    REQUEST_TIMEOUT = float(os.getenv('REQUEST_TIMEOUT', '120'))  # 초, 0이면 기한 없음
+    
+    # 지표 수집 설정 (/metrics, Prometheus 텍스트 형식)
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True').lower() in ('true', '1', 't')
+    
+    # 요청 추적 설정 (꺼져 있어도 X-Trace 헤더나 본문의 trace로 요청별 추적 가능)
+    TRACING_ENABLED = os.getenv('TRACING_ENABLED', 'False').lower() in ('true', '1', 't')
+    TRACE_MAX_TRACES = int(os.getenv('TRACE_MAX_TRACES', '100'))
+    
+    # 관리자 API 토큰 (/api/admin/*, 비어 있으면 로컬 접속만 허용)
+    ADMIN_TOKEN = os.getenv('ADMIN_TOKEN', '')
+    
+    # 웹 서버 설정 (Linux/Mac 운영 모드, 모델을 한 번 로드한 뒤 워커를 fork)
+    WEB_WORKERS = int(os.getenv('WEB_WORKERS', '1'))
+    WEB_THREADS = int(os.getenv('WEB_THREADS', '0'))  # 워커별 torch 연산 스레드 수, 0이면 할당된 코어 수
+    WEB_HTTP_THREADS = int(os.getenv('WEB_HTTP_THREADS', '8'))  # 워커별 요청 처리 스레드 수
+    
+    # 세션 풀 설정 (웹 모드의 세션별 대화 상태)
+    SESSION_MAX_SESSIONS = int(os.getenv('SESSION_MAX_SESSIONS', '256'))
+    SESSION_IDLE_TTL = int(os.getenv('SESSION_IDLE_TTL', '1800'))  # 초
+    SESSION_MAX_CACHED_TOKENS = int(os.getenv('SESSION_MAX_CACHED_TOKENS', '1000000'))
+    SESSION_MAX_KV_MB = int(os.getenv('SESSION_MAX_KV_MB', '4096'))
+    SESSION_MAX_ARCHIVED = int(os.getenv('SESSION_MAX_ARCHIVED', '10000'))
+    
+    # 응답 캐시 설정 (결정적 생성 요청만 캐시)
+    RESPONSE_CACHE_ENABLED = os.getenv('RESPONSE_CACHE_ENABLED', 'True').lower() in ('true', '1', 't')
+    RESPONSE_CACHE_MEMORY_ENTRIES = int(os.getenv('RESPONSE_CACHE_MEMORY_ENTRIES', '512'))
+    RESPONSE_CACHE_DISK_MB = int(os.getenv('RESPONSE_CACHE_DISK_MB', '256'))
+    
+    # 모델 상주 관리 설정 (LLM, Whisper, TTS 공유 레지스트리)
+    MODEL_MEMORY_BUDGET_MB = int(os.getenv('MODEL_MEMORY_BUDGET_MB', '0'))  # 0이면 제한 없음
+    MODEL_IDLE_TTL = int(os.getenv('MODEL_IDLE_TTL', '600'))  # 초, 0이면 유휴 모델을 내리지 않음
     
     # 경로 설정
     BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -22,6 +94,25 @@ class Config:
     
     # 오디오 설정
     AUDIO_SAMPLE_RATE = int(os.getenv('AUDIO_SAMPLE_RATE', '22050'))
+    WHISPER_MODEL = os.getenv('WHISPER_MODEL', 'base')
+    TTS_MODEL = os.getenv('TTS_MODEL', '')  # 비어 있으면 언어별 기본 모델
+    
+    # 스트리밍 STT 설정 (무음 구간에서 끊어 구간별로 변환)
+    STT_VAD_THRESHOLD_DB = float(os.getenv('STT_VAD_THRESHOLD_DB', '-45'))  # 이보다 조용한 프레임은 무음
+    STT_SILENCE_MS = int(os.getenv('STT_SILENCE_MS', '500'))  # 이만큼 무음이 이어지면 구간 종료
+    STT_MAX_SEGMENT_SECONDS = float(os.getenv('STT_MAX_SEGMENT_SECONDS', '20'))
+    STT_PARTIAL_INTERVAL = float(os.getenv('STT_PARTIAL_INTERVAL', '1.0'))  # 초, 0이면 중간 결과 없음
+    
+    # 긴 오디오 변환 설정 (무음에서 겹치게 잘라 프로세스 풀로 병렬 변환)
+    STT_CHUNK_SECONDS = float(os.getenv('STT_CHUNK_SECONDS', '30'))  # Whisper 입력 창 길이
+    STT_CHUNK_OVERLAP_SECONDS = float(os.getenv('STT_CHUNK_OVERLAP_SECONDS', '2'))
+    STT_WORKERS = int(os.getenv('STT_WORKERS', '0'))  # 0이면 코어 수
+    
+    # TTS 음성 캐시 설정 (자주 쓰는 문구를 다시 합성하지 않음)
+    TTS_CACHE_ENABLED = os.getenv('TTS_CACHE_ENABLED', 'True').lower() in ('true', '1', 't')
+    TTS_CACHE_MEMORY_MB = int(os.getenv('TTS_CACHE_MEMORY_MB', '64'))
+    TTS_CACHE_DISK_MB = int(os.getenv('TTS_CACHE_DISK_MB', '512'))
+    TTS_WARMUP_FILE = os.getenv('TTS_WARMUP_FILE', '')  # 한 줄에 한 문구, 비어 있으면 시작 시 미리 합성하지 않음
     
     # API 키 (필요한 경우)
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY', '')
@@ -1,8 +1,6 @@
 import os
 import argparse
 from app.config import Config
-from app.api.routes import create_app
-from app.agent.deepseek_agent import DeepSeekAgent
 
 def parse_arguments():
     """명령줄 인자 파싱"""
@@ -12,33 +10,46 @@ def parse_arguments():
     parser.add_argument('--port', type=int, default=5000, help='웹 서버 포트')
     parser.add_argument('--model', type=str, default="deepseek-ai/deepseek-coder-6.7b-instruct", 
                         help='사용할 모델 이름')
+    parser.add_argument('--precision', type=str, default=None,
+                        choices=['auto', 'fp32', 'fp16', 'bf16', 'int8'],
+                        help='모델 정밀도 모드 (기본값: MODEL_PRECISION 환경 변수)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='웹 서버 워커 프로세스 수 (기본값: WEB_WORKERS 환경 변수)')
+    parser.add_argument('--threads', type=int, default=None,
+                        help='워커별 torch 연산 스레드 수 (기본값: WEB_THREADS 환경 변수, 0이면 할당된 코어 수)')
+    parser.add_argument('--http-threads', type=int, default=None,
+                        help='워커별 요청 처리 스레드 수 (기본값: WEB_HTTP_THREADS 환경 변수)')
     return parser.parse_args()
 
-def run_cli(model_name):
+def run_cli(model_name, precision=None):
     """CLI 모드로 실행"""
     from app.agent.chat_manager import run_cli_interface
-    run_cli_interface(model_name)
+    run_cli_interface(model_name, precision)
 
-def run_web(port, model_name):
+def run_web(port, model_name, precision=None, workers=None, threads=None, http_threads=None):
     """웹 인터페이스 모드로 실행"""
-    app = create_app(model_name)
     print(f"🚀 웹 서버가 http://localhost:{port}에서 실행 중입니다")
     
-    # Windows에서는 waitress, 그 외에서는 gunicorn 사용
+    # Windows에서는 waitress, 그 외에서는 gunicorn 사용 (DEBUG 모드는 Flask 개발 서버)
     if os.name == 'nt':  # Windows
         from waitress import serve
-        serve(app, host='0.0.0.0', port=port)
+        from app.api.routes import create_app
+        serve(create_app(model_name, precision), host='0.0.0.0', port=port)
+    elif Config.DEBUG:
+        from app.api.routes import create_app
+        create_app(model_name, precision).run(host='0.0.0.0', port=port, debug=True)
     else:  # Linux/Mac
-        app.run(host='0.0.0.0', port=port, debug=Config.DEBUG)
+        from app.api.server import PreforkServer
+        PreforkServer(model_name, precision, port, workers, threads, http_threads).run()
 
 def main():
     """메인 진입점"""
     args = parse_arguments()
     
     if args.cli:
-        run_cli(args.model)
+        run_cli(args.model, args.precision)
     else:  # 기본값은 웹 모드
-        run_web(args.port, args.model)
+        run_web(args.port, args.model, args.precision, args.workers, args.threads, args.http_threads)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -2,6 +2,8 @@ import numpy as np
 import torch
 from tqdm import tqdm
 from app.config import Config
+from app.agent.batching import generate_batch
+from app.agent.stopping import get_stop_strings
 from app.utils.logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -60,14 +62,18 @@ class ModelEvaluator:
         logger.info(f"평가 완료: 퍼플렉시티 = {perplexity:.4f}")
         return perplexity
     
-    def evaluate_samples(self, test_prompts, max_length=100, temperature=0.7):
+    def evaluate_samples(self, test_prompts, max_new_tokens=100, temperature=0.7, stop_strings=None, batch_size=None):
         """
         샘플 프롬프트에 대한 모델 응답 생성 및 평가
         
+        프롬프트를 길이순 마이크로 배치로 묶어 생성하며, 응답은 입력 순서대로 반환합니다.
+        
         Args:
             test_prompts: 테스트 프롬프트 목록
-            max_length: 최대 생성 길이
+            max_new_tokens: 최대 생성 토큰 수
             temperature: 샘플링 온도
+            stop_strings: 종료 문자열 목록 (기본값: 채팅 작업의 종료 문자열)
+            batch_size: 배치당 최대 프롬프트 수 (기본값: Config.GENERATION_BATCH_SIZE)
             
         Returns:
             응답 목록
@@ -75,36 +81,26 @@ class ModelEvaluator:
         logger.info(f"{len(test_prompts)}개 샘플 프롬프트에 대한 모델 평가 중...")
         
         self.model.eval()
-        responses = []
+        stop_strings = get_stop_strings("chat") if stop_strings is None else stop_strings
         
-        for prompt in tqdm(test_prompts, desc="샘플 평가 중"):
-            try:
-                # DeepSeek 형식으로 프롬프트 포맷팅
-                formatted_prompt = f"Human: {prompt}\n\nAssistant:"
-                
-                # 입력 토큰화
-                inputs = self.tokenizer(formatted_prompt, return_tensors="pt").to(self.device)
-                
-                # 응답 생성
-                with torch.no_grad():
-                    generated_ids = self.model.generate(
-                        inputs.input_ids,
-                        max_length=max_length,
-                        temperature=temperature,
-                        do_sample=True,
-                        pad_token_id=self.tokenizer.eos_token_id
-                    )
-                
-                # 생성된 텍스트 디코딩
-                response_text = self.tokenizer.decode(generated_ids[0], skip_special_tokens=True)
-                
-                # 프롬프트 부분 제거하고 응답만 추출
-                response = response_text[len(formatted_prompt):].strip()
-                responses.append(response)
-                
-            except Exception as e:
-                logger.error(f"샘플 '{prompt}' 평가 중 오류: {str(e)}")
-                responses.append(f"오류: {str(e)}")
+        # DeepSeek 형식으로 프롬프트 포맷팅 후 한 번에 토큰화
+        formatted_prompts = [f"Human: {prompt}\n\nAssistant:" for prompt in test_prompts]
+        prompt_ids_list = self.tokenizer(formatted_prompts).input_ids
+        
+        # 응답 생성 (다음 턴을 지어내기 시작하면 중단)
+        with tqdm(total=len(test_prompts), desc="샘플 평가 중") as progress:
+            results = generate_batch(
+                self.model, self.tokenizer, prompt_ids_list, max_new_tokens,
+                temperature=temperature, stop_strings=stop_strings, batch_size=batch_size,
+                return_exceptions=True, callback=progress.update
+            )
+        
+        responses = []
+        for prompt, result in zip(test_prompts, results):
+            if isinstance(result, Exception):
+                logger.error(f"샘플 '{prompt}' 평가 중 오류: {str(result)}")
+                result = f"오류: {str(result)}"
+            responses.append(result)
         
         logger.info("샘플 평가 완료")
         return responses
\ No newline at end of file
@@ -0,0 +1,121 @@
+import os
+import threading
+from app.utils.file_utils import ensure_dir
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+class DiskLRU:
+    """
+    크기 제한이 있는 디스크 캐시 계층 (응답 캐시와 TTS 캐시가 함께 사용)
+    
+    키마다 파일 하나를 두고, 한 디렉토리에 파일이 너무 많아지지 않도록 키의 앞 두 글자로
+    하위 디렉토리를 나눕니다. 임시 파일에 쓴 뒤 교체하므로 반쯤 쓴 파일이 읽히지 않으며,
+    전체 크기가 한도를 넘으면 수정 시각(읽을 때 갱신)이 가장 오래된 파일부터 한도의 90%까지 지웁니다.
+    """
+    
+    def __init__(self, directory, extension, max_bytes, name="디스크 캐시"):
+        """
+        디스크 계층 초기화
+        
+        Args:
+            directory: 캐시 디렉토리
+            extension: 캐시 파일 확장자 (예: '.json')
+            max_bytes: 최대 크기(바이트)
+            name: 로그에 쓸 캐시 이름
+        """
+        self.directory = directory
+        self.extension = extension
+        self.max_bytes = max_bytes
+        self.name = name
+        
+        self._lock = threading.Lock()
+        ensure_dir(self.directory)
+        self.bytes = sum(os.path.getsize(path) for path in self._files())
+        
+        # 통계
+        self.evictions = 0
+    
+    def path(self, key):
+        """키의 캐시 파일 경로"""
+        return os.path.join(self.directory, key[:2], f"{key}{self.extension}")
+    
+    def contains(self, key):
+        """파일이 있는지 확인 (LRU 순서에 영향 없음)"""
+        return os.path.exists(self.path(key))
+    
+    def read(self, key):
+        """
+        캐시 파일 읽기 (읽은 파일은 가장 최근에 쓴 것으로 표시)
+        
+        Returns:
+            파일 내용 바이트 (없으면 None)
+        """
+        path = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            # 수정 시각을 LRU 순서로 사용
+            os.utime(path)
+        except OSError:
+            return None
+        return data
+    
+    def write(self, key, data):
+        """
+        캐시 파일 쓰기 (한도를 넘으면 오래된 파일 정리)
+        
+        Args:
+            key: 캐시 키
+            data: 저장할 바이트
+        
+        Raises:
+            OSError: 파일을 쓸 수 없는 경우
+        """
+        path = self.path(key)
+        ensure_dir(os.path.dirname(path))
+        previous = os.path.getsize(path) if os.path.exists(path) else 0
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self.bytes += len(data) - previous
+            over_budget = self.bytes > self.max_bytes
+        if over_budget:
+            self.evict()
+    
+    def evict(self):
+        """한도의 90% 이하가 될 때까지 오래된 파일부터 삭제"""
+        entries = []
+        for path in self._files():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+        
+        total = sum(size for _, size, _ in entries)
+        target = int(self.max_bytes * 0.9)
+        evicted = 0
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            evicted += 1
+        
+        with self._lock:
+            self.bytes = total
+            self.evictions += evicted
+        logger.info(f"{self.name} 디스크 정리 완료: {total} 바이트")
+    
+    def _files(self):
+        for root, _, filenames in os.walk(self.directory):
+            for filename in filenames:
+                if filename.endswith(self.extension):
+                    yield os.path.join(root, filename)
\ No newline at end of file
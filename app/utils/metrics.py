@@ -0,0 +1,446 @@
+import os
+import json
+import math
+import time
+import atexit
+import bisect
+import threading
+from collections import deque
+from contextlib import contextmanager
+from app.config import Config
+from app.utils.system_utils import get_rss_bytes
+from app.utils.tracing import current_trace
+
+# 지연 시간 히스토그램 구간(초)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+# 토큰당 디코딩 시간 구간(초)
+TOKEN_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.02, 0.035, 0.05, 0.075, 0.1, 0.15, 0.25, 0.5, 1.0)
+
+def _escape(value):
+    """레이블 값 이스케이프 (Prometheus 텍스트 형식)"""
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+class _Metric:
+    """레이블 조합별 값을 가진 지표의 공통 부분"""
+    
+    kind = None
+    
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+    
+    def collect(self):
+        """현재 값 {레이블 값 튜플: 값}"""
+        with self._lock:
+            return {labels: self._copy(value) for labels, value in self._series.items()}
+    
+    def render(self, peers=None):
+        """
+        Prometheus 텍스트 형식의 줄 목록
+        
+        Args:
+            peers: 다른 워커 프로세스의 값 [(pid, {레이블 값 튜플: 값}), ...] (None이면 단일 프로세스)
+        """
+        series = self.collect()
+        labelnames = self.labelnames
+        if peers is not None:
+            series, labelnames = self._merge(series, peers)
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for labels, value in series.items():
+            lines.extend(self._format(labelnames, labels, value))
+        return lines
+    
+    def _merge(self, series, peers):
+        """다른 워커의 누적 값을 더함 (종료된 워커의 값도 유지하여 감소하지 않도록 함)"""
+        for _, peer_series in peers:
+            for labels, value in peer_series.items():
+                series[labels] = self._combine(series[labels], value) if labels in series else value
+        return series, self.labelnames
+    
+    def _copy(self, value):
+        return value
+    
+    def _combine(self, a, b):
+        return a + b
+    
+    def _format(self, labelnames, labels, value):
+        return [f"{self.name}{_format_labels(labelnames, labels)} {_format_value(value)}"]
+
+class Counter(_Metric):
+    """증가만 하는 누적 값"""
+    
+    kind = "counter"
+    
+    def inc(self, amount=1, labels=()):
+        """
+        값 증가
+        
+        Args:
+            amount: 증가량
+            labels: labelnames 순서의 레이블 값 튜플
+        """
+        with self._lock:
+            self._series[labels] = self._series.get(labels, 0) + amount
+
+class Gauge(_Metric):
+    """
+    현재 값
+    
+    function을 주면 수집할 때마다 호출해 값을 얻습니다. 반환값이 딕셔너리이면
+    {레이블 값 튜플: 값}으로 해석합니다. 여러 워커의 값은 더하지 않고 pid 레이블로 구분합니다.
+    """
+    
+    kind = "gauge"
+    
+    def __init__(self, name, documentation, labelnames=(), function=None):
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+    
+    def set(self, value, labels=()):
+        """값 설정"""
+        with self._lock:
+            self._series[labels] = value
+    
+    def collect(self):
+        if self.function is None:
+            return super().collect()
+        value = self.function()
+        if value is None:
+            return {}
+        return dict(value) if isinstance(value, dict) else {(): value}
+    
+    def _merge(self, series, peers):
+        """살아 있는 워커의 값만 pid 레이블을 붙여 나열"""
+        merged = {labels + (str(os.getpid()),): value for labels, value in series.items()}
+        for pid, peer_series in peers:
+            if _process_alive(pid):
+                merged.update({labels + (str(pid),): value for labels, value in peer_series.items()})
+        return merged, self.labelnames + ("pid",)
+
+class Histogram(_Metric):
+    """
+    구간별 관측 횟수와 합계
+    
+    관측은 이진 탐색 한 번과 정수 덧셈만 하고, 누적 구간 값은 수집할 때 계산합니다.
+    """
+    
+    kind = "histogram"
+    
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+    
+    def observe(self, value, labels=()):
+        """
+        값 관측
+        
+        Args:
+            value: 관측값
+            labels: labelnames 순서의 레이블 값 튜플
+        """
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # [구간별 횟수 (마지막은 +Inf), 합계]
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+    
+    def _copy(self, value):
+        return [list(value[0]), value[1]]
+    
+    def _combine(self, a, b):
+        return [[x + y for x, y in zip(a[0], b[0])], a[1] + b[1]]
+    
+    def _format(self, labelnames, labels, value):
+        counts, total = value
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), counts):
+            cumulative += count
+            bucket_labels = _format_labels(labelnames, labels, f'le="{_format_value(bound)}"')
+            lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+        label_text = _format_labels(labelnames, labels)
+        lines.append(f"{self.name}_sum{label_text} {_format_value(total)}")
+        lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+class MetricsRegistry:
+    """
+    지표 모음과 /metrics 출력
+    
+    여러 워커 프로세스가 같은 포트를 나눠 받는 경우 share()로 공유 폴더를 지정하면 각 워커가
+    자기 값을 주기적으로 파일에 기록하고, 수집 요청을 받은 워커가 모든 워커의 값을 합쳐 출력합니다.
+    """
+    
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+        self.directory = None
+        self._writer = None
+    
+    def register(self, metric):
+        """지표 등록"""
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+    
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+    
+    def gauge(self, name, documentation, labelnames=(), function=None):
+        return self.register(Gauge(name, documentation, labelnames, function))
+    
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+    
+    def render(self):
+        """모든 지표를 Prometheus 텍스트 형식(0.0.4)으로 출력"""
+        with self._lock:
+            metrics = list(self._metrics)
+        peers = self._read_peers() if self.directory is not None else None
+        lines = []
+        for metric in metrics:
+            metric_peers = None
+            if peers is not None:
+                metric_peers = [(pid, snapshot.get(metric.name, {})) for pid, snapshot in peers]
+            lines.extend(metric.render(metric_peers))
+        return "\n".join(lines) + "\n"
+    
+    def share(self, directory, interval=5.0):
+        """
+        다른 워커 프로세스와 지표 공유 시작 (fork 이후 워커에서 호출)
+        
+        Args:
+            directory: 워커별 지표 파일을 둘 폴더 (서버 시작 시 비워 두어야 함)
+            interval: 자기 값을 파일에 기록하는 주기(초)
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._write_loop, args=(interval,), name="metrics-writer",
+                                            daemon=True)
+            self._writer.start()
+            atexit.register(self._write_snapshot)
+    
+    def _snapshot(self):
+        """{지표 이름: [[레이블 값 목록, 값], ...]} (JSON 직렬화용)"""
+        with self._lock:
+            metrics = list(self._metrics)
+        return {
+            metric.name: [[list(labels), value] for labels, value in metric.collect().items()]
+            for metric in metrics
+        }
+    
+    def _write_snapshot(self):
+        path = os.path.join(self.directory, f"{os.getpid()}.json")
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self._snapshot(), f)
+        os.replace(temp_path, path)
+    
+    def _write_loop(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self._write_snapshot()
+            except OSError:
+                pass
+    
+    def _read_peers(self):
+        """다른 워커가 기록한 값 [(pid, {지표 이름: {레이블 값 튜플: 값}}), ...]"""
+        peers = []
+        own = f"{os.getpid()}.json"
+        for filename in os.listdir(self.directory):
+            if not filename.endswith(".json") or filename == own:
+                continue
+            try:
+                with open(os.path.join(self.directory, filename), encoding="utf-8") as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            peers.append((
+                int(filename[:-len(".json")]),
+                {name: {tuple(labels): value for labels, value in series} for name, series in snapshot.items()}
+            ))
+        return peers
+
+class _TokenRate:
+    """최근 구간의 초당 생성 토큰 수"""
+    
+    def __init__(self, window=60.0):
+        self.window = window
+        self._events = deque()
+        self._lock = threading.Lock()
+    
+    def add(self, model, tokens):
+        now = time.monotonic()
+        with self._lock:
+            self._events.append((now, model, tokens))
+            self._trim(now)
+    
+    def rates(self):
+        """{(모델,): 초당 토큰 수}"""
+        now = time.monotonic()
+        with self._lock:
+            self._trim(now)
+            totals = {}
+            for _, model, tokens in self._events:
+                totals[(model,)] = totals.get((model,), 0) + tokens
+        return {labels: total / self.window for labels, total in totals.items()}
+    
+    def _trim(self, now):
+        while self._events and now - self._events[0][0] > self.window:
+            self._events.popleft()
+
+registry = MetricsRegistry()
+_token_rate = _TokenRate()
+
+REQUEST_SECONDS = registry.histogram(
+    "deepseek_request_duration_seconds", "HTTP 요청 처리 시간", ("endpoint", "task", "model", "status")
+)
+QUEUE_WAIT_SECONDS = registry.histogram(
+    "deepseek_queue_wait_seconds", "입장 제어 대기열에서 기다린 시간", ("endpoint", "task", "model")
+)
+TIME_TO_FIRST_TOKEN_SECONDS = registry.histogram(
+    "deepseek_time_to_first_token_seconds", "생성 요청부터 첫 토큰까지의 시간", ("endpoint", "task", "model")
+)
+PREFILL_SECONDS = registry.histogram(
+    "deepseek_prefill_seconds", "프롬프트 프리필 시간", ("endpoint", "task", "model")
+)
+DECODE_TOKEN_SECONDS = registry.histogram(
+    "deepseek_decode_seconds_per_token", "첫 토큰 이후 토큰당 디코딩 시간", ("endpoint", "task", "model"),
+    buckets=TOKEN_BUCKETS
+)
+PROMPT_TOKENS = registry.counter(
+    "deepseek_prompt_tokens_total", "생성 요청의 프롬프트 토큰 수", ("endpoint", "task", "model")
+)
+GENERATED_TOKENS = registry.counter(
+    "deepseek_generated_tokens_total", "생성된 토큰 수", ("endpoint", "task", "model")
+)
+registry.gauge(
+    "deepseek_generated_tokens_per_second", "최근 60초 동안의 초당 생성 토큰 수", ("model",), _token_rate.rates
+)
+registry.gauge("process_resident_memory_bytes", "프로세스 상주 메모리(RSS)", function=get_rss_bytes)
+
+_context = threading.local()
+
+@contextmanager
+def request_labels(endpoint="", task="", model=""):
+    """
+    현재 스레드에서 시작하는 생성의 지표 레이블 지정
+    
+    Args:
+        endpoint: API 엔드포인트 이름
+        task: 작업 종류 (chat, improve, explain 등)
+        model: 모델 이름
+    """
+    previous = getattr(_context, "labels", None)
+    _context.labels = (endpoint, task, model)
+    try:
+        yield
+    finally:
+        _context.labels = previous
+
+def current_labels(model=""):
+    """현재 스레드의 (endpoint, task, model) 레이블 (모델이 비어 있으면 주어진 이름 사용)"""
+    endpoint, task, label_model = getattr(_context, "labels", None) or ("", "", "")
+    return endpoint, task, label_model or model
+
+class GenerationTimer:
+    """
+    생성 한 번의 단계별 시간 측정
+    
+    레이블은 만들어질 때 현재 스레드에서 가져오므로 요청 스레드에서 만든 뒤 다른 스레드
+    (스케줄러 등)에서 token()과 finish()를 호출해도 됩니다.
+    """
+    
+    __slots__ = (
+        "labels", "trace", "prompt_tokens", "start", "prefill_seconds", "first_token_at", "tokens", "finished"
+    )
+    
+    def __init__(self, prompt_tokens, model=""):
+        """
+        Args:
+            prompt_tokens: 프롬프트 토큰 수
+            model: 현재 스레드에 모델 레이블이 없을 때 쓸 모델 이름
+        """
+        self.labels = current_labels(model)
+        self.trace = current_trace()
+        self.prompt_tokens = prompt_tokens
+        self.start = time.perf_counter()
+        self.prefill_seconds = None
+        self.first_token_at = None
+        self.tokens = 0
+        self.finished = not Config.METRICS_ENABLED and self.trace is None
+    
+    def prefill(self, seconds):
+        """프리필 forward 시간 기록 (기록하지 않으면 첫 토큰까지의 시간을 사용)"""
+        self.prefill_seconds = seconds
+    
+    def token(self, count=1):
+        """생성된 토큰 기록"""
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        self.tokens += count
+    
+    def finish(self):
+        """측정값을 지표에 반영 (한 번만)"""
+        if self.finished:
+            return
+        self.finished = True
+        end = time.perf_counter()
+        if self.trace is not None:
+            self._add_spans(end)
+        if not Config.METRICS_ENABLED:
+            return
+        
+        PROMPT_TOKENS.inc(self.prompt_tokens, self.labels)
+        if self.first_token_at is None:
+            return
+        ttft = self.first_token_at - self.start
+        TIME_TO_FIRST_TOKEN_SECONDS.observe(ttft, self.labels)
+        PREFILL_SECONDS.observe(self.prefill_seconds if self.prefill_seconds is not None else ttft, self.labels)
+        if self.tokens > 1:
+            DECODE_TOKEN_SECONDS.observe((end - self.first_token_at) / (self.tokens - 1), self.labels)
+        GENERATED_TOKENS.inc(self.tokens, self.labels)
+        _token_rate.add(self.labels[2], self.tokens)
+    
+    def _add_spans(self, end):
+        """요청 추적에 대기·프리필·디코딩 구간 추가"""
+        if self.first_token_at is None:
+            self.trace.add("queue", self.start, end)
+            return
+        prefill_start = self.start
+        if self.prefill_seconds is not None:
+            prefill_start = max(self.start, self.first_token_at - self.prefill_seconds)
+        if prefill_start > self.start:
+            self.trace.add("queue", self.start, prefill_start)
+        self.trace.add("prefill", prefill_start, self.first_token_at, {"prompt_tokens": self.prompt_tokens})
+        self.trace.add("decode", self.first_token_at, end, {"tokens": self.tokens})
\ No newline at end of file
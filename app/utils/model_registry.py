@@ -0,0 +1,289 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+from app.config import Config
+from app.utils.logger import setup_logger
+from app.utils.system_utils import get_rss_bytes, format_bytes, release_memory
+
+logger = setup_logger(__name__)
+
+def estimate_model_bytes(obj):
+    """
+    모델 객체의 파라미터·버퍼 메모리 추정
+    
+    torch 모듈이면 파라미터와 버퍼 크기를 더하고, 아니면 model/tts 속성의 모듈을 찾아봅니다.
+    
+    Returns:
+        바이트 수 (추정할 수 없으면 0)
+    """
+    for candidate in (obj, getattr(obj, "model", None), getattr(obj, "tts", None)):
+        if candidate is not None and hasattr(candidate, "parameters") and hasattr(candidate, "buffers"):
+            tensors = list(candidate.parameters()) + list(candidate.buffers())
+            return sum(t.nelement() * t.element_size() for t in tensors)
+    return 0
+
+class _Entry:
+    """레지스트리에 등록된 모델 하나의 상태"""
+    
+    def __init__(self, name, loader, unloader=None, evictable=True):
+        self.name = name
+        self.loader = loader
+        self.unloader = unloader
+        self.evictable = evictable
+        self.instance = None
+        self.bytes = 0
+        self.last_bytes = 0
+        self.in_use = 0
+        self.last_used = time.monotonic()
+        self.load_count = 0
+        self.last_load_seconds = 0.0
+        self.total_load_seconds = 0.0
+        self.load_lock = threading.Lock()
+
+class ModelRegistry:
+    """
+    LLM, Whisper, TTS 모델의 상주 관리자
+    
+    모델은 처음 사용할 때 로드되고 같은 이름으로 요청하는 모든 곳에서 공유됩니다.
+    유휴 시간이 한도를 넘은 모델은 백그라운드에서 내리고, 전체 메모리가 예산을 넘으면
+    가장 오래 쓰이지 않은 모델부터 내립니다. 사용 중(use() 블록 안)인 모델과
+    evictable=False로 등록된 모델은 내리지 않습니다.
+    """
+    
+    def __init__(self, max_bytes=None, idle_ttl=None):
+        """
+        레지스트리 초기화
+        
+        Args:
+            max_bytes: 상주 모델의 최대 총 메모리(바이트, 0이면 제한 없음)
+            idle_ttl: 유휴 모델을 내리기까지의 시간(초, 0이면 내리지 않음)
+        """
+        self.max_bytes = Config.MODEL_MEMORY_BUDGET_MB * 1024 * 1024 if max_bytes is None else max_bytes
+        self.idle_ttl = Config.MODEL_IDLE_TTL if idle_ttl is None else idle_ttl
+        
+        self._entries = {}
+        self._lock = threading.RLock()
+        self._reaper = None
+        
+        # 통계
+        self.evictions = 0
+        self.expirations = 0
+    
+    def register(self, name, loader, unloader=None, evictable=True):
+        """
+        모델 로더 등록 (같은 이름이 이미 있으면 기존 등록을 유지)
+        
+        Args:
+            name: 모델 이름 (공유 키)
+            loader: 모델 인스턴스를 만들어 반환하는 함수
+            unloader: 모델을 내릴 때 인스턴스를 받아 호출할 정리 함수
+            evictable: 유휴·메모리 한도로 내릴 수 있는지 여부
+        """
+        with self._lock:
+            if name not in self._entries:
+                self._entries[name] = _Entry(name, loader, unloader, evictable)
+            self._start_reaper()
+    
+    def get(self, name):
+        """
+        모델 인스턴스 반환 (로드되어 있지 않으면 로드)
+        
+        Args:
+            name: 모델 이름
+        
+        Returns:
+            모델 인스턴스
+        """
+        entry = self._entry(name)
+        entry.last_used = time.monotonic()
+        if entry.instance is not None:
+            return entry.instance
+        
+        # 같은 모델을 여러 스레드가 동시에 로드하지 않도록 항목별로 잠금
+        with entry.load_lock:
+            if entry.instance is None:
+                self._load(entry)
+        return entry.instance
+    
+    @contextmanager
+    def use(self, name):
+        """
+        사용하는 동안 내려가지 않도록 모델을 고정
+        
+        Yields:
+            모델 인스턴스
+        """
+        entry = self._entry(name)
+        with self._lock:
+            entry.in_use += 1
+        try:
+            yield self.get(name)
+        finally:
+            with self._lock:
+                entry.in_use -= 1
+                entry.last_used = time.monotonic()
+    
+    def unload(self, name):
+        """
+        모델 내리기
+        
+        Returns:
+            내렸는지 여부 (사용 중이거나 로드되어 있지 않으면 False)
+        """
+        entry = self._entry(name)
+        with entry.load_lock:
+            with self._lock:
+                if entry.instance is None or entry.in_use:
+                    return False
+                instance, entry.instance = entry.instance, None
+                size, entry.bytes = entry.bytes, 0
+            
+            if entry.unloader is not None:
+                try:
+                    entry.unloader(instance)
+                except Exception as e:
+                    logger.warning(f"모델 '{name}' 정리 중 오류: {str(e)}")
+            del instance
+            release_memory()
+        logger.info(f"모델 '{name}' 내림 ({format_bytes(size)})")
+        return True
+    
+    def stats(self):
+        """모델별 상주 상태, 로드 시간, 메모리 반환"""
+        now = time.monotonic()
+        with self._lock:
+            models = {
+                name: {
+                    "loaded": entry.instance is not None,
+                    "bytes": entry.bytes,
+                    "in_use": entry.in_use,
+                    "evictable": entry.evictable,
+                    "idle_seconds": round(now - entry.last_used, 1),
+                    "load_count": entry.load_count,
+                    "last_load_seconds": round(entry.last_load_seconds, 2),
+                    "total_load_seconds": round(entry.total_load_seconds, 2),
+                }
+                for name, entry in self._entries.items()
+            }
+            return {
+                "models": models,
+                "resident_bytes": sum(entry.bytes for entry in self._entries.values()),
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "rss_bytes": get_rss_bytes(),
+            }
+    
+    def _entry(self, name):
+        with self._lock:
+            if name not in self._entries:
+                raise KeyError(f"등록되지 않은 모델입니다: {name}")
+            return self._entries[name]
+    
+    def _load(self, entry):
+        """모델 로드 후 메모리 예산 적용 (entry.load_lock을 잡은 상태에서 호출)"""
+        # 이전에 로드한 적이 있으면 그 크기만큼 미리 자리를 비움
+        if entry.bytes == 0 and entry.load_count:
+            self._enforce_budget(reserve=entry.last_bytes, keep=entry.name)
+        
+        logger.info(f"모델 '{entry.name}' 로딩 중...")
+        rss_before = get_rss_bytes()
+        start = time.perf_counter()
+        instance = entry.loader()
+        elapsed = time.perf_counter() - start
+        
+        size = estimate_model_bytes(instance)
+        if not size and rss_before is not None:
+            # 파라미터로 크기를 알 수 없는 모델은 로딩 전후 RSS 차이로 추정
+            size = max(0, (get_rss_bytes() or rss_before) - rss_before)
+        
+        with self._lock:
+            entry.instance = instance
+            entry.bytes = entry.last_bytes = size
+            entry.load_count += 1
+            entry.last_load_seconds = elapsed
+            entry.total_load_seconds += elapsed
+            entry.last_used = time.monotonic()
+        logger.info(f"모델 '{entry.name}' 로딩 완료 ({elapsed:.1f}초, {format_bytes(size)})")
+        
+        self._enforce_budget(keep=entry.name)
+    
+    def _enforce_budget(self, reserve=0, keep=None):
+        """예산을 넘으면 사용 중이 아닌 모델을 LRU 순서로 내림"""
+        if not self.max_bytes:
+            return
+        with self._lock:
+            candidates = sorted(
+                (entry for entry in self._entries.values()
+                 if entry.instance is not None and entry.evictable and entry.name != keep),
+                key=lambda entry: entry.last_used
+            )
+            total = sum(entry.bytes for entry in self._entries.values())
+        
+        for entry in candidates:
+            if total + reserve <= self.max_bytes:
+                break
+            size = entry.bytes
+            if self.unload(entry.name):
+                total -= size
+                self.evictions += 1
+        
+        if total + reserve > self.max_bytes:
+            logger.warning(
+                f"모델 메모리 예산 초과: {format_bytes(total + reserve)} / {format_bytes(self.max_bytes)} "
+                "(사용 중이거나 고정된 모델만 남음)"
+            )
+    
+    def _after_fork(self):
+        """fork된 자식 프로세스에서 잠금과 정리 스레드를 새로 만듦 (스레드는 fork로 복제되지 않음)"""
+        self._lock = threading.RLock()
+        for entry in self._entries.values():
+            entry.load_lock = threading.Lock()
+        self._reaper = None
+        if self._entries:
+            self._start_reaper()
+    
+    def _start_reaper(self):
+        """유휴 모델 정리 스레드 시작 (self._lock을 잡은 상태에서 호출)"""
+        if self._reaper is not None or not self.idle_ttl:
+            return
+        self._reaper = threading.Thread(target=self._reap_loop, name="model-reaper", daemon=True)
+        self._reaper.start()
+    
+    def _reap_loop(self):
+        """유휴 시간이 지난 모델을 주기적으로 내림"""
+        interval = max(1.0, min(60.0, self.idle_ttl / 4))
+        while True:
+            time.sleep(interval)
+            now = time.monotonic()
+            with self._lock:
+                expired = [
+                    entry.name for entry in self._entries.values()
+                    if entry.instance is not None and entry.evictable and not entry.in_use
+                    and now - entry.last_used > self.idle_ttl
+                ]
+            for name in expired:
+                if self.unload(name):
+                    self.expirations += 1
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_registry():
+    """프로세스 전체에서 공유하는 모델 레지스트리 반환"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ModelRegistry()
+        return _registry
+
+def _reset_after_fork():
+    global _registry_lock
+    _registry_lock = threading.Lock()
+    if _registry is not None:
+        _registry._after_fork()
+
+# 모델을 미리 로드한 뒤 fork하는 워커 서버에서도 레지스트리가 동작하도록 함
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
\ No newline at end of file
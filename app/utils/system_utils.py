@@ -0,0 +1,55 @@
+import os
+import gc
+import sys
+
+def get_rss_bytes():
+    """
+    현재 프로세스의 상주 메모리(RSS) 크기 반환
+    
+    Returns:
+        RSS 바이트 수 (확인할 수 없으면 None)
+    """
+    # Linux: /proc에서 현재 RSS 조회
+    try:
+        with open("/proc/self/statm", "r") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    
+    # 그 외 유닉스: 최대 RSS로 대체 (macOS는 바이트, Linux는 KB 단위)
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    except (ImportError, OSError):
+        return None
+
+def format_bytes(num_bytes):
+    """바이트 수를 사람이 읽기 쉬운 문자열로 변환"""
+    if num_bytes is None:
+        return "알 수 없음"
+    for unit in ["B", "KB", "MB", "GB"]:
+        if abs(num_bytes) < 1024:
+            return f"{num_bytes:.1f}{unit}"
+        num_bytes /= 1024
+    return f"{num_bytes:.1f}TB"
+
+def release_memory():
+    """
+    내린 모델의 메모리를 운영체제에 반환
+    
+    가비지 컬렉션 후 CUDA 캐시를 비우고, glibc에서는 malloc_trim으로 해제된 힙을 돌려줍니다.
+    """
+    gc.collect()
+    
+    torch = sys.modules.get("torch")
+    if torch is not None and torch.cuda.is_available():
+        torch.cuda.empty_cache()
+    
+    if sys.platform.startswith("linux"):
+        try:
+            import ctypes
+            ctypes.CDLL("libc.so.6").malloc_trim(0)
+        except (OSError, AttributeError):
+            pass
\ No newline at end of file
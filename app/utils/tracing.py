@@ -0,0 +1,349 @@
+import os
+import re
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from app.config import Config
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+_local = threading.local()
+# 추적 중이 아닐 때 span()이 돌려주는 공용 컨텍스트 (할당 없음)
+_NOOP = nullcontext()
+
+class _Span:
+    """구간 하나 (끝날 때 Trace에 기록)"""
+    
+    __slots__ = ("trace", "name", "args", "start", "_record")
+    
+    def __init__(self, trace, name, args):
+        self.trace = trace
+        self.name = name
+        self.args = args
+        self._record = None
+    
+    def __enter__(self):
+        if self.trace.record_functions:
+            # torch 프로파일러 결과에도 같은 이름의 구간이 보이도록 함
+            from torch.autograd.profiler import record_function
+            self._record = record_function(self.name)
+            self._record.__enter__()
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        if self._record is not None:
+            self._record.__exit__(exc_type, exc, tb)
+        args = self.args
+        if exc_type is not None:
+            args = dict(args or {}, error=exc_type.__name__)
+        self.trace.add(self.name, self.start, end, args)
+        return False
+
+class Trace:
+    """
+    요청 하나의 구간 기록
+    
+    다른 스레드(스케줄러 등)에서도 add()로 구간을 추가할 수 있습니다.
+    """
+    
+    def __init__(self, name, request_id=None, record_functions=False):
+        """
+        Args:
+            name: 최상위 구간 이름 (엔드포인트 등)
+            request_id: 요청 ID
+            record_functions: 구간을 torch 프로파일러의 record_function으로도 표시할지 여부
+        """
+        self.name = name
+        self.request_id = request_id
+        self.record_functions = record_functions
+        self.started_at = time.time()
+        self.events = []
+        self._lock = threading.Lock()
+    
+    def span(self, name, args=None):
+        """구간 컨텍스트 생성"""
+        return _Span(self, name, args)
+    
+    def add(self, name, start, end, args=None, thread_id=None):
+        """
+        끝난 구간 추가
+        
+        Args:
+            name: 구간 이름
+            start: 시작 시각 (time.perf_counter)
+            end: 끝 시각 (time.perf_counter)
+            args: 구간에 붙일 정보
+            thread_id: 구간이 실행된 스레드 (기본값: 현재 스레드)
+        """
+        event = (name, start, end, args, thread_id or threading.get_ident())
+        with self._lock:
+            self.events.append(event)
+    
+    @property
+    def duration(self):
+        """가장 긴 구간 기준의 요청 처리 시간(초)"""
+        with self._lock:
+            if not self.events:
+                return 0.0
+            return max(end for _, _, end, _, _ in self.events) - min(start for _, start, _, _, _ in self.events)
+    
+    def chrome_events(self):
+        """Chrome trace 형식(ph=X, 마이크로초)의 이벤트 목록"""
+        pid = os.getpid()
+        with self._lock:
+            events = list(self.events)
+        threads = set()
+        result = []
+        for name, start, end, args, thread_id in events:
+            threads.add(thread_id)
+            event = {
+                "name": name,
+                "cat": self.name,
+                "ph": "X",
+                "ts": round(start * 1e6, 3),
+                "dur": round((end - start) * 1e6, 3),
+                "pid": pid,
+                "tid": thread_id,
+                "args": dict(args or {}, request_id=self.request_id),
+            }
+            result.append(event)
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id in threads:
+            result.append({
+                "name": "thread_name", "ph": "M", "pid": pid, "tid": thread_id,
+                "args": {"name": names.get(thread_id, str(thread_id))},
+            })
+        return result
+
+def current_trace():
+    """현재 스레드에서 기록 중인 Trace (없으면 None)"""
+    return getattr(_local, "trace", None)
+
+def span(name, **args):
+    """
+    현재 요청의 추적 구간
+    
+    추적 중이 아니면 아무것도 하지 않는 공용 컨텍스트를 돌려주므로 비용이 거의 없습니다.
+    
+    Args:
+        name: 구간 이름
+        **args: 구간에 붙일 정보
+    """
+    trace = getattr(_local, "trace", None)
+    if trace is None:
+        return _NOOP
+    return _Span(trace, name, args or None)
+
+class Tracer:
+    """
+    요청 단위 구간 추적기
+    
+    Config.TRACING_ENABLED이거나 요청이 추적을 원할 때만 Trace를 만들고, 최근 추적을
+    정해진 개수만큼 보관했다가 Chrome trace JSON(chrome://tracing, Perfetto)으로 내보냅니다.
+    """
+    
+    def __init__(self, max_traces=None):
+        """
+        Args:
+            max_traces: 보관할 최근 추적 수 (기본값: Config.TRACE_MAX_TRACES)
+        """
+        self._traces = deque(maxlen=max_traces or Config.TRACE_MAX_TRACES)
+        self._lock = threading.Lock()
+    
+    @contextmanager
+    def trace(self, name, request_id=None, enabled=False, record_functions=False):
+        """
+        블록 안에서 현재 스레드의 구간을 기록
+        
+        Args:
+            name: 최상위 구간 이름
+            request_id: 요청 ID
+            enabled: Config.TRACING_ENABLED가 꺼져 있어도 이 요청을 추적할지 여부
+            record_functions: torch 프로파일러에도 구간 이름을 표시할지 여부
+        
+        Yields:
+            Trace (추적하지 않으면 None)
+        """
+        if not (enabled or Config.TRACING_ENABLED):
+            yield None
+            return
+        
+        trace = Trace(name, request_id, record_functions)
+        previous = getattr(_local, "trace", None)
+        _local.trace = trace
+        try:
+            with trace.span(name):
+                yield trace
+        finally:
+            _local.trace = previous
+            with self._lock:
+                self._traces.append(trace)
+    
+    def export(self, request_id=None):
+        """
+        보관 중인 추적을 Chrome trace JSON 객체로 내보냄
+        
+        Args:
+            request_id: 이 요청의 추적만 내보냄 (None이면 전부)
+        """
+        with self._lock:
+            traces = [trace for trace in self._traces if request_id is None or trace.request_id == request_id]
+        events = []
+        for trace in traces:
+            events.extend(trace.chrome_events())
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+    
+    def stats(self):
+        """보관 중인 추적 요약"""
+        with self._lock:
+            traces = list(self._traces)
+        return {
+            "enabled": Config.TRACING_ENABLED,
+            "traces": [
+                {"name": trace.name, "request_id": trace.request_id, "started_at": trace.started_at,
+                 "duration_seconds": round(trace.duration, 4)}
+                for trace in traces
+            ],
+        }
+
+def profiling():
+    """현재 스레드의 요청을 측정 중인 프로파일 이름 (측정 중이 아니면 None)"""
+    return getattr(_local, "profile_name", None)
+
+def _safe_name(name):
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", str(name))[:64]
+
+class TorchProfiler:
+    """
+    다음 N개 요청을 torch.profiler로 측정하는 관리자 스위치
+    
+    arm(n)으로 켜면 이후 요청 n개를 측정하고, 결과는 Config.LOG_DIR/profiles 아래에
+    Chrome trace JSON으로 저장됩니다. torch 프로파일러는 시작한 스레드의 연산만 기록하고
+    프로세스에 측정 세션을 하나만 둘 수 있으므로, 모델을 스케줄러가 실행하면 스케줄러
+    스레드가 측정해 같은 이름에 _scheduler를 붙여 저장합니다. 다른 측정이 진행 중이면
+    새 세션은 건너뜁니다. 꺼져 있으면 요청마다 정수 비교 한 번만 합니다.
+    """
+    
+    def __init__(self, directory=None):
+        """
+        Args:
+            directory: 결과 저장 폴더 (기본값: Config.LOG_DIR/profiles)
+        """
+        self.directory = directory or os.path.join(Config.LOG_DIR, "profiles")
+        self.remaining = 0
+        self.files = deque(maxlen=20)
+        self._active = False
+        self._lock = threading.Lock()
+    
+    def arm(self, requests):
+        """
+        다음 요청 n개 측정 예약
+        
+        Args:
+            requests: 측정할 요청 수 (0이면 해제)
+        """
+        with self._lock:
+            self.remaining = max(0, int(requests))
+        logger.info(f"torch 프로파일러 예약: 다음 요청 {self.remaining}개")
+    
+    def stats(self):
+        """예약 상태와 최근 결과 파일"""
+        with self._lock:
+            return {"remaining": self.remaining, "directory": self.directory, "files": list(self.files)}
+    
+    @contextmanager
+    def request(self, name, local=True):
+        """
+        예약되어 있으면 블록의 요청을 측정 대상으로 표시
+        
+        Args:
+            name: 결과 파일 이름에 쓸 요청 이름
+            local: 현재 스레드도 측정할지 여부 (모델을 스케줄러 스레드가 실행하면 False)
+        
+        Yields:
+            측정 여부
+        """
+        if not self.remaining:
+            yield False
+            return
+        with self._lock:
+            if not self.remaining:
+                armed = False
+            else:
+                self.remaining -= 1
+                armed = True
+        if not armed:
+            yield False
+            return
+        
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}_{_safe_name(name)}"
+        _local.profile_name = name
+        try:
+            if local:
+                with self.session(name):
+                    yield True
+            else:
+                yield True
+        finally:
+            _local.profile_name = None
+    
+    @contextmanager
+    def session(self, name):
+        """현재 스레드의 torch 연산을 측정해 name.json으로 저장 (다른 측정 중이면 건너뜀)"""
+        profiler = self.start()
+        try:
+            yield
+        finally:
+            if profiler is not None:
+                self.stop(profiler, name)
+    
+    def start(self):
+        """
+        현재 스레드에서 프로파일러 시작
+        
+        Returns:
+            시작한 프로파일러 (다른 측정 세션이 진행 중이면 None)
+        """
+        import torch
+        from torch.profiler import ProfilerActivity, profile
+        
+        with self._lock:
+            if self._active:
+                logger.warning("다른 프로파일 측정이 진행 중이어서 이번 측정은 건너뜁니다.")
+                return None
+            self._active = True
+        
+        activities = [ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(ProfilerActivity.CUDA)
+        try:
+            profiler = profile(activities=activities, record_shapes=True, with_stack=False)
+            profiler.start()
+        except Exception:
+            self._active = False
+            raise
+        return profiler
+    
+    def stop(self, profiler, name):
+        """프로파일러를 멈추고 결과 저장"""
+        try:
+            profiler.stop()
+        finally:
+            self._active = False
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{name}.json")
+        try:
+            profiler.export_chrome_trace(path)
+        except Exception as e:
+            logger.warning(f"프로파일 저장 실패: {str(e)}")
+            return
+        with self._lock:
+            self.files.append(path)
+        logger.info(f"torch 프로파일 저장: {path}")
+
+# 프로세스 전체에서 공유하는 프로파일러 스위치 (스케줄러 스레드도 같은 저장 위치를 사용)
+profiler = TorchProfiler()
\ No newline at end of file
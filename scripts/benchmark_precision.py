@@ -0,0 +1,85 @@
+import os
+import sys
+import time
+import argparse
+import multiprocessing
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.logger import setup_logger
+from app.utils.system_utils import format_bytes
+
+logger = setup_logger(__name__)
+
+PROMPT = "Human: 파이썬으로 피보나치 수열을 구하는 함수를 작성해 주세요.\n\nAssistant:"
+
+def measure(model_name, precision, max_new_tokens, results):
+    """
+    정밀도 모드 하나의 메모리와 처리량 측정 (모드마다 새 프로세스에서 실행)
+    
+    Args:
+        model_name: 모델 이름
+        precision: 정밀도 모드
+        max_new_tokens: 생성할 토큰 수
+        results: 결과를 넣을 큐
+    """
+    import torch
+    from app.agent.deepseek_agent import DeepSeekAgent
+    from app.utils.system_utils import get_rss_bytes
+    
+    agent = DeepSeekAgent(model_name, precision)
+    rss = get_rss_bytes()
+    
+    input_ids = torch.tensor([agent.tokenizer(PROMPT).input_ids], device=agent.device)
+    generate_kwargs = {
+        "attention_mask": torch.ones_like(input_ids),
+        "max_new_tokens": max_new_tokens,
+        "min_new_tokens": max_new_tokens,
+        "do_sample": False,
+        "pad_token_id": agent.tokenizer.eos_token_id,
+    }
+    
+    with torch.no_grad():
+        # 워밍업
+        agent.model.generate(input_ids, **dict(generate_kwargs, max_new_tokens=4, min_new_tokens=4))
+        start = time.perf_counter()
+        output = agent.model.generate(input_ids, **generate_kwargs)
+        elapsed = time.perf_counter() - start
+    
+    generated = output.shape[1] - input_ids.shape[1]
+    results.put({
+        "precision": agent.precision,
+        "rss": rss,
+        "tokens_per_second": generated / elapsed,
+    })
+
+def main():
+    """스크립트 진입점"""
+    parser = argparse.ArgumentParser(description="정밀도 모드별 메모리/처리량 벤치마크")
+    parser.add_argument("--model", type=str, default=None, help="사용할 모델 이름")
+    parser.add_argument("--modes", type=str, default="fp32,bf16,int8", help="비교할 정밀도 모드 (쉼표로 구분)")
+    parser.add_argument("--max-new-tokens", type=int, default=64, help="생성할 토큰 수")
+    args = parser.parse_args()
+    
+    # 모드마다 깨끗한 프로세스에서 측정해야 RSS가 섞이지 않음
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    
+    rows = []
+    for precision in args.modes.split(","):
+        process = context.Process(target=measure, args=(args.model, precision.strip(), args.max_new_tokens, results))
+        process.start()
+        process.join()
+        if process.exitcode != 0:
+            logger.error(f"[{precision}] 측정 실패 (종료 코드 {process.exitcode})")
+            continue
+        rows.append(results.get())
+    
+    for row in rows:
+        logger.info(
+            f"[{row['precision']}] 상주 메모리: {format_bytes(row['rss'])}, "
+            f"처리량: {row['tokens_per_second']:.1f} tokens/s"
+        )
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
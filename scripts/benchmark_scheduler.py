@@ -0,0 +1,98 @@
+import os
+import sys
+import time
+import argparse
+import threading
+import torch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.agent.deepseek_agent import DeepSeekAgent
+from app.agent.scheduler import GenerationScheduler
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+PROMPTS = [
+    "파이썬에서 리스트와 튜플의 차이를 설명해 주세요.",
+    "다음 함수를 최적화해 주세요.\n\ndef total(xs):\n    s = 0\n    for x in xs:\n        s = s + x\n    return s",
+    "Write a function that checks whether a string is a palindrome.",
+    "퀵 정렬의 시간 복잡도를 설명해 주세요.",
+]
+
+def run_load(generate_fn, clients, requests_per_client):
+    """
+    여러 클라이언트 스레드로 부하를 주고 결과 집계
+    
+    Args:
+        generate_fn: 프롬프트 인덱스를 받아 생성된 토큰 수를 반환하는 함수
+        clients: 동시 클라이언트 수
+        requests_per_client: 클라이언트당 요청 수
+    
+    Returns:
+        (총 생성 토큰 수, 경과 시간)
+    """
+    counts = [0] * clients
+    
+    def client(index):
+        for i in range(requests_per_client):
+            counts[index] += generate_fn((index + i) % len(PROMPTS))
+    
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(counts), time.perf_counter() - start
+
+def main():
+    """스크립트 진입점"""
+    parser = argparse.ArgumentParser(description="생성 스케줄러 부하 테스트")
+    parser.add_argument("--model", type=str, default=None, help="사용할 모델 이름")
+    parser.add_argument("--clients", type=int, default=8, help="동시 클라이언트 수")
+    parser.add_argument("--requests", type=int, default=2, help="클라이언트당 요청 수")
+    parser.add_argument("--max-new-tokens", type=int, default=64, help="요청당 생성 토큰 수")
+    parser.add_argument("--max-batch-size", type=int, default=None, help="스케줄러 최대 배치 크기")
+    args = parser.parse_args()
+    
+    agent = DeepSeekAgent(args.model)
+    tokenizer = agent.tokenizer
+    prompt_ids = [tokenizer(f"Human: {prompt}\n\nAssistant:").input_ids for prompt in PROMPTS]
+    
+    # 기존 방식: 요청마다 model.generate를 하나씩 실행
+    model_lock = threading.Lock()
+    
+    def sequential(index):
+        input_ids = torch.tensor([prompt_ids[index]], device=agent.device)
+        with model_lock, torch.no_grad():
+            output = agent.model.generate(
+                input_ids,
+                attention_mask=torch.ones_like(input_ids),
+                max_new_tokens=args.max_new_tokens,
+                min_new_tokens=args.max_new_tokens,
+                do_sample=False,
+                pad_token_id=tokenizer.eos_token_id
+            )
+        return output.shape[1] - input_ids.shape[1]
+    
+    # 스케줄러 방식: 모든 요청을 하나의 디코딩 루프에서 배칭
+    scheduler = GenerationScheduler(agent.model, tokenizer, agent.device, args.max_batch_size).start()
+    # 같은 토큰 수를 비교하기 위해 EOS로 끝나지 않게 함
+    scheduler.eos_token_ids = set()
+    
+    def scheduled(index):
+        return len(scheduler.generate(prompt_ids[index], args.max_new_tokens, temperature=0))
+    
+    results = {}
+    for name, generate_fn in [("sequential", sequential), ("scheduler", scheduled)]:
+        tokens, elapsed = run_load(generate_fn, args.clients, args.requests)
+        results[name] = tokens / elapsed
+        logger.info(f"[{name}] 토큰: {tokens}, 시간: {elapsed:.2f}초, 처리량: {results[name]:.1f} tokens/s")
+    
+    scheduler.stop()
+    logger.info(f"스케줄러 통계: {scheduler.stats()}")
+    logger.info(f"처리량 향상: {results['scheduler'] / results['sequential']:.2f}배")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
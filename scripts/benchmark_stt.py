@@ -0,0 +1,130 @@
+import io
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+import soundfile as sf
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.audio.decoding import WHISPER_SAMPLE_RATE, load_audio_bytes
+from app.config import Config
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+def make_clip(seconds, sample_rate, audio_format):
+    """
+    잡음 섞인 음성 대역 신호로 측정용 오디오 클립 생성
+    
+    Args:
+        seconds: 길이(초)
+        sample_rate: 샘플링 레이트
+        audio_format: 'WAV', 'FLAC', 'OGG'
+    
+    Returns:
+        오디오 데이터 (바이트)
+    """
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    signal = 0.3 * np.sin(2 * np.pi * 220 * t) * np.sin(2 * np.pi * 3 * t) + 0.05 * rng.standard_normal(len(t))
+    buffer = io.BytesIO()
+    sf.write(buffer, signal.astype(np.float32), sample_rate, format=audio_format)
+    return buffer.getvalue()
+
+def ffmpeg_decode(data):
+    """
+    기존 경로: 임시 파일에 쓰고 ffmpeg 프로세스로 16 kHz 모노로 디코딩 (whisper.load_audio와 같은 명령)
+    
+    Args:
+        data: 오디오 데이터 (바이트)
+    
+    Returns:
+        16 kHz 모노 float32 샘플 배열
+    """
+    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_file:
+        temp_file.write(data)
+    try:
+        cmd = ["ffmpeg", "-nostdin", "-threads", "0", "-i", temp_file.name,
+               "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(WHISPER_SAMPLE_RATE), "-"]
+        out = subprocess.run(cmd, capture_output=True, check=True).stdout
+    finally:
+        os.unlink(temp_file.name)
+    return np.frombuffer(out, np.int16).flatten().astype(np.float32) / 32768.0
+
+def measure(name, fn, clips, repeat):
+    """
+    클립당 지연 시간 측정
+    
+    Args:
+        name: 경로 이름
+        fn: 오디오 바이트를 받아 처리하는 함수
+        clips: 오디오 클립 목록
+        repeat: 클립마다 반복 횟수
+    
+    Returns:
+        클립당 지연 시간 목록(초)
+    """
+    fn(clips[0])  # 첫 호출의 초기화 비용 제외
+    latencies = []
+    for data in clips:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn(data)
+            latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    logger.info(
+        f"[{name}] 평균 {np.mean(latencies) * 1000:.1f}ms, p50 {latencies[len(latencies) // 2] * 1000:.1f}ms, "
+        f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f}ms"
+    )
+    return latencies
+
+def main():
+    """스크립트 진입점"""
+    parser = argparse.ArgumentParser(description="STT 오디오 디코딩 경로 비교 (임시 파일 + ffmpeg vs 메모리 디코딩)")
+    parser.add_argument("--audio", nargs="*", default=None, help="측정할 오디오 파일 (기본값: 합성 클립)")
+    parser.add_argument("--seconds", type=float, default=10.0, help="합성 클립 길이(초)")
+    parser.add_argument("--sample-rate", type=int, default=Config.AUDIO_SAMPLE_RATE, help="합성 클립 샘플링 레이트")
+    parser.add_argument("--format", type=str, default="WAV", choices=["WAV", "FLAC", "OGG"], help="합성 클립 형식")
+    parser.add_argument("--repeat", type=int, default=10, help="클립마다 반복 횟수")
+    parser.add_argument("--transcribe", action="store_true", help="Whisper 변환까지 포함해 측정")
+    parser.add_argument("--model", type=str, default=None, help="Whisper 모델 이름 (--transcribe 사용 시)")
+    args = parser.parse_args()
+    
+    if args.audio:
+        clips = []
+        for path in args.audio:
+            with open(path, "rb") as f:
+                clips.append(f.read())
+    else:
+        clips = [make_clip(args.seconds, args.sample_rate, args.format)]
+    
+    if args.transcribe:
+        from app.audio.stt import SpeechToText
+        stt = SpeechToText(args.model)
+        
+        def legacy(data):
+            return stt._transcribe_via_file(data, None)
+        
+        def in_memory(data):
+            return stt.transcribe_audio_data(data)
+    else:
+        legacy = ffmpeg_decode
+        in_memory = load_audio_bytes
+    
+    results = {}
+    try:
+        results["temp_file_ffmpeg"] = measure("temp_file_ffmpeg", legacy, clips, args.repeat)
+    except (FileNotFoundError, subprocess.CalledProcessError) as e:
+        logger.warning(f"ffmpeg 경로를 측정할 수 없습니다: {str(e)}")
+    results["in_memory"] = measure("in_memory", in_memory, clips, args.repeat)
+    
+    if "temp_file_ffmpeg" in results:
+        speedup = np.mean(results["temp_file_ffmpeg"]) / np.mean(results["in_memory"])
+        logger.info(f"클립당 지연 시간 단축: {speedup:.2f}배")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
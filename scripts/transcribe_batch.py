@@ -0,0 +1,103 @@
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.audio.long_audio import LongAudioTranscriber
+from app.config import Config
+from app.utils.file_utils import ensure_dir, list_files
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+AUDIO_EXTENSIONS = (".wav", ".flac", ".ogg", ".mp3", ".m4a", ".webm")
+
+def output_path(audio_path, input_dir, output_dir):
+    """입력 폴더 구조를 그대로 따르는 결과 파일 경로 (<이름>.json)"""
+    relative = os.path.relpath(audio_path, input_dir)
+    return os.path.join(output_dir, os.path.splitext(relative)[0] + ".json")
+
+def is_done(audio_path, result_path):
+    """
+    이미 변환된 파일인지 확인 (이어서 실행할 때 건너뜀)
+    
+    결과 파일에 기록한 원본 크기·수정 시각이 지금과 같을 때만 완료로 봅니다.
+    """
+    if not os.path.exists(result_path):
+        return False
+    try:
+        with open(result_path, "r", encoding="utf-8") as f:
+            source = json.load(f).get("source", {})
+    except (OSError, ValueError):
+        return False
+    stat = os.stat(audio_path)
+    return source.get("size") == stat.st_size and source.get("mtime") == stat.st_mtime
+
+def save_result(result, audio_path, result_path):
+    """
+    변환 결과를 JSON과 텍스트 파일로 저장
+    
+    중단되어도 반쯤 쓴 결과가 완료로 보이지 않도록 임시 파일에 쓴 뒤 교체합니다.
+    """
+    ensure_dir(os.path.dirname(result_path))
+    stat = os.stat(audio_path)
+    result = dict(result, source={"path": audio_path, "size": stat.st_size, "mtime": stat.st_mtime})
+    
+    text_path = os.path.splitext(result_path)[0] + ".txt"
+    with open(text_path + ".tmp", "w", encoding="utf-8") as f:
+        f.write(result["text"] + "\n")
+    os.replace(text_path + ".tmp", text_path)
+    
+    # JSON을 마지막에 교체 (JSON이 있으면 완료로 판단)
+    with open(result_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    os.replace(result_path + ".tmp", result_path)
+
+def main():
+    """스크립트 진입점"""
+    parser = argparse.ArgumentParser(description="폴더 안의 긴 녹음 파일을 병렬로 일괄 변환 (중단 후 이어서 실행 가능)")
+    parser.add_argument("input_dir", type=str, help="오디오 파일 폴더")
+    parser.add_argument("--output-dir", type=str, default=os.path.join(Config.DATA_DIR, "transcripts"),
+                        help="결과 폴더 (기본값: data/transcripts)")
+    parser.add_argument("--model", type=str, default=None, help="Whisper 모델 이름 (기본값: WHISPER_MODEL 환경 변수)")
+    parser.add_argument("--language", type=str, default=None, help="언어 코드 (기본값: 자동 감지)")
+    parser.add_argument("--workers", type=int, default=None, help="워커 프로세스 수 (기본값: STT_WORKERS 환경 변수)")
+    parser.add_argument("--chunk-seconds", type=float, default=None, help="최대 청크 길이(초)")
+    parser.add_argument("--overlap-seconds", type=float, default=None, help="청크 사이 겹침 길이(초)")
+    parser.add_argument("--force", action="store_true", help="이미 변환된 파일도 다시 변환")
+    args = parser.parse_args()
+    
+    files = sorted(path for path in list_files(args.input_dir) if path.lower().endswith(AUDIO_EXTENSIONS))
+    pending = [
+        path for path in files
+        if args.force or not is_done(path, output_path(path, args.input_dir, args.output_dir))
+    ]
+    logger.info(f"오디오 파일 {len(files)}개 중 {len(pending)}개 변환 예정 (완료된 {len(files) - len(pending)}개 건너뜀)")
+    
+    failed = 0
+    with LongAudioTranscriber(args.model, args.language, args.workers, args.chunk_seconds,
+                              args.overlap_seconds) as transcriber:
+        for index, path in enumerate(pending, 1):
+            start = time.perf_counter()
+            try:
+                result = transcriber.transcribe(path)
+            except Exception as e:
+                failed += 1
+                logger.error(f"[{index}/{len(pending)}] '{path}' 변환 실패: {str(e)}")
+                continue
+            elapsed = time.perf_counter() - start
+            save_result(result, path, output_path(path, args.input_dir, args.output_dir))
+            logger.info(
+                f"[{index}/{len(pending)}] '{path}' 완료: 오디오 {result['duration']:.1f}초, "
+                f"소요 {elapsed:.1f}초 (실시간 대비 {result['duration'] / max(elapsed, 1e-6):.1f}배)"
+            )
+    
+    if failed:
+        logger.warning(f"{failed}개 파일 변환 실패 (다시 실행하면 실패한 파일만 변환합니다)")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -18,6 +18,51 @@ document.addEventListener("DOMContentLoaded", function () {
     });
   });
 
+  // 진행 중인 생성 요청 (요청 ID -> AbortController)
+  const inflight = new Map();
+  const REQUEST_TIMEOUT = 120; // 초
+
+  function newRequestId() {
+    if (window.crypto && crypto.randomUUID) return crypto.randomUUID();
+    return Date.now().toString(36) + Math.random().toString(36).slice(2);
+  }
+
+  // 생성 요청 시작: 중단 신호와 요청 ID를 함께 반환
+  function startRequest() {
+    const requestId = newRequestId();
+    const controller = new AbortController();
+    inflight.set(requestId, controller);
+    return { requestId, signal: controller.signal };
+  }
+
+  function finishRequest(requestId) {
+    inflight.delete(requestId);
+  }
+
+  // 요청 중단: fetch를 끊고 서버에도 생성을 멈추도록 알림
+  function abortRequest(requestId) {
+    const controller = inflight.get(requestId);
+    if (!controller) return;
+    inflight.delete(requestId);
+    controller.abort();
+    const body = JSON.stringify({ request_id: requestId });
+    if (!(navigator.sendBeacon && navigator.sendBeacon("/api/cancel", body))) {
+      fetch("/api/cancel", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body,
+        keepalive: true,
+      }).catch(() => {});
+    }
+  }
+
+  function abortAll() {
+    Array.from(inflight.keys()).forEach(abortRequest);
+  }
+
+  // 페이지를 떠나면 진행 중인 생성을 모두 중단
+  window.addEventListener("pagehide", abortAll);
+
   // 채팅 기능
   const chatInput = document.getElementById("chat-input");
   const sendBtn = document.getElementById("send-btn");
@@ -38,13 +83,20 @@ document.addEventListener("DOMContentLoaded", function () {
       const loadingId = addMessage("system", "<em>생각 중...</em>");
 
       // API 요청
+      const { requestId, signal } = startRequest();
       fetch("/api/chat", {
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ query: message }),
+        body: JSON.stringify({
+          query: message,
+          request_id: requestId,
+          timeout: REQUEST_TIMEOUT,
+        }),
+        signal,
       })
         .then((response) => response.json())
         .then((data) => {
+          finishRequest(requestId);
           // 로딩 메시지 제거
           const loadingMsg = document.getElementById(loadingId);
           if (loadingMsg) loadingMsg.remove();
@@ -57,9 +109,12 @@ document.addEventListener("DOMContentLoaded", function () {
           }
         })
         .catch((error) => {
-          console.error("Error:", error);
+          finishRequest(requestId);
           const loadingMsg = document.getElementById(loadingId);
           if (loadingMsg) loadingMsg.remove();
+          // 직접 중단한 요청은 오류로 표시하지 않음
+          if (error.name === "AbortError") return;
+          console.error("Error:", error);
           addMessage("system", "오류가 발생했습니다. 다시 시도해주세요.");
         });
     }
@@ -111,6 +166,8 @@ document.addEventListener("DOMContentLoaded", function () {
     // 대화 기록 초기화
     if (clearBtn) {
       clearBtn.addEventListener("click", function () {
+        // 진행 중인 답변 생성은 더 이상 필요 없으므로 중단
+        abortAll();
         fetch("/api/chat", {
           method: "POST",
           headers: { "Content-Type": "application/json" },
@@ -139,6 +196,8 @@ document.addEventListener("DOMContentLoaded", function () {
   const enhanceResult = document.getElementById("enhance-result");
 
   if (enhanceBtn && codeInput && enhanceTask && enhanceResult) {
+    let enhanceRequestId = null;
+
     enhanceBtn.addEventListener("click", function () {
       const code = codeInput.value.trim();
       const task = enhanceTask.value;
@@ -148,18 +207,30 @@ document.addEventListener("DOMContentLoaded", function () {
         return;
       }
 
+      // 이전 요청의 결과는 버려지므로 서버에서도 중단
+      if (enhanceRequestId) abortRequest(enhanceRequestId);
+
       // 로딩 표시
       enhanceResult.innerHTML =
         '<p class="placeholder"><em>코드 분석 중...</em></p>';
 
       // API 요청
+      const { requestId, signal } = startRequest();
+      enhanceRequestId = requestId;
       fetch("/api/enhance", {
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ code, task }),
+        body: JSON.stringify({
+          code,
+          task,
+          request_id: requestId,
+          timeout: REQUEST_TIMEOUT,
+        }),
+        signal,
       })
         .then((response) => response.json())
         .then((data) => {
+          finishRequest(requestId);
           if (data.error) {
             enhanceResult.innerHTML = `<p class="error">오류: ${data.error}</p>`;
           } else {
@@ -176,6 +247,8 @@ document.addEventListener("DOMContentLoaded", function () {
           }
         })
         .catch((error) => {
+          finishRequest(requestId);
+          if (error.name === "AbortError") return;
           console.error("Error:", error);
           enhanceResult.innerHTML =
             '<p class="error">오류가 발생했습니다. 다시 시도해주세요.</p>';
@@ -0,0 +1,35 @@
+import pytest
+
+@pytest.fixture(scope="session")
+def tiny_model_dir(tmp_path_factory):
+    """무작위 가중치의 작은 Llama 모델과 바이트 수준 BPE 토크나이저 (네트워크 없이 생성)"""
+    import torch
+    from tokenizers import Tokenizer, decoders, models, pre_tokenizers, trainers
+    from tokenizers.processors import TemplateProcessing
+    from transformers import LlamaConfig, LlamaForCausalLM, PreTrainedTokenizerFast
+    
+    path = str(tmp_path_factory.mktemp("tiny_model"))
+    tokenizer = Tokenizer(models.BPE())
+    tokenizer.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    tokenizer.decoder = decoders.ByteLevel()
+    corpus = ["Human: hello world\n\nAssistant: hi there 안녕하세요 반갑습니다", "def foo(x): return x+1",
+              "다음 코드를 최적화해 주세요."] * 50
+    trainer = trainers.BpeTrainer(vocab_size=500, special_tokens=["<s>", "</s>", "<pad>"],
+                                  initial_alphabet=pre_tokenizers.ByteLevel.alphabet())
+    tokenizer.train_from_iterator(corpus, trainer)
+    tokenizer.post_processor = TemplateProcessing(single="<s> $A", special_tokens=[("<s>", 0)])
+    fast = PreTrainedTokenizerFast(tokenizer_object=tokenizer, bos_token="<s>", eos_token="</s>", pad_token="<pad>")
+    fast.save_pretrained(path)
+    
+    torch.manual_seed(0)
+    config = LlamaConfig(vocab_size=len(fast), hidden_size=64, intermediate_size=128, num_hidden_layers=2,
+                         num_attention_heads=4, num_key_value_heads=2, max_position_embeddings=2048,
+                         bos_token_id=0, eos_token_id=1, pad_token_id=2)
+    LlamaForCausalLM(config).save_pretrained(path)
+    return path
+
+@pytest.fixture(scope="session")
+def tiny_agent(tiny_model_dir):
+    """작은 모델을 fp32로 로드한 DeepSeekAgent (스케줄러 없이 직접 생성)"""
+    from app.agent.deepseek_agent import DeepSeekAgent
+    return DeepSeekAgent(tiny_model_dir, "fp32", draft_model_name=None)
\ No newline at end of file
@@ -0,0 +1,556 @@
+import time
+import threading
+import torch
+from app.agent.stopping import StopMatcher, filter_stop_strings, find_stop, get_stop_strings, truncate_at_stop
+
+class CharTokenizer:
+    """토큰 ID 하나가 문자 하나인 테스트용 토크나이저"""
+    
+    eos_token_id = 0
+    
+    def encode(self, text):
+        return [ord(c) for c in text]
+    
+    def decode(self, token_ids, skip_special_tokens=True):
+        return "".join(chr(i) for i in token_ids if i)
+
+# 종료 문자열
+
+def test_get_stop_strings_uses_task_and_extra(monkeypatch):
+    from app.config import Config
+    monkeypatch.setattr(Config, "EXTRA_STOP_STRINGS", ["<END>", "\n\nHuman:"])
+    assert get_stop_strings("summary") == ("\n\nHuman:", "\n\nAssistant:", "<END>")
+    assert get_stop_strings("unknown") == ("\n\nHuman:", "<END>")
+
+def test_find_stop_returns_earliest_position():
+    assert find_stop("a STOP b END", ("END", "STOP")) == 2
+    assert find_stop("nothing here", ("END",)) is None
+    assert find_stop("text", ()) is None
+
+def test_truncate_at_stop_keeps_matching_token_ids():
+    tokenizer = CharTokenizer()
+    token_ids = tokenizer.encode("answer\n\nHuman: next")
+    text, kept = truncate_at_stop(tokenizer, token_ids, ("\n\nHuman:",))
+    assert text == "answer"
+    assert kept == tokenizer.encode("answer")
+
+def test_truncate_at_stop_without_stop_returns_everything():
+    tokenizer = CharTokenizer()
+    token_ids = tokenizer.encode("plain answer")
+    assert truncate_at_stop(tokenizer, token_ids, ("STOP",)) == ("plain answer", token_ids)
+
+def test_stop_matcher_finds_stop_string_split_across_tokens():
+    tokenizer = CharTokenizer()
+    matcher = StopMatcher(tokenizer, ("STOP",))
+    assert not matcher.update(tokenizer.encode("abc S"))
+    assert not matcher.update(tokenizer.encode("T"))
+    assert matcher.update(tokenizer.encode("OP"))
+    assert matcher.reason == "stop_string"
+
+def test_stop_matcher_stops_on_eos():
+    tokenizer = CharTokenizer()
+    matcher = StopMatcher(tokenizer, ("STOP",), eos_token_ids=(tokenizer.eos_token_id,))
+    assert matcher.update([tokenizer.eos_token_id])
+    assert matcher.reason == "eos"
+
+def test_filter_stop_strings_holds_back_possible_prefix():
+    chunks = ["Hello\n", "\nHu", "man: ignored"]
+    assert "".join(filter_stop_strings(chunks, ("\n\nHuman:",))) == "Hello"
+    # 종료 문자열의 접두사였다가 아닌 것으로 밝혀지면 그대로 내보냄
+    assert "".join(filter_stop_strings(["a\n", "\nb"], ("\n\nHuman:",))) == "a\n\nb"
+
+# 컨텍스트 예산
+
+class FakeSummarizer:
+    """글자 하나를 토큰 하나로 세고, 요약이 끝나는 시점을 테스트가 정하는 에이전트"""
+    
+    def __init__(self):
+        self.started, self.release = threading.Event(), threading.Event()
+    
+    def _message_token_ids(self, message):
+        return list(range(len(message["content"])))
+    
+    def summarize(self, text, max_new_tokens=256):
+        self.started.set()
+        self.release.wait(5)
+        return "summary"
+
+def turns(count, length=10):
+    return [{"role": "user" if i % 2 == 0 else "assistant", "content": str(i % 10) * length} for i in range(count)]
+
+def test_context_manager_trims_history_to_low_water():
+    from app.agent.context_manager import ContextManager
+    manager = ContextManager(FakeSummarizer(), token_budget=100, mode="drop")
+    history = turns(12)[:8]
+    manager.enforce(history, 5)
+    # 예산 안이면 그대로 둠
+    assert len(history) == 8
+    
+    history += turns(12)[8:]
+    manager.enforce(history, 5)
+    # 넘치면 예산의 75%까지 가장 오래된 턴부터 제거
+    assert manager.history_tokens(history) + 5 <= manager.low_water == 75
+    assert history == turns(12)[-len(history):]
+    assert manager.stats()["evicted_messages"] == 12 - len(history)
+
+def test_context_manager_applies_summary_in_front():
+    from app.agent.context_manager import ContextManager
+    agent = FakeSummarizer()
+    agent.release.set()
+    manager = ContextManager(agent, token_budget=100, mode="summarize")
+    history = turns(12)
+    manager.enforce(history, 5)
+    ContextManager._jobs.join()
+    manager.apply_pending(history)
+    assert history[0] == {"role": "summary", "content": "summary"}
+    assert manager.stats()["summaries"] == 1
+
+def test_context_manager_discards_summary_finished_after_reset():
+    from app.agent.context_manager import ContextManager
+    agent = FakeSummarizer()
+    manager = ContextManager(agent, token_budget=100, mode="summarize")
+    history = turns(12)
+    manager.enforce(history, 5)
+    assert agent.started.wait(5)
+    
+    # 요약 중에 대화가 초기화되면 늦게 끝난 요약은 새 대화에 들어가면 안 됨
+    manager.reset()
+    history = turns(2)
+    agent.release.set()
+    ContextManager._jobs.join()
+    manager.apply_pending(history)
+    assert history == turns(2)
+    assert manager.stats()["summaries"] == 0
+
+# 세션 풀
+
+def test_session_pool_does_not_archive_pinned_session():
+    from app.agent.session_pool import SessionPool
+    pool = SessionPool(None, max_sessions=1)
+    with pool.use("a") as state:
+        state.history.append({"role": "user", "content": "hello", "token_ids": [1, 2]})
+        # 입장 대기 중 다른 클라이언트가 들어와도 사용 중인 세션은 그대로 유지
+        pool.get("b")
+        assert pool.get("a") is state
+        assert pool.stats()["pinned_sessions"] == 1
+    
+    # 고정이 풀리면 상한에 따라 보관되고, 다시 접근하면 기록이 복원됨
+    pool.get("b")
+    assert pool.stats()["archived_sessions"] == 1
+    restored = pool.get("a")
+    assert restored is not state
+    assert [m["content"] for m in restored.history] == ["hello"]
+    assert pool.stats()["pinned_sessions"] == 0
+
+# 모델 레지스트리
+
+def test_model_registry_evicts_least_recently_used_over_budget():
+    from app.utils.model_registry import ModelRegistry
+    # Linear(10, 10)은 fp32 파라미터 110개 = 440바이트이므로 예산 1000바이트에는 두 개까지 상주
+    registry = ModelRegistry(max_bytes=1000, idle_ttl=0)
+    unloaded = []
+    for name in ["a", "b", "c", "d"]:
+        registry.register(name, lambda: torch.nn.Linear(10, 10), unloader=lambda model, name=name: unloaded.append(name))
+    registry.register("pinned", lambda: torch.nn.Linear(10, 10), evictable=False)
+    
+    registry.get("a")
+    registry.get("b")
+    registry.get("a")
+    registry.get("c")
+    assert unloaded == ["b"]
+    
+    # use() 블록 안의 모델은 더 오래되었어도 내리지 않음
+    with registry.use("a"):
+        registry.get("d")
+        assert unloaded == ["b", "c"]
+    
+    # 고정 모델도 예산에 포함되어, use() 블록이 끝날 때 사용 시각이 갱신된 a 대신 d가 자리를 내줌
+    registry.get("pinned")
+    models = registry.stats()["models"]
+    assert [name for name, model in models.items() if model["loaded"]] == ["a", "pinned"]
+    assert unloaded == ["b", "c", "d"]
+    assert registry.stats()["evictions"] == 3
+    
+    # 내린 모델은 다음 사용 때 다시 로드
+    registry.get("b")
+    assert registry.stats()["models"]["b"]["load_count"] == 2
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+
+def test_model_registry_unloads_idle_models():
+    from app.utils.model_registry import ModelRegistry
+    registry = ModelRegistry(max_bytes=0, idle_ttl=0.1)
+    registry.register("idle", lambda: torch.nn.Linear(10, 10))
+    registry.register("busy", lambda: torch.nn.Linear(10, 10))
+    registry.register("pinned", lambda: torch.nn.Linear(10, 10), evictable=False)
+    registry.get("idle")
+    registry.get("pinned")
+    with registry.use("busy"):
+        wait_until(lambda: registry.stats()["expirations"] == 1)
+        models = registry.stats()["models"]
+        assert not models["idle"]["loaded"]
+        assert models["busy"]["loaded"] and models["pinned"]["loaded"]
+
+# 디스크 캐시 계층
+
+def test_disk_lru_shards_and_evicts_oldest_files(tmp_path):
+    import os
+    from app.utils.disk_cache import DiskLRU
+    disk = DiskLRU(str(tmp_path), ".bin", max_bytes=1000)
+    keys = [f"{i:02d}" * 32 for i in range(3)]
+    for age, key in enumerate(keys):
+        disk.write(key, b"x" * 300)
+        # 파일 시스템의 수정 시각 해상도와 무관하게 순서를 정함
+        os.utime(disk.path(key), (1000 + age, 1000 + age))
+    assert disk.path(keys[0]) == os.path.join(str(tmp_path), "00", f"{keys[0]}.bin")
+    assert disk.bytes == 900 and disk.evictions == 0
+    assert not [name for _, _, names in os.walk(str(tmp_path)) for name in names if name.endswith(".tmp")]
+    
+    # 읽은 파일은 가장 최근 것으로 표시되어 정리 대상에서 빠짐
+    assert disk.read(keys[0]) == b"x" * 300
+    assert disk.read("ff" * 32) is None
+    
+    # 한도를 넘으면 오래된 파일부터 한도의 90%까지 지움
+    disk.write("09" * 32, b"y" * 300)
+    assert disk.evictions == 1 and disk.bytes == 900
+    assert disk.contains(keys[0]) and not disk.contains(keys[1]) and disk.contains(keys[2])
+    
+    # 같은 키를 다시 쓰면 이전 크기를 빼고 계산
+    disk.write(keys[0], b"z" * 100)
+    assert disk.bytes == 700
+    assert DiskLRU(str(tmp_path), ".bin", max_bytes=1000).bytes == 700
+
+def test_response_cache_restores_from_disk_tier(tmp_path):
+    from app.agent.response_cache import ResponseCache
+    cache = ResponseCache(str(tmp_path), max_memory_entries=10, max_disk_bytes=1 << 20)
+    key = cache.make_key("m", "안녕하세요", max_new_tokens=8)
+    cache.put(key, "응답")
+    
+    reopened = ResponseCache(str(tmp_path), max_memory_entries=10, max_disk_bytes=1 << 20)
+    assert reopened.get(key) == "응답"
+    assert reopened.get("0" * 64) is None
+    stats = reopened.stats()
+    assert stats["disk_hits"] == 1 and stats["misses"] == 1 and stats["disk_bytes"] > 0
+
+# 정밀도 모드
+
+def test_precision_argument_is_parsed(monkeypatch):
+    import pytest
+    from app.main import parse_arguments
+    monkeypatch.setattr("sys.argv", ["app", "--cli", "--precision", "bf16"])
+    assert parse_arguments().precision == "bf16"
+    monkeypatch.setattr("sys.argv", ["app", "--cli"])
+    assert parse_arguments().precision is None
+    monkeypatch.setattr("sys.argv", ["app", "--precision", "fp8"])
+    with pytest.raises(SystemExit):
+        parse_arguments()
+
+def test_resolve_precision_depends_on_device():
+    import pytest
+    from types import SimpleNamespace
+    from app.agent.deepseek_agent import DeepSeekAgent
+    
+    def resolve(device, precision):
+        agent = SimpleNamespace(device=device, PRECISION_DTYPES=DeepSeekAgent.PRECISION_DTYPES)
+        return DeepSeekAgent._resolve_precision(agent, precision)
+    
+    assert resolve("cuda", "auto") == "fp16"
+    assert resolve("cpu", "AUTO") == "fp32"
+    # int8 동적 양자화는 CPU 전용
+    assert resolve("cuda", "int8") == "fp16"
+    assert resolve("cpu", "int8") == "int8"
+    with pytest.raises(ValueError):
+        resolve("cpu", "fp8")
+
+def test_precision_selects_model_dtype(tiny_model_dir):
+    from app.agent.deepseek_agent import DeepSeekAgent
+    from app.utils.model_registry import ModelRegistry
+    registry = ModelRegistry(max_bytes=0, idle_ttl=0)
+    
+    agent = DeepSeekAgent(tiny_model_dir, "bf16", draft_model_name=None, registry=registry)
+    assert agent.precision == "bf16"
+    assert agent.model.dtype == torch.bfloat16
+    
+    agent = DeepSeekAgent(tiny_model_dir, "int8", draft_model_name=None, registry=registry)
+    assert agent.precision == "int8"
+    assert isinstance(agent.model.lm_head, torch.ao.nn.quantized.dynamic.Linear)
+    # 양자화 모델에는 LoRA 어댑터를 붙이지 않음
+    assert agent.adapters is None
+    assert agent.generate_once("hello", max_new_tokens=4, temperature=0)
+
+# 프리픽스 캐시
+
+def fake_layers(token_ids, num_layers=2):
+    """토큰 ID를 값으로 담은 레이어별 (key, value) 텐서 (key: [1, heads, seq, dim])"""
+    values = torch.tensor(token_ids, dtype=torch.float32).view(1, 1, -1, 1).expand(1, 2, -1, 4).contiguous()
+    return [(values + layer, -values - layer) for layer in range(num_layers)]
+
+def cached_token_ids(match):
+    from app.agent.scheduler import cache_layers
+    key, value = cache_layers(match.cache)[0]
+    assert torch.equal(value, -key)
+    return key[0, 0, :, 0].int().tolist()
+
+def test_prefix_cache_empty_match_with_zero_min_tokens(monkeypatch):
+    from app.agent.prefix_cache import PrefixCache
+    from app.config import Config
+    monkeypatch.setattr(Config, "PREFIX_CACHE_MIN_TOKENS", 0)
+    cache = PrefixCache(max_bytes=1 << 20)
+    match = cache.match([1, 2, 3])
+    assert (match.length, match.cache, match.node) == (0, None, None)
+    cache.release(match)
+
+def test_prefix_cache_reuses_longest_prefix_and_splits_nodes():
+    from app.agent.prefix_cache import PrefixCache
+    cache = PrefixCache(max_bytes=1 << 20, min_match_tokens=2)
+    first = list(range(10, 20))
+    cache.insert(first, fake_layers(first))
+    
+    # 마지막 토큰은 새로 프리필해야 하므로 일치에서 제외
+    match = cache.match(first)
+    assert match.length == 9
+    assert cached_token_ids(match) == first[:9]
+    cache.release(match)
+    
+    # 조회 때 마지막 토큰 앞에서, 중간에서 갈라지는 프롬프트를 넣을 때 그 지점에서 노드가 분할됨
+    assert cache.stats()["nodes"] == 2
+    second = first[:5] + [50, 51, 52]
+    cache.insert(second, fake_layers(second))
+    assert cache.stats()["nodes"] == 4
+    for prompt, length in [(first + [99], 10), (second + [99], 8), (first[:4] + [77, 78], 4)]:
+        match = cache.match(prompt)
+        assert match.length == length
+        assert cached_token_ids(match) == prompt[:length]
+        cache.release(match)
+    
+    # 최소 일치 길이보다 짧으면 재사용하지 않음
+    assert cache.match([10, 77, 78]).cache is None
+
+def test_prefix_cache_keeps_referenced_nodes_when_evicting():
+    from app.agent.prefix_cache import PrefixCache
+    cache = PrefixCache(max_bytes=1 << 20, min_match_tokens=1)
+    prompt = [1, 2, 3, 4]
+    cache.insert(prompt, fake_layers(prompt))
+    match = cache.match(prompt)
+    cache.clear()
+    assert cache.stats()["bytes"] > 0
+    cache.release(match)
+    cache.clear()
+    assert cache.stats()["bytes"] == 0
+
+# LoRA 어댑터
+
+def tiny_model():
+    from transformers import LlamaConfig, LlamaForCausalLM
+    config = LlamaConfig(vocab_size=32, hidden_size=16, intermediate_size=32, num_hidden_layers=1,
+                         num_attention_heads=2, num_key_value_heads=2)
+    return LlamaForCausalLM(config).eval()
+
+def test_adapter_selection_does_not_block_other_forwards():
+    import threading
+    from app.agent.adapters import AdapterManager
+    model = tiny_model()
+    manager = AdapterManager(model, adapters={"a": "/nonexistent"})
+    entered, finish = threading.Event(), threading.Event()
+    
+    def long_generation():
+        with manager.select(["a"]):
+            entered.set()
+            finish.wait(5)
+    
+    def forward():
+        with torch.no_grad(), manager.select([None]):
+            model(torch.tensor([[1, 2, 3]]))
+    
+    holder = threading.Thread(target=long_generation)
+    holder.start()
+    entered.wait(5)
+    # 다른 요청이 어댑터를 선택한 채 생성 중이어도 스케줄러 단계의 forward는 바로 실행됨
+    worker = threading.Thread(target=forward)
+    worker.start()
+    worker.join(5)
+    assert not worker.is_alive()
+    finish.set()
+    holder.join()
+
+def test_adapter_forward_releases_lock_on_error():
+    from app.agent.adapters import AdapterManager
+    model = tiny_model()
+    manager = AdapterManager(model, adapters={})
+    try:
+        model(torch.tensor([[100]]))
+    except (IndexError, RuntimeError):
+        pass
+    assert manager._model_lock._readers == 0
+
+def test_model_lock_waits_for_running_forward():
+    import threading
+    from app.agent.adapters import _ModelLock
+    lock = _ModelLock()
+    lock.acquire_shared()
+    acquired = threading.Event()
+    
+    def inject():
+        with lock.exclusive():
+            acquired.set()
+    
+    thread = threading.Thread(target=inject)
+    thread.start()
+    assert not acquired.wait(0.1)
+    lock.release_shared()
+    assert acquired.wait(5)
+    thread.join()
+
+# 대화 KV 캐시 재사용
+
+def test_conversation_reuses_kv_cache_without_changing_output(tiny_agent):
+    from app.agent.conversation import ConversationState
+    session = ConversationState(tiny_agent)
+    tiny_agent.generate_response("hello", 8, 0, session=session, stop_strings=())
+    assert session.kv_cache is not None
+    
+    # 이전 턴의 캐시는 다음 턴 프롬프트의 접두사와 정확히 일치해야 재사용됨
+    prompt_ids = tiny_agent.build_prompt_ids("def foo", session)
+    cached = len(session.kv_token_ids)
+    assert cached > 0 and prompt_ids[:cached] == session.kv_token_ids
+    reused = tiny_agent.generate_response("def foo", 8, 0, session=session, stop_strings=())
+    
+    # 캐시 없이 처음부터 프리필한 결과와 같아야 함
+    fresh = ConversationState(tiny_agent)
+    tiny_agent.generate_response("hello", 8, 0, session=fresh, stop_strings=())
+    fresh.reset_kv_cache()
+    assert tiny_agent.generate_response("def foo", 8, 0, session=fresh, stop_strings=()) == reused
+    assert [m["token_ids"] for m in fresh.history] == [m["token_ids"] for m in session.history]
+
+# 스트리밍 응답
+
+def test_stream_response_matches_generate_response(tiny_agent):
+    from app.agent.conversation import ConversationState
+    for query in ["hello", "def foo(x):"]:
+        expected = tiny_agent.generate_response(query, 16, 0, session=ConversationState(tiny_agent), stop_strings=())
+        chunks = list(tiny_agent.stream_response(query, 16, 0, session=ConversationState(tiny_agent), stop_strings=()))
+        assert len(chunks) > 1 and "".join(chunks) == expected
+
+def test_stream_response_holds_back_stop_strings(tiny_agent):
+    from app.agent.conversation import ConversationState
+    full = tiny_agent.generate_response("hello", 16, 0, session=ConversationState(tiny_agent), stop_strings=())
+    # 응답 중간의 두 글자를 종료 문자열로 사용
+    stop = next(full[i:i + 2] for i in range(2, len(full) - 1) if full[i:i + 2].isalnum())
+    expected = tiny_agent.generate_response("hello", 16, 0, session=ConversationState(tiny_agent), stop_strings=(stop,))
+    assert expected == full[:full.index(stop)].strip()
+    
+    session = ConversationState(tiny_agent)
+    streamed = "".join(tiny_agent.stream_response("hello", 16, 0, session=session, stop_strings=(stop,)))
+    assert streamed == expected and stop not in streamed
+    assert session.history[-1]["content"] == expected
+
+# 메시지별 토큰 ID
+
+def test_history_token_ids_survive_compact_round_trip(tiny_agent):
+    from app.agent.conversation import ConversationState
+    session = ConversationState(tiny_agent, "a")
+    tiny_agent.generate_response("hello", 8, 0, session=session, stop_strings=())
+    assert all(message["token_ids"] for message in session.history)
+    
+    # 보관했다 복원해도 생성된 토큰 ID를 그대로 쓰므로 프롬프트가 바뀌지 않음
+    restored = ConversationState.from_compact(tiny_agent, "a", session.to_compact())
+    assert [m["token_ids"] for m in restored.history] == [m["token_ids"] for m in session.history]
+    assert tiny_agent.build_prompt_ids("def foo", restored) == tiny_agent.build_prompt_ids("def foo", session)
+    
+    # 내용이 수정된 메시지만 다시 토큰화됨
+    restored.history[0]["content"] = "changed"
+    assert tiny_agent._message_token_ids(restored.history[0]) == tiny_agent._encode("Human: changed\n\n")
+
+# 연속 배칭 스케줄러
+
+def reference_generate(agent, prompt_ids, max_new_tokens):
+    with torch.no_grad():
+        output = agent.model.generate(torch.tensor([prompt_ids]), max_new_tokens=max_new_tokens, do_sample=False,
+                                      pad_token_id=agent.tokenizer.pad_token_id)
+    return output[0, len(prompt_ids):].tolist()
+
+def test_scheduler_matches_plain_generate(tiny_agent):
+    from app.agent.prefix_cache import PrefixCache
+    from app.agent.scheduler import GenerationScheduler
+    texts = ["hello", "def foo(x):\n  return", "안녕하세요 코드를 최적화해", "Human: hi"]
+    prompts = [tiny_agent.tokenizer.encode(text) for text in texts]
+    expected = [reference_generate(tiny_agent, ids, 12) for ids in prompts]
+    
+    scheduler = GenerationScheduler(tiny_agent.model, tiny_agent.tokenizer, "cpu", max_batch_size=4,
+                                    prefix_cache=PrefixCache(min_match_tokens=1)).start()
+    try:
+        # 길이가 다른 요청을 한 배치로 디코딩하고, 두 번째는 프리픽스 캐시를 거쳐도 결과가 같아야 함
+        for _ in range(2):
+            requests = [scheduler.submit(ids, 12, temperature=0) for ids in prompts]
+            for request, reference in zip(requests, expected):
+                output = request.wait(60).output_ids
+                assert output == reference[:len(output)]
+                assert len(output) == 12 or output[-1] in scheduler.eos_token_ids
+        assert scheduler.prefix_cache.stats()["hits"] > 0
+    finally:
+        scheduler.stop()
+
+def test_generate_batch_matches_per_prompt_greedy(tiny_agent):
+    prompts = ["hello", "def foo(x):\n  return x+1", "안녕하세요", "다음 코드를 최적화해 주세요. def foo(x): return x"]
+    expected = [tiny_agent.generate_once(prompt, 12, 0, stop_strings=()) for prompt in prompts]
+    # 한 배치로 묶든 길이순 마이크로 배치로 나누든 왼쪽 패딩이 결과를 바꾸면 안 됨
+    for batch_size in [4, 2]:
+        assert tiny_agent.generate_batch(prompts, 12, 0, stop_strings=(), batch_size=batch_size) == expected
+
+def test_agent_turn_through_scheduler_matches_direct_path(tiny_agent):
+    from app.agent.conversation import ConversationState
+    from app.agent.scheduler import GenerationScheduler
+    direct = tiny_agent.generate_response("hello", 10, 0, session=ConversationState(tiny_agent), stop_strings=())
+    
+    scheduler = GenerationScheduler(tiny_agent.model, tiny_agent.tokenizer, "cpu", max_batch_size=4).start()
+    tiny_agent.attach_scheduler(scheduler)
+    try:
+        session = ConversationState(tiny_agent)
+        assert tiny_agent.generate_response("hello", 10, 0, session=session, stop_strings=()) == direct
+        assert scheduler.stats()["completed_requests"] == 1
+    finally:
+        tiny_agent.attach_scheduler(None)
+        scheduler.stop()
+
+# 추측 디코딩
+
+def test_speculative_matches_plain_greedy(tiny_agent, monkeypatch):
+    from transformers import LlamaConfig, LlamaForCausalLM
+    from app.agent.conversation import ConversationState
+    from app.agent.speculative import SpeculativeDecoder
+    torch.manual_seed(1)
+    config = LlamaConfig(vocab_size=tiny_agent.model.config.vocab_size, hidden_size=32, intermediate_size=64,
+                         num_hidden_layers=1, num_attention_heads=2, num_key_value_heads=1,
+                         bos_token_id=0, eos_token_id=1, pad_token_id=2)
+    random_draft = LlamaForCausalLM(config).eval()
+    prompts = [tiny_agent.tokenizer.encode(text) for text in ["hello", "def foo(x):\n  return"]]
+    
+    # 대상 모델 자신을 드래프트로 쓰면 모두 수락되고, 무작위 드래프트는 대부분 거절되지만 결과는 같아야 함
+    for draft_model in [tiny_agent.model, random_draft]:
+        decoder = SpeculativeDecoder(tiny_agent.model, draft_model, num_draft_tokens=3)
+        for ids in prompts:
+            reference = reference_generate(tiny_agent, ids, 16)
+            output = decoder.generate(ids, 16, temperature=0, eos_token_id=1).sequences[0, len(ids):].tolist()
+            assert output == reference[:len(output)]
+            assert len(output) == 16 or output[-1] == 1
+    assert decoder.stats()["acceptance_rate"] < 1.0
+    
+    direct = tiny_agent.generate_response("hello", 10, 0, session=ConversationState(tiny_agent), stop_strings=())
+    monkeypatch.setattr(tiny_agent, "speculative", SpeculativeDecoder(tiny_agent.model, random_draft, 3))
+    session = ConversationState(tiny_agent)
+    assert tiny_agent.generate_response("hello", 10, 0, session=session, speculative=True, stop_strings=()) == direct
+    assert tiny_agent.speculative.stats()["requests"] == 1
+
+def test_seeded_generation_does_not_touch_global_rng(tiny_agent):
+    state = torch.random.get_rng_state()
+    first = tiny_agent.generate_once("hello", max_new_tokens=12, temperature=1.0, seed=7, stop_strings=())
+    assert torch.equal(torch.random.get_rng_state(), state)
+    
+    # 전역 난수 상태가 바뀌어도 같은 시드는 같은 결과
+    torch.rand(10)
+    assert tiny_agent.generate_once("hello", max_new_tokens=12, temperature=1.0, seed=7, stop_strings=()) == first
+    assert tiny_agent.generate_once("hello", max_new_tokens=12, temperature=1.0, seed=8, stop_strings=()) != first
\ No newline at end of file
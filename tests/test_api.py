@@ -0,0 +1,418 @@
+import os
+import sys
+import time
+import threading
+import subprocess
+import pytest
+from app.api.admission import AdmissionController, AdmissionRejected
+from app.api.routes import create_app
+from app.config import Config
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 라우트 모듈
+
+def test_routes_import_does_not_load_model_libraries():
+    # 모델은 백그라운드에서 로드하므로 앱을 만들 때 torch/transformers를 가져오면 안 됨
+    code = "import sys, app.api.routes; print('torch' in sys.modules, 'transformers' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert result.stdout.split()[-2:] == ["False", "False"]
+
+# 입장 제어
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+def test_admission_serves_clients_round_robin():
+    controller = AdmissionController(max_concurrent=1, max_queue=10, max_per_client=5, token_budget=100)
+    blocker = controller.acquire("z", 10)
+    order = []
+    
+    def job(client, index):
+        with controller.admit(client, 10):
+            order.append(f"{client}{index}")
+    
+    # A가 먼저 요청 세 개를 넣어도 B의 요청이 사이사이 처리되어야 함
+    threads = []
+    for client, index in [("A", 0), ("A", 1), ("A", 2), ("B", 0), ("B", 1)]:
+        threads.append(threading.Thread(target=job, args=(client, index)))
+        threads[-1].start()
+        wait_for(lambda: controller.stats()["queue_depth"] == len(threads))
+    controller.release(blocker)
+    for thread in threads:
+        thread.join()
+    assert order == ["A0", "B0", "A1", "B1", "A2"]
+
+def test_admission_rejects_over_limits():
+    controller = AdmissionController(max_concurrent=1, max_queue=1, max_per_client=1, token_budget=100)
+    with pytest.raises(AdmissionRejected) as e:
+        controller.acquire("a", 1000)
+    assert (e.value.reason, e.value.status_code) == ("too_large", 413)
+    
+    ticket = controller.acquire("a", 10)
+    with pytest.raises(AdmissionRejected) as e:
+        controller.acquire("a", 10)
+    assert e.value.reason == "client_limit"
+    controller.release(ticket)
+
+# 생성 요청 검증
+
+class FakeTokenizer:
+    def encode(self, text):
+        return list(range(len(text.split())))
+
+class FakeAgent:
+    """모델 없이 라우트를 확인하기 위한 에이전트"""
+    
+    model_name = "fake"
+    scheduler = None
+    speculative = None
+    prefix_cache = None
+    adapters = None
+    
+    def __init__(self):
+        self.tokenizer = FakeTokenizer()
+        self.calls = []
+        self.once_calls = []
+        self.stop_strings = []
+    
+    def generate_response(self, query, max_new_tokens=None, temperature=0.7, session=None, **kwargs):
+        self.calls.append(max_new_tokens)
+        self.stop_strings.append(kwargs.get("stop_strings"))
+        return "ok"
+    
+    def generate_once(self, prompt, max_new_tokens=None, temperature=0.7, seed=None, *args):
+        self.once_calls.append((temperature, seed))
+        return "once"
+
+class SlowAgent(FakeAgent):
+    """취소되거나 기한이 지날 때까지 생성을 끝내지 않는 에이전트"""
+    
+    def __init__(self):
+        super().__init__()
+        self.started = threading.Event()
+    
+    def generate_response(self, query, max_new_tokens=None, temperature=0.7, session=None, **kwargs):
+        cancel_token = kwargs["cancel_token"]
+        self.started.set()
+        wait_for(lambda: cancel_token.stopped)
+        cancel_token.raise_if_stopped("부분 응답")
+
+def make_client(monkeypatch, agent=None, **config):
+    settings = {"SCHEDULER_ENABLED": False, "MODEL_WARMUP_TOKENS": 0, "RESPONSE_CACHE_ENABLED": False,
+                "MAX_NEW_TOKENS": 64, "ADMIN_TOKEN": "", "TRACING_ENABLED": False, **config}
+    for name, value in settings.items():
+        monkeypatch.setattr(Config, name, value)
+    agent = agent or FakeAgent()
+    monkeypatch.setattr("app.agent.deepseek_agent.DeepSeekAgent", lambda *args, **kwargs: agent)
+    app = create_app()
+    client = app.test_client()
+    wait_for(lambda: client.get("/readyz").status_code == 200)
+    client.agent = agent
+    return client
+
+@pytest.fixture
+def client(monkeypatch):
+    return make_client(monkeypatch)
+
+@pytest.mark.parametrize("value", ["abc", [], {}, 0, -5, True, 1.5])
+def test_chat_rejects_invalid_max_new_tokens(client, value):
+    response = client.post("/api/chat", json={"query": "hello", "max_new_tokens": value})
+    assert response.status_code == 400
+    assert client.agent.calls == []
+
+def test_chat_clamps_max_new_tokens(client):
+    assert client.post("/api/chat", json={"query": "hello", "max_length": "16"}).status_code == 200
+    assert client.post("/api/chat", json={"query": "hello", "max_new_tokens": 10 ** 9}).status_code == 200
+    assert client.post("/api/chat", json={"query": "hello"}).status_code == 200
+    assert client.agent.calls == [16, 64, 64]
+
+def test_chat_rejects_non_object_body(client):
+    assert client.post("/api/chat", json=["hello"]).status_code == 400
+
+@pytest.mark.parametrize("field, value", [("temperature", "hot"), ("temperature", -1), ("temperature", [0]),
+                                          ("temperature", "nan"), ("seed", "x"), ("seed", 1.5), ("seed", -1),
+                                          ("seed", True)])
+def test_generation_rejects_invalid_sampling_options(client, field, value):
+    for path, body in [("/api/chat", {"query": "hello"}), ("/api/enhance", {"code": "x = 1"})]:
+        response = client.post(path, json={**body, field: value})
+        assert response.status_code == 400
+    assert client.agent.calls == [] and client.agent.once_calls == []
+
+def test_generation_accepts_single_stop_string(client):
+    from app.agent.stopping import get_stop_strings
+    assert client.post("/api/chat", json={"query": "hello", "stop": "END"}).status_code == 200
+    assert client.post("/api/enhance", json={"code": "x = 1", "stop": ["A", "BC"]}).status_code == 200
+    # 문자열 하나는 글자 단위로 나누지 않고 종료 문자열 하나로 처리
+    assert client.agent.stop_strings == [get_stop_strings("chat") + ("END",), get_stop_strings("optimize") + ("A", "BC")]
+
+@pytest.mark.parametrize("value", [5, "", [""], ["a", 1], {"a": "b"}, [["a"]]])
+def test_generation_rejects_invalid_stop(client, value):
+    for path, body in [("/api/chat", {"query": "hello"}), ("/api/enhance", {"code": "x = 1"})]:
+        assert client.post(path, json={**body, "stop": value}).status_code == 400
+    assert client.agent.calls == []
+
+# 취소와 처리 기한
+
+@pytest.mark.parametrize("timeout", [[1], {}, "soon", True])
+def test_invalid_timeout_falls_back_to_default(client, timeout):
+    assert client.post("/api/chat", json={"query": "hello", "timeout": timeout}).status_code == 200
+
+def test_request_past_deadline_returns_partial_response(monkeypatch):
+    client = make_client(monkeypatch, SlowAgent(), REQUEST_TIMEOUT=30)
+    response = client.post("/api/chat", json={"query": "hello", "timeout": "0.05"})
+    assert response.status_code == 504
+    assert response.get_json()["reason"] == "expired"
+    assert response.get_json()["partial_response"] == "부분 응답"
+
+def test_only_owner_or_admin_can_cancel(monkeypatch):
+    client = make_client(monkeypatch, SlowAgent(), REQUEST_TIMEOUT=30)
+    owner = client.application.test_client()
+    owner.environ_base["REMOTE_ADDR"] = "10.0.0.1"
+    other = client.application.test_client()
+    other.environ_base["REMOTE_ADDR"] = "10.0.0.2"
+    
+    def cancel(requester, request_id):
+        return requester.post("/api/cancel", json={"request_id": request_id}).get_json()["cancelled"]
+    
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(
+        response=owner.post("/api/chat", json={"query": "hello", "request_id": "r1"})
+    ))
+    thread.start()
+    assert client.agent.started.wait(5)
+    # 다른 클라이언트는 요청 ID를 알아도 취소할 수 없음
+    assert cancel(other, "r1") is False
+    assert cancel(owner, "missing") is False
+    assert cancel(owner, "r1") is True
+    thread.join(5)
+    assert result["response"].status_code == 499
+    assert result["response"].get_json()["reason"] == "cancelled"
+    
+    # 관리자(로컬 접속)는 다른 클라이언트의 요청도 취소할 수 있음
+    client.agent.started.clear()
+    thread = threading.Thread(target=lambda: result.update(
+        response=owner.post("/api/chat", json={"query": "hello"}, headers={"X-Request-Id": "r2"})
+    ))
+    thread.start()
+    assert client.agent.started.wait(5)
+    assert cancel(client, "r2") is True
+    thread.join(5)
+    assert result["response"].status_code == 499
+
+def test_deterministic_enhance_is_stateless_and_cached(monkeypatch, tmp_path):
+    client = make_client(monkeypatch, RESPONSE_CACHE_ENABLED=True, DATA_DIR=str(tmp_path))
+    body = {"code": "x = 1", "temperature": "0", "session_id": "s"}
+    # JSON 문자열로 온 온도도 숫자로 바꿔 결정적 요청으로 처리
+    assert client.post("/api/enhance", json=body).get_json() == {"response": "once", "cached": False}
+    # 다른 세션에서 보낸 같은 요청은 캐시에서 응답하고, 어느 세션의 기록도 사용하지 않음
+    assert client.post("/api/enhance", json={**body, "session_id": "t"}).get_json()["cached"] is True
+    assert client.agent.once_calls == [(0.0, None)]
+    assert client.agent.calls == []
+    
+    # 온도가 0보다 크고 시드가 없으면 세션 대화로 처리
+    assert client.post("/api/enhance", json={**body, "temperature": 0.5}).get_json() == {"response": "ok"}
+    assert client.agent.calls == [64]
+
+# 준비 상태
+
+def test_readyz_returns_503_until_agent_is_loaded(monkeypatch):
+    monkeypatch.setattr(Config, "SCHEDULER_ENABLED", False)
+    monkeypatch.setattr(Config, "MODEL_WARMUP_TOKENS", 0)
+    release = threading.Event()
+    agent = FakeAgent()
+    
+    def load_agent(*args, **kwargs):
+        release.wait(5)
+        return agent
+    
+    monkeypatch.setattr("app.agent.deepseek_agent.DeepSeekAgent", load_agent)
+    client = create_app().test_client()
+    wait_for(lambda: client.get("/healthz").get_json()["status"] == "loading_model")
+    
+    # 로딩 중에는 살아 있지만 준비되지 않았고, API 요청은 Retry-After와 함께 503
+    assert client.get("/healthz").status_code == 200
+    assert client.get("/readyz").status_code == 503
+    response = client.post("/api/chat", json={"query": "hello"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "5"
+    
+    release.set()
+    wait_for(lambda: client.get("/readyz").status_code == 200)
+    assert client.get("/readyz").get_json()["progress"] == 1.0
+    assert client.post("/api/chat", json={"query": "hello"}).get_json() == {"response": "ok"}
+
+def test_failed_load_reports_unhealthy(monkeypatch):
+    monkeypatch.setattr(Config, "SCHEDULER_ENABLED", False)
+    
+    def load_agent(*args, **kwargs):
+        raise RuntimeError("no weights")
+    
+    monkeypatch.setattr("app.agent.deepseek_agent.DeepSeekAgent", load_agent)
+    client = create_app().test_client()
+    wait_for(lambda: client.get("/healthz").status_code == 503)
+    response = client.get("/readyz")
+    assert response.status_code == 503
+    assert response.get_json()["error"] == "no weights"
+    assert "Retry-After" not in client.post("/api/chat", json={"query": "hello"}).headers
+
+# 추적과 프로파일링
+
+def test_admin_endpoints_require_local_client_or_token(client, monkeypatch):
+    remote = client.application.test_client()
+    remote.environ_base["REMOTE_ADDR"] = "10.0.0.1"
+    for path in ["/api/admin/traces", "/api/admin/profile"]:
+        assert client.get(path).status_code == 200
+        assert remote.get(path).status_code == 403
+    
+    # ADMIN_TOKEN이 있으면 로컬 접속도 토큰이 필요함
+    monkeypatch.setattr(Config, "ADMIN_TOKEN", "secret")
+    assert client.get("/api/admin/traces").status_code == 403
+    assert remote.get("/api/admin/traces", headers={"X-Admin-Token": "secret"}).status_code == 200
+
+def test_requested_trace_is_exported_as_chrome_trace(client):
+    assert client.post("/api/chat", json={"query": "hello", "request_id": "untraced"}).status_code == 200
+    assert client.post("/api/chat", json={"query": "hello", "request_id": "t1", "trace": True}).status_code == 200
+    
+    summary = client.get("/api/admin/traces?summary=1").get_json()
+    assert [trace["request_id"] for trace in summary["traces"]] == ["t1"]
+    
+    events = client.get("/api/admin/traces?request_id=t1").get_json()["traceEvents"]
+    spans = {event["name"]: event for event in events if event["ph"] == "X"}
+    assert {"chat", "admission"} <= set(spans)
+    assert all(event["args"]["request_id"] == "t1" and event["dur"] >= 0 for event in spans.values())
+    # 요청 구간이 입장 대기 구간을 감쌈
+    assert spans["chat"]["ts"] <= spans["admission"]["ts"]
+    assert any(event["ph"] == "M" and event["name"] == "thread_name" for event in events)
+    assert client.get("/api/admin/traces?request_id=missing").get_json()["traceEvents"] == []
+
+def test_profiler_measures_next_armed_request(client, monkeypatch, tmp_path):
+    from app.utils.tracing import profiler
+    monkeypatch.setattr(profiler, "directory", str(tmp_path))
+    monkeypatch.setattr(profiler, "remaining", 0)
+    assert client.post("/api/admin/profile", json={"requests": "many"}).status_code == 400
+    assert client.post("/api/admin/profile", json={"requests": 1}).get_json()["remaining"] == 1
+    
+    assert client.post("/api/chat", json={"query": "hello", "request_id": "p1"}).status_code == 200
+    stats = client.get("/api/admin/profile").get_json()
+    assert stats["remaining"] == 0
+    assert os.path.basename(stats["files"][-1]).endswith("_p1.json")
+    assert os.path.exists(stats["files"][-1])
+    
+    # 예약된 수만큼만 측정
+    assert client.post("/api/chat", json={"query": "hello"}).status_code == 200
+    assert len(os.listdir(tmp_path)) == 1
+
+# 지표
+
+def test_metrics_registry_renders_prometheus_text():
+    from app.utils.metrics import MetricsRegistry
+    registry = MetricsRegistry()
+    requests = registry.counter("test_requests_total", "요청 수", ("path",))
+    latency = registry.histogram("test_latency_seconds", "지연 시간", buckets=(0.1, 1.0))
+    registry.gauge("test_queue_depth", "대기열 길이", function=lambda: 3)
+    requests.inc(labels=('/a"b\n',))
+    requests.inc(2, ('/a"b\n',))
+    latency.observe(0.05)
+    latency.observe(0.5)
+    latency.observe(5)
+    
+    assert registry.render().split("\n") == [
+        "# HELP test_requests_total 요청 수",
+        "# TYPE test_requests_total counter",
+        'test_requests_total{path="/a\\"b\\n"} 3',
+        "# HELP test_latency_seconds 지연 시간",
+        "# TYPE test_latency_seconds histogram",
+        'test_latency_seconds_bucket{le="0.1"} 1',
+        'test_latency_seconds_bucket{le="1"} 2',
+        'test_latency_seconds_bucket{le="+Inf"} 3',
+        "test_latency_seconds_sum 5.55",
+        "test_latency_seconds_count 3",
+        "# HELP test_queue_depth 대기열 길이",
+        "# TYPE test_queue_depth gauge",
+        "test_queue_depth 3",
+        "",
+    ]
+
+def test_metrics_registry_merges_worker_snapshots(tmp_path):
+    import json
+    from app.utils.metrics import MetricsRegistry
+    registry = MetricsRegistry()
+    registry.counter("test_requests_total", "요청 수").inc(2)
+    registry.gauge("test_queue_depth", "대기열 길이").set(1)
+    registry.directory = str(tmp_path)
+    # 살아 있는 워커(부모 프로세스)와 이미 종료된 워커의 스냅숏
+    snapshot = {"test_requests_total": [[[], 5]], "test_queue_depth": [[[], 4]]}
+    for pid in [os.getppid(), 2 ** 22 + 1]:
+        (tmp_path / f"{pid}.json").write_text(json.dumps(snapshot))
+    
+    lines = registry.render().splitlines()
+    # 누적 값은 종료된 워커까지 모두 더하고, 현재 값은 살아 있는 워커만 pid 레이블로 구분
+    assert "test_requests_total 12" in lines
+    assert [line for line in lines if line.startswith("test_queue_depth")] == [
+        f'test_queue_depth{{pid="{os.getpid()}"}} 1', f'test_queue_depth{{pid="{os.getppid()}"}} 4'
+    ]
+
+def test_metrics_endpoint_exposes_request_histogram(client, monkeypatch):
+    monkeypatch.setattr(Config, "METRICS_ENABLED", True)
+    series = (f'deepseek_request_duration_seconds_count{{endpoint="chat",task="chat",'
+              f'model="{Config.DEFAULT_MODEL}",status="200"}} ')
+    
+    def chat_count():
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.content_type == "text/plain; version=0.0.4; charset=utf-8"
+        text = response.get_data(as_text=True)
+        assert "# TYPE deepseek_request_duration_seconds histogram" in text
+        return next((int(line[len(series):]) for line in text.splitlines() if line.startswith(series)), 0)
+    
+    # 지표는 프로세스 전체에서 누적되므로 요청 전후의 차이를 확인
+    before = chat_count()
+    assert client.post("/api/chat", json={"query": "hello"}).status_code == 200
+    assert chat_count() == before + 1
+    
+    monkeypatch.setattr(Config, "METRICS_ENABLED", False)
+    assert client.get("/metrics").status_code == 404
+
+# 워커 서버
+
+def test_worker_arguments_are_parsed(monkeypatch):
+    from app.main import parse_arguments
+    monkeypatch.setattr("sys.argv", ["app", "--web", "--workers", "4", "--threads", "8", "--http-threads", "2"])
+    args = parse_arguments()
+    assert (args.workers, args.threads, args.http_threads) == (4, 8, 2)
+    monkeypatch.setattr("sys.argv", ["app", "--web"])
+    args = parse_arguments()
+    assert (args.workers, args.threads, args.http_threads) == (None, None, None)
+
+def test_cpu_slices_split_cores_evenly():
+    server = pytest.importorskip("app.api.server")
+    assert server.cpu_slices(3, range(8)) == [[0, 1, 2], [3, 4, 5], [6, 7]]
+    assert server.cpu_slices(1, [5, 3, 4]) == [[3, 4, 5]]
+    # 코어보다 워커가 많으면 코어를 하나씩 돌아가며 공유
+    assert server.cpu_slices(3, [0, 1]) == [[0], [1], [0]]
+
+def test_prefork_server_assigns_free_core_slices(monkeypatch):
+    from types import SimpleNamespace
+    server = pytest.importorskip("app.api.server")
+    monkeypatch.setattr(server, "cpu_slices", lambda workers: [[i] for i in range(workers)])
+    prefork = server.PreforkServer(workers=3, threads=0, http_threads=2, port=8000)
+    assert prefork.cfg.workers == 3
+    assert prefork.cfg.threads == 2
+    assert prefork.cfg.worker_class_str == "gthread"
+    assert prefork.cfg.bind == ["0.0.0.0:8000"]
+    
+    # 워커가 재시작되면 비어 있는 코어 구간을 다시 배정
+    arbiter = SimpleNamespace(WORKERS={})
+    for pid in [1, 2, 3]:
+        worker = SimpleNamespace()
+        prefork._pre_fork(arbiter, worker)
+        arbiter.WORKERS[pid] = worker
+    assert [worker.slot for worker in arbiter.WORKERS.values()] == [0, 1, 2]
+    del arbiter.WORKERS[2]
+    worker = SimpleNamespace()
+    prefork._pre_fork(arbiter, worker)
+    assert worker.slot == 1
\ No newline at end of file
@@ -0,0 +1,287 @@
+import io
+import os
+import json
+import numpy as np
+import pytest
+import soundfile as sf
+from app.audio.decoding import WHISPER_SAMPLE_RATE, AudioDecodeError, decode_audio, load_audio_bytes, resample
+
+def tone(seconds, sample_rate, amplitude=0.5, frequency=440.0):
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    return (amplitude * np.sin(2 * np.pi * frequency * t)).astype(np.float32)
+
+def encode(audio, sample_rate, audio_format="WAV"):
+    buffer = io.BytesIO()
+    sf.write(buffer, audio, sample_rate, format=audio_format)
+    return buffer.getvalue()
+
+# 메모리 디코딩
+
+def test_decode_audio_downmixes_to_mono():
+    left, right = tone(0.5, 22050, 0.4), np.zeros(11025, dtype=np.float32)
+    audio, sample_rate = decode_audio(encode(np.stack([left, right], axis=1), 22050))
+    assert sample_rate == 22050
+    assert audio.dtype == np.float32 and audio.ndim == 1
+    assert np.max(np.abs(audio)) == pytest.approx(0.2, abs=0.01)
+
+@pytest.mark.parametrize("sample_rate", [8000, 22050, 44100, 48000])
+def test_load_audio_bytes_resamples_to_whisper_rate(sample_rate):
+    audio = load_audio_bytes(encode(tone(1.0, sample_rate), sample_rate, "FLAC"))
+    assert len(audio) == WHISPER_SAMPLE_RATE
+    # 리샘플링이 진폭을 바꾸지 않아야 함 (필터 가장자리 제외)
+    assert np.max(np.abs(audio[1000:-1000])) == pytest.approx(0.5, abs=0.02)
+
+def test_resample_keeps_same_rate_unchanged():
+    audio = tone(0.1, WHISPER_SAMPLE_RATE)
+    assert resample(audio, WHISPER_SAMPLE_RATE) is audio
+
+def test_decode_audio_rejects_unknown_data():
+    with pytest.raises(AudioDecodeError):
+        decode_audio(b"not audio")
+
+# 스트리밍 음성 인식 (VAD 구간 분할)
+
+class FakeSTT:
+    """구간마다 번호를 붙인 텍스트를 돌려주고 입력을 기록하는 음성 인식기"""
+    
+    def __init__(self):
+        self.calls = []
+    
+    def transcribe_array(self, audio, language=None, **options):
+        self.calls.append((len(audio), options.get("initial_prompt")))
+        return f"segment{len(self.calls)}"
+
+def speech_clip(sample_rate=WHISPER_SAMPLE_RATE):
+    """무음 0.5초, 말 1초, 무음 0.8초, 말 0.7초, 무음 0.6초"""
+    silence = lambda seconds: np.zeros(int(seconds * sample_rate), dtype=np.float32)
+    return np.concatenate([silence(0.5), tone(1.0, sample_rate, 0.3), silence(0.8), tone(0.7, sample_rate, 0.3),
+                           silence(0.6)])
+
+def stream(session, audio, chunk_samples):
+    events = []
+    for start in range(0, len(audio), chunk_samples):
+        events.extend(session.feed(audio[start:start + chunk_samples]))
+    return events + session.finish()
+
+def test_streaming_splits_segments_at_silence():
+    from app.audio.streaming import StreamingTranscription
+    stt = FakeSTT()
+    session = StreamingTranscription(stt, silence_ms=500, partial_interval=0)
+    events = stream(session, speech_clip(), 1600)
+    
+    assert [event["type"] for event in events] == ["final", "final"]
+    assert session.text == "segment1 segment2"
+    # 구간 경계는 말 시작 직전(프리롤)과 말끝 뒤 약간의 무음을 포함
+    first, second = events
+    assert 0.25 <= first["start"] <= 0.5 and 1.5 <= first["end"] <= 1.8
+    assert 2.05 <= second["start"] <= 2.3 and 3.0 <= second["end"] <= 3.3
+    # 두 번째 구간은 앞 구간의 텍스트를 문맥으로 받음
+    assert stt.calls[0][1] is None and stt.calls[1][1] == "segment1"
+
+def test_streaming_accepts_pcm16_chunks_and_other_rates():
+    from app.audio.streaming import StreamingTranscription
+    audio = speech_clip(8000)
+    pcm = (audio * 32767).astype("<i2").tobytes()
+    stt = FakeSTT()
+    session = StreamingTranscription(stt, sample_rate=8000, silence_ms=500, partial_interval=0)
+    # 프레임 경계와 맞지 않는 크기로 나눠 보내도 같은 결과
+    events = []
+    for start in range(0, len(pcm), 777):
+        events.extend(session.feed(pcm[start:start + 777]))
+    events += session.finish()
+    assert [event["type"] for event in events] == ["final", "final"]
+    # 인식기에는 16 kHz로 리샘플링된 구간이 전달됨
+    assert stt.calls[0][0] > 1.0 * WHISPER_SAMPLE_RATE
+
+def test_streaming_ignores_clicks_and_emits_partials():
+    from app.audio.streaming import StreamingTranscription
+    click = np.zeros(WHISPER_SAMPLE_RATE, dtype=np.float32)
+    click[8000:8480] = 0.5
+    stt = FakeSTT()
+    assert stream(StreamingTranscription(stt, silence_ms=500, partial_interval=0), click, 1600) == []
+    assert stt.calls == []
+    
+    session = StreamingTranscription(FakeSTT(), silence_ms=500, partial_interval=0.5)
+    events = stream(session, speech_clip(), 1600)
+    kinds = [event["type"] for event in events]
+    assert kinds.count("final") == 2 and "partial" in kinds
+    assert kinds.index("partial") < kinds.index("final")
+
+def test_streaming_cuts_long_segments():
+    from app.audio.streaming import StreamingTranscription
+    session = StreamingTranscription(FakeSTT(), silence_ms=500, max_segment_seconds=1.0, partial_interval=0)
+    events = stream(session, tone(2.5, WHISPER_SAMPLE_RATE, 0.3), 1600)
+    assert len(events) == 3
+    assert all(event["end"] - event["start"] <= 1.0 + 1e-6 for event in events)
+
+# TTS 캐시
+
+class FakeSynthesizer:
+    output_sample_rate = 22050
+
+class FakeTTS:
+    """텍스트 길이에 비례하는 파형을 만들고 호출을 기록하는 TTS 모델"""
+    
+    def __init__(self):
+        self.synthesizer = FakeSynthesizer()
+        self.calls = []
+    
+    def tts(self, text, speaker=None):
+        self.calls.append((text, speaker))
+        return list(tone(0.01 * len(text), self.synthesizer.output_sample_rate, 0.3))
+
+@pytest.fixture
+def fake_tts(tmp_path):
+    from app.audio.tts import TextToSpeech
+    from app.audio.tts_cache import TTSCache
+    from app.utils.model_registry import ModelRegistry
+    model = FakeTTS()
+    registry = ModelRegistry(max_bytes=0, idle_ttl=0)
+    registry.register("tts:fake", lambda: model)
+    cache = TTSCache(str(tmp_path / "tts"), max_memory_bytes=1 << 20, max_disk_bytes=1 << 20)
+    tts = TextToSpeech("fake", registry=registry, cache=cache)
+    tts.fake_model = model
+    return tts
+
+def test_tts_cache_key_normalizes_text_only():
+    from app.audio.tts_cache import TTSCache, normalize_text
+    assert normalize_text("  안녕하세요\n 세계 ") == "안녕하세요 세계"
+    # 한글 자모로 분해된 형태(NFD)와 완성형(NFC)은 같은 키
+    assert normalize_text("\u1100\u1161") == "\uac00"
+    
+    cache = TTSCache.__new__(TTSCache)
+    key = cache.make_key("m", "안녕  세계", "s1", "ko")
+    assert key == cache.make_key("m", "안녕 세계", "s1", "ko")
+    assert key != cache.make_key("m", "안녕 세계!", "s1", "ko")
+    assert len({key, cache.make_key("m2", "안녕 세계", "s1", "ko"), cache.make_key("m", "안녕 세계", "s2", "ko"),
+                cache.make_key("m", "안녕 세계", "s1", "en")}) == 4
+
+def test_tts_cache_memory_and_disk_tiers(tmp_path):
+    from app.audio.tts_cache import TTSCache
+    cache = TTSCache(str(tmp_path), max_memory_bytes=1 << 20, max_disk_bytes=1 << 20)
+    wav = tone(0.5, 22050, 0.3)
+    cache.put("a" * 64, wav, 22050)
+    cached, sample_rate = cache.get("a" * 64)
+    assert sample_rate == 22050 and not cached.flags.writeable
+    assert cache.get("b" * 64) is None
+    
+    # 새 프로세스처럼 빈 메모리 계층에서 시작해도 디스크(16비트 FLAC)에서 복원됨
+    reopened = TTSCache(str(tmp_path), max_memory_bytes=1 << 20, max_disk_bytes=1 << 20)
+    restored, _ = reopened.get("a" * 64)
+    assert np.allclose(restored, wav, atol=1e-4)
+    assert reopened.stats()["disk_hits"] == 1
+    assert reopened.get("a" * 64)[0] is restored
+    assert reopened.stats()["memory_hits"] == 1
+
+def test_tts_cache_enforces_byte_budgets(tmp_path):
+    from app.audio.tts_cache import TTSCache
+    wav = tone(0.5, 22050, 0.3)
+    cache = TTSCache(str(tmp_path), max_memory_bytes=int(wav.nbytes * 1.5), max_disk_bytes=10000)
+    keys = [f"{i:02d}" * 32 for i in range(6)]
+    for key in keys:
+        cache.put(key, wav.copy(), 22050)
+    stats = cache.stats()
+    assert stats["memory_entries"] == 1 and stats["memory_bytes"] <= cache.max_memory_bytes
+    assert stats["evictions"] > 0 and stats["disk_bytes"] <= cache.max_disk_bytes
+    # 가장 최근 항목은 남고 가장 오래된 항목은 지워짐
+    assert cache.contains(keys[-1]) and not cache.contains(keys[0])
+
+def test_text_to_speech_synthesizes_each_text_once(fake_tts):
+    first, sample_rate = fake_tts.synthesize("안녕하세요.")
+    second, _ = fake_tts.synthesize(" 안녕하세요. ")
+    assert sample_rate == 22050 and np.array_equal(first, second)
+    fake_tts.synthesize("안녕하세요.", speaker="other")
+    assert fake_tts.fake_model.calls == [("안녕하세요.", None), ("안녕하세요.", "other")]
+
+def test_tts_warmup_fills_cache_per_sentence(fake_tts):
+    assert fake_tts.warmup(["첫 문장입니다. 두 번째 문장입니다.", "첫 문장입니다."]) == 2
+    assert fake_tts.warmup(["첫 문장입니다. 두 번째 문장입니다."]) == 0
+    # 미리 합성한 문장은 스트리밍에서도 다시 합성하지 않음
+    chunks = list(fake_tts.stream("첫 문장입니다. 두 번째 문장입니다. 새 문장입니다."))
+    assert len(chunks) == 3
+    assert [text for text, _ in fake_tts.fake_model.calls] == ["첫 문장입니다.", "두 번째 문장입니다.", "새 문장입니다."]
+
+def test_tts_outputs_share_one_normalization(fake_tts, tmp_path):
+    text = "첫 문장입니다. 두 번째 문장입니다."
+    wav, _ = fake_tts.synthesize("첫 문장입니다.")
+    assert np.isclose(np.max(np.abs(wav)), 1.0)
+    
+    # 스트리밍, 바이트, 파일 출력이 문장별로 같은 샘플을 냄
+    streamed = b"".join(fake_tts.stream(text))
+    assert streamed == b"".join(fake_tts.synthesize_to_bytes(sentence, audio_format="pcm")
+                                for sentence in ["첫 문장입니다.", "두 번째 문장입니다."])
+    path = fake_tts.synthesize_to_file("첫 문장입니다.", str(tmp_path / "out.wav"))
+    with open(path, "rb") as f:
+        assert f.read() == fake_tts.synthesize_to_bytes("첫 문장입니다.")
+    written, sample_rate = sf.read(path, dtype="float32")
+    assert sample_rate == 22050 and np.allclose(written, wav, atol=1e-4)
+    assert len(fake_tts.fake_model.calls) == 2
+
+# 일괄 변환 스크립트
+
+@pytest.fixture
+def transcribe_batch(monkeypatch):
+    """scripts/transcribe_batch.py를 Whisper 대신 가짜 변환기로 실행하는 함수"""
+    import importlib.util
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts", "transcribe_batch.py")
+    spec = importlib.util.spec_from_file_location("transcribe_batch", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    calls = []
+    failing = set()
+    
+    class FakeTranscriber:
+        def __init__(self, *args):
+            pass
+        
+        def __enter__(self):
+            return self
+        
+        def __exit__(self, *exc):
+            return False
+        
+        def transcribe(self, audio_path):
+            calls.append(os.path.basename(audio_path))
+            if os.path.basename(audio_path) in failing:
+                raise RuntimeError("decode failed")
+            return {"text": os.path.basename(audio_path), "duration": 1.0, "segments": []}
+    
+    monkeypatch.setattr(module, "LongAudioTranscriber", FakeTranscriber)
+    
+    def run(*args):
+        calls.clear()
+        monkeypatch.setattr("sys.argv", ["transcribe_batch.py", *args])
+        try:
+            module.main()
+        except SystemExit as e:
+            return e.code, sorted(calls)
+        return 0, sorted(calls)
+    
+    run.failing = failing
+    return run
+
+def test_transcribe_batch_resumes_unfinished_files(transcribe_batch, tmp_path):
+    input_dir, output_dir = tmp_path / "in", tmp_path / "out"
+    (input_dir / "sub").mkdir(parents=True)
+    for name in ["a.wav", "b.wav", "sub/c.wav"]:
+        (input_dir / name).write_bytes(encode(tone(0.1, 16000), 16000))
+    (input_dir / "notes.txt").write_text("not audio")
+    args = (str(input_dir), "--output-dir", str(output_dir))
+    
+    # 실패한 파일이 있으면 종료 코드 1, 성공한 파일만 결과가 남음
+    transcribe_batch.failing.add("b.wav")
+    assert transcribe_batch(*args) == (1, ["a.wav", "b.wav", "c.wav"])
+    assert json.loads((output_dir / "sub" / "c.json").read_text())["text"] == "c.wav"
+    assert (output_dir / "sub" / "c.txt").read_text() == "c.wav\n"
+    assert not (output_dir / "b.json").exists()
+    
+    # 다시 실행하면 실패한 파일만 변환
+    transcribe_batch.failing.clear()
+    assert transcribe_batch(*args) == (0, ["b.wav"])
+    assert transcribe_batch(*args) == (0, [])
+    
+    # 원본이 바뀌었거나 결과가 깨진 파일은 다시 변환하고, --force면 전부 다시 변환
+    (input_dir / "a.wav").write_bytes(encode(tone(0.2, 16000), 16000))
+    (output_dir / "b.json").write_text("{")
+    assert transcribe_batch(*args) == (0, ["a.wav", "b.wav"])
+    assert transcribe_batch(*args, "--force") == (0, ["a.wav", "b.wav", "c.wav"])
\ No newline at end of file